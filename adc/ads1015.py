@@ -10,6 +10,9 @@ Requires ADS1015 connected via I2C, and reading on channel 0
 I2C must be enabled via raspi-config
 """
 
+import time
+from statistics import fmean, pvariance
+
 # Import necessary ADC library
 import Adafruit_ADS1x15
 
@@ -19,8 +22,29 @@ try:
 except RuntimeError:
     pass
 
+# Samples per second in continuous mode, the fastest supported
+DATA_RATE = 3300
+
 def read(channel):
     """Read from ADC and return voltage."""
     value = adc.read_adc(channel, gain=2/3) # Channel 0, 2/3 gain
     value_v = value * 0.003 #1 bit = 3mV
     return value_v
+
+def read_burst(device, channel, samples, data_rate):
+    """Return samples raw conversions from an ADS1x15 device in continuous mode."""
+    device.start_adc(channel, gain=2/3, data_rate=data_rate)
+    values = []
+    try:
+        for _ in range(samples):
+            # Wait for the next conversion, with a margin for clock tolerance
+            time.sleep(1.1 / data_rate)
+            values.append(device.get_last_result())
+    finally:
+        device.stop_adc()
+    return values
+
+def read_many(channel, samples):
+    """Read samples conversions in one burst, return mean voltage and its variance."""
+    values = [value * 0.003 for value in read_burst(adc, channel, samples, DATA_RATE)]
+    return fmean(values), pvariance(values) / len(values)
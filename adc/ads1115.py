@@ -10,17 +10,29 @@ Requires ADS1115 connected via I2C, and reading on channel specified in config.i
 I2C must be enabled via raspi-config
 """
 
+from statistics import fmean, pvariance
+
 # Import necessary ADC library
 import Adafruit_ADS1x15
 
+from adc.ads1015 import read_burst
+
 # Setup ADC
 try:
     adc = Adafruit_ADS1x15.ADS1115()
 except RuntimeError:
     pass
 
+# Samples per second in continuous mode, the fastest supported
+DATA_RATE = 860
+
 def read(channel):
     """Read from ADC and return voltage."""
     value = adc.read_adc(channel, gain=2/3) # Channel from config.ini, 2/3 gain
     value_v = value * 0.0001875 #1 bit = 187.5uV
     return value_v
+
+def read_many(channel, samples):
+    """Read samples conversions in one burst, return mean voltage and its variance."""
+    values = [value * 0.0001875 for value in read_burst(adc, channel, samples, DATA_RATE)]
+    return fmean(values), pvariance(values) / len(values)
@@ -8,6 +8,8 @@ Authors: bverc, louisvarley
 Requires Rasperry Pi with MCP3008 connected via SPI, and reading on channel 0
 """
 
+from statistics import fmean, pvariance
+
 # Import necessary ADC library
 import Adafruit_MCP3008
 
@@ -28,3 +30,8 @@ def read(channel):
     value = adc.read_adc(channel)
     value_v = ADC_VREF * value / 1024
     return value_v
+
+def read_many(channel, samples):
+    """Read samples conversions back to back, return mean voltage and its variance."""
+    values = [ADC_VREF * adc.read_adc(channel) / 1024 for _ in range(samples)]
+    return fmean(values), pvariance(values) / len(values)
@@ -9,23 +9,54 @@ Requires python module pySerial
 install: python3 -m pip install pyserial
 
 Requires serial device to be sending voltage as a string,
-such as "3.61"
+such as "3.61", on a line at least every 10 seconds
 """
 
+from statistics import fmean, pvariance
+
 # Import necessary library
 import serial
 
+import background
+
 # Setup ADC
 BAUD_RATE = 9600
 SERIAL_DEVICE = '/dev/ttyACM0'
+# Seconds after which the last voltage received is stale
+STALE_AFTER = 10
+
+# Time the newest voltage averaged by read_many() was received, so each is only used once
+last_read_at = float("-inf")
+
+def read_line():
+    """Wait for the next line from serial device, return it as a voltage."""
+    return float(ser.readline().decode('utf-8').rstrip())
+
+# Lines are read in the background, so reads never wait on the serial device
+reader = background.BackgroundReader(read_line, max_age=STALE_AFTER)
 
 try:
     ser = serial.Serial(SERIAL_DEVICE, BAUD_RATE , timeout=1)
-except RuntimeError:
+    reader.start()
+except (RuntimeError, serial.SerialException):
     pass
 
 def read(channel): # pylint: disable=unused-argument
-    """Read from ADC and return voltage."""
-    ser.reset_input_buffer() # Clear input buffer
-    value_v = ser.readline().decode('utf-8').rstrip()
-    return float(value_v)
+    """Return latest voltage from ADC, raise background.StaleError if none received recently."""
+    return reader.latest()
+
+def read_many(channel, samples): # pylint: disable=unused-argument
+    """Average up to samples voltages received since the last poll, return mean and its variance.
+
+    If none was received since the last poll the latest is used again, see read().
+    The variance of a single voltage is not known, and None is returned for it.
+    """
+    global last_read_at # pylint: disable=global-statement
+    values = reader.since(last_read_at, samples)
+    if not values:
+        return reader.latest(), None
+    last_read_at = values[-1][1]
+    voltages = [value for (value, _) in values]
+    if len(voltages) < 2:
+        return voltages[0], None
+    return fmean(voltages), pvariance(voltages) / len(voltages)
@@ -0,0 +1,90 @@
+"""Icon atlas for retropie-status-overlay
+github.com/bverc/retropie-status-overlay
+
+Author: bverc
+
+Keeps decoded RGBA icons in memory, keyed by (state, size, color, alpha),
+so redrawing an icon costs no file I/O or PNG decoding.
+
+Monochrome "_black_" icons are tinted to the configured color at runtime,
+and the tinted icons are cached on disk so later starts only decode them.
+"""
+
+import os
+from collections import OrderedDict
+
+from PIL import Image, ImageColor
+
+import atomicfile
+from compositor import set_alpha
+
+def tint(image, color):
+    """Return copy of image filled with color, keeping only its alpha channel."""
+    tinted = Image.new("RGBA", image.size, color)
+    tinted.putalpha(image.getchannel("A"))
+    return tinted
+
+class IconAtlas:
+    """A bounded LRU cache of decoded icons."""
+
+    def __init__(self, icons, size, color=None, capacity=128, cache_dir=None):
+        """Initialise atlas for icons, a dict of state to icon path.
+
+        If color is given, "_black_" icons are tinted and stored under cache_dir.
+        """
+        self.icons = icons
+        self.size = str(size)
+        self.color = None
+        self.tint_dir = None
+        if color is not None:
+            self.color = "".join(f"{value:02x}" for value in ImageColor.getrgb(color)[:3])
+            if cache_dir is not None:
+                self.tint_dir = os.path.join(cache_dir, self.color + "_" + self.size)
+        self.capacity = capacity
+        self.cache = OrderedDict()
+
+    def decode(self, state):
+        """Read and decode icon for state from file, tinting it if required."""
+        icon_path = self.icons[state]
+        if self.color is None or "_black_" not in os.path.basename(icon_path):
+            with Image.open(icon_path) as icon:
+                return icon.convert("RGBA")
+        if self.tint_dir is not None:
+            tinted_path = os.path.join(self.tint_dir, os.path.basename(icon_path))
+            if os.path.exists(tinted_path):
+                with Image.open(tinted_path) as icon:
+                    return icon.convert("RGBA")
+        with Image.open(icon_path) as icon:
+            image = tint(icon.convert("RGBA"), "#" + self.color)
+        if self.tint_dir is not None:
+            os.makedirs(self.tint_dir, exist_ok=True)
+            with atomicfile.replace(tinted_path) as file:
+                image.save(file, "PNG")
+        return image
+
+    def get(self, state, alpha=255):
+        """Return RGBA image for state with alpha applied, decoding only on a cache miss."""
+        key = (state, self.size, self.color, str(alpha))
+        if key in self.cache:
+            self.cache.move_to_end(key)
+            return self.cache[key]
+        if key[3] != "255":
+            image = set_alpha(self.get(state), alpha)
+        else:
+            image = self.decode(state)
+        self.cache[key] = image
+        while len(self.cache) > self.capacity:
+            self.cache.popitem(last=False)
+        return image
+
+    def preload(self, alphas=(255,)):
+        """Decode every icon at each alpha level, return list of states which failed."""
+        missing = []
+        for state in self.icons:
+            for alpha in alphas:
+                try:
+                    self.get(state, alpha)
+                except OSError:
+                    missing.append(state)
+                    break
+        return missing
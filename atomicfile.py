@@ -0,0 +1,36 @@
+"""Atomic file writes for retropie-status-overlay
+github.com/bverc/retropie-status-overlay
+
+Author: bverc
+
+Writes a file next to its destination, syncs it to storage, then renames it
+over the destination. After a power cut the file holds either its old or its
+new contents, never a truncated mix of them.
+"""
+
+import os
+from contextlib import contextmanager
+
+@contextmanager
+def replace(path, mode="wb", encoding=None):
+    """Open a temporary file for writing, which replaces file at path once closed.
+
+    If writing raises, the temporary file is removed and path is left as it was.
+    """
+    tmp_path = path + ".tmp"
+    try:
+        with open(tmp_path, mode, encoding=encoding) as file:
+            yield file
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    # Sync the directory too, so the rename itself survives a power cut
+    directory = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    try:
+        os.fsync(directory)
+    finally:
+        os.close(directory)
@@ -0,0 +1,87 @@
+"""Background reader for retropie-status-overlay
+github.com/bverc/retropie-status-overlay
+
+Author: bverc
+
+Calls a blocking read function, such as reading a line from a serial port,
+continuously in a daemon thread. The main loop then only picks up the latest
+value, which is flagged as stale if no new value arrived recently.
+
+Usable by any ADC plugin whose reads can block, see adc/ser.py.
+"""
+
+import threading
+import time
+from collections import deque
+
+class StaleError(OSError):
+    """No value has been read recently enough."""
+
+class BackgroundReader:
+    """Keep the most recent values returned by a blocking read function."""
+
+    def __init__(self, read, max_age=10, interval=0, history=16):
+        """Initialise reader for read, values older than max_age seconds are stale.
+
+        interval is the time to wait between reads, 0 if read blocks until a value arrives.
+        """
+        self.read = read
+        self.max_age = max_age
+        self.interval = interval
+        self.condition = threading.Condition()
+        # (value, time) of the most recent reads, newest last
+        self.values = deque(maxlen=history)
+        self.error = None
+        self.thread = None
+
+    def start(self):
+        """Start reading in a daemon thread."""
+        self.thread = threading.Thread(target=self.run, name="BackgroundReader", daemon=True)
+        self.thread.start()
+
+    def run(self):
+        """Read continuously, keeping values and the last error."""
+        while True:
+            try:
+                value = self.read()
+            except (OSError, ValueError) as error:
+                # Such as a timeout or partial line, try again after a pause
+                self.error = error
+                time.sleep(max(self.interval, 1))
+                continue
+            with self.condition:
+                self.values.append((value, time.monotonic()))
+                self.condition.notify_all()
+            if self.interval:
+                time.sleep(self.interval)
+
+    def recent(self, count=1, wait=0):
+        """Return up to count most recent values, oldest first, without blocking.
+
+        Raise StaleError if none have been read, or the newest value is older than max_age.
+        If wait is given, wait up to wait seconds for a first value to be read.
+        """
+        with self.condition:
+            if not self.values and self.thread is not None and wait:
+                self.condition.wait_for(lambda: self.values, wait)
+            values = list(self.values)[-count:]
+        if not values:
+            raise StaleError(f"No value read, last error: {self.error}")
+        age = time.monotonic() - values[-1][1]
+        if age > self.max_age:
+            raise StaleError(f"Last value read {age:.0f} s ago, last error: {self.error}")
+        return [value for (value, _) in values]
+
+    def since(self, after, count):
+        """Return up to count (value, time) read after time after, oldest first, without blocking.
+
+        Values older than max_age are left out, so the list may be empty.
+        """
+        oldest = max(after, time.monotonic() - self.max_age)
+        with self.condition:
+            return [(value, read_at) for (value, read_at) in self.values
+                    if read_at > oldest][-count:]
+
+    def latest(self):
+        """Return the most recent value without blocking, see recent()."""
+        return self.recent()[0]
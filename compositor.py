@@ -0,0 +1,210 @@
+"""Compositor for retropie-status-overlay
+github.com/bverc/retropie-status-overlay
+
+Author: bverc
+
+Keeps one long-lived display layer per overlay and updates it in place.
+Uses the Dispmanx API from libbcm_host directly when available, otherwise
+falls back to a single pngview process per overlay.
+
+Requires Pillow
+install: sudo apt-get install python3-pil
+"""
+
+import ctypes
+import os
+import subprocess
+import tempfile
+
+from PIL import Image
+
+PNGVIEW_PATH = "/usr/local/bin/pngview"
+BCM_HOST_LIBS = ["libbcm_host.so", "/opt/vc/lib/libbcm_host.so"]
+DEFAULT_LAYER = 15000
+
+# Rendered overlays for pngview are written to RAM rather than SD card where possible
+RUNTIME_DIR = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+
+# Dispmanx constants from vc_dispmanx_types.h
+VC_IMAGE_RGBA32 = 15
+DISPMANX_FLAGS_ALPHA_FROM_SOURCE = 0
+DISPMANX_PROTECTION_NONE = 0
+DISPMANX_NO_ROTATE = 0
+
+class VCRect(ctypes.Structure): # pylint: disable=too-few-public-methods
+    """VC_RECT_T structure."""
+    _fields_ = [("x", ctypes.c_int32), ("y", ctypes.c_int32),
+                ("width", ctypes.c_int32), ("height", ctypes.c_int32)]
+
+class VCAlpha(ctypes.Structure): # pylint: disable=too-few-public-methods
+    """VC_DISPMANX_ALPHA_T structure."""
+    _fields_ = [("flags", ctypes.c_int), ("opacity", ctypes.c_uint32),
+                ("mask", ctypes.c_uint32)]
+
+def set_alpha(image, alpha):
+    """Return copy of RGBA image with every pixel's alpha scaled by alpha (0-255)."""
+    alpha = int(alpha)
+    if alpha >= 255:
+        return image
+    image = image.copy()
+    image.putalpha(image.getchannel("A").point(lambda a: a * alpha // 255))
+    return image
+
+class DispmanxLayer:
+    """An in-process Dispmanx element whose pixels are rewritten in place."""
+
+    def __init__(self, bcm_host, display=0, layer=DEFAULT_LAYER):
+        """Initialise layer, the display is opened on first update."""
+        self.bcm = bcm_host
+        self.display_num = display
+        self.layer = layer
+        self.display = None
+        self.resource = None
+        self.element = None
+        self.geometry = None
+
+    def _submit(self, action, *args):
+        """Run a single Dispmanx update and wait for it to be applied."""
+        update = self.bcm.vc_dispmanx_update_start(0)
+        result = action(update, *args)
+        self.bcm.vc_dispmanx_update_submit_sync(update)
+        return result
+
+    def _remove(self):
+        """Remove current element and free its resource."""
+        if self.element is not None:
+            self._submit(self.bcm.vc_dispmanx_element_remove, self.element)
+            self.bcm.vc_dispmanx_resource_delete(self.resource)
+        self.element = None
+        self.resource = None
+        self.geometry = None
+
+    def update(self, image, x_pos, y_pos):
+        """Display RGBA image at x_pos, y_pos, reusing the current element if possible."""
+        if self.display is None:
+            self.display = self.bcm.vc_dispmanx_display_open(self.display_num)
+        # Dispmanx requires the pitch to be aligned to 16 pixels
+        pitch_width = (image.width + 15) & ~15
+        if pitch_width != image.width:
+            padded = Image.new("RGBA", (pitch_width, image.height))
+            padded.paste(image, (0, 0))
+            image = padded
+        geometry = (int(x_pos), int(y_pos), image.width, image.height)
+        rect = VCRect(0, 0, image.width, image.height)
+        if geometry != self.geometry:
+            self._remove()
+            handle = ctypes.c_uint32()
+            self.resource = self.bcm.vc_dispmanx_resource_create(
+                VC_IMAGE_RGBA32, image.width, image.height, ctypes.byref(handle))
+        buffer = ctypes.create_string_buffer(image.tobytes(), image.width * image.height * 4)
+        self.bcm.vc_dispmanx_resource_write_data(self.resource, VC_IMAGE_RGBA32,
+                                                 image.width * 4, buffer, ctypes.byref(rect))
+        if geometry == self.geometry:
+            self._submit(self.bcm.vc_dispmanx_element_modified, self.element,
+                         ctypes.byref(rect))
+            return
+        src = VCRect(0, 0, image.width << 16, image.height << 16)
+        dst = VCRect(*geometry)
+        alpha = VCAlpha(DISPMANX_FLAGS_ALPHA_FROM_SOURCE, 255, 0)
+        self.element = self._submit(self.bcm.vc_dispmanx_element_add, self.display,
+                                    self.layer, ctypes.byref(dst), self.resource,
+                                    ctypes.byref(src), DISPMANX_PROTECTION_NONE,
+                                    ctypes.byref(alpha), None, DISPMANX_NO_ROTATE)
+        self.geometry = geometry
+
+    def close(self):
+        """Remove element and close display."""
+        self._remove()
+        if self.display is not None:
+            self.bcm.vc_dispmanx_display_close(self.display)
+            self.display = None
+
+class PngviewLayer:
+    """A single pngview process showing a pre-composited image."""
+
+    def __init__(self, name, display=0, layer=DEFAULT_LAYER):
+        """Initialise layer, pngview is started on first update."""
+        self.path = os.path.join(RUNTIME_DIR, "retropie-status-overlay-" + name + ".png")
+        self.display = display
+        self.layer = layer
+        self.process = None
+
+    def update(self, image, x_pos, y_pos):
+        """Display RGBA image at x_pos, y_pos, replacing any previous pngview process."""
+        image.save(self.path)
+        call = [PNGVIEW_PATH, "-d", str(self.display), "-b", "0x0000", "-n",
+                "-l", str(self.layer), "-y", str(int(y_pos)), "-x", str(int(x_pos)), self.path]
+        # Start new process before killing the old one to avoid a blank frame
+        old_process = self.process
+        self.process = subprocess.Popen(call) # pylint: disable=consider-using-with
+        if old_process is not None:
+            old_process.kill()
+            old_process.wait()
+
+    def close(self):
+        """Kill pngview process."""
+        if self.process is not None:
+            self.process.kill()
+            self.process.wait()
+            self.process = None
+
+def load_bcm_host():
+    """Load and initialise libbcm_host, return None if unavailable (e.g. KMS or not a Pi)."""
+    for lib in BCM_HOST_LIBS:
+        try:
+            bcm_host = ctypes.CDLL(lib)
+            break
+        except OSError:
+            pass
+    else:
+        return None
+    bcm_host.vc_dispmanx_display_open.restype = ctypes.c_uint32
+    bcm_host.vc_dispmanx_resource_create.restype = ctypes.c_uint32
+    bcm_host.vc_dispmanx_update_start.restype = ctypes.c_uint32
+    bcm_host.vc_dispmanx_element_add.restype = ctypes.c_uint32
+    bcm_host.bcm_host_init()
+    return bcm_host
+
+_bcm_host = {}
+
+def create_layer(name, display=0, layer=DEFAULT_LAYER):
+    """Create best available layer backend."""
+    if "lib" not in _bcm_host:
+        _bcm_host["lib"] = load_bcm_host()
+    if _bcm_host["lib"] is not None:
+        return DispmanxLayer(_bcm_host["lib"], display, layer)
+    return PngviewLayer(name, display, layer)
+
+class Overlay:
+    """A handle for a single on-screen overlay which is updated in place."""
+
+    def __init__(self, name, display=0, layer=DEFAULT_LAYER):
+        """Initialise overlay, the backend layer is created on first update."""
+        self.name = name
+        self.display = display
+        self.layer = layer
+        self.backend = None
+        self.current = None
+
+    @property
+    def visible(self):
+        """Return True if overlay is currently displayed."""
+        return self.current is not None
+
+    def update(self, image, x_pos, y_pos):
+        """Display RGBA image at x_pos, y_pos; does nothing if unchanged."""
+        current = (image.tobytes(), image.size, int(x_pos), int(y_pos))
+        if current == self.current:
+            return False
+        if self.backend is None:
+            self.backend = create_layer(self.name, self.display, self.layer)
+        self.backend.update(image, x_pos, y_pos)
+        self.current = current
+        return True
+
+    def hide(self):
+        """Remove overlay from screen."""
+        if self.backend is not None:
+            self.backend.close()
+            self.backend = None
+        self.current = None
@@ -0,0 +1,46 @@
+"""Config reload for retropie-status-overlay
+github.com/bverc/retropie-status-overlay
+
+Author: bverc
+
+Re-reads config.ini while running, on SIGHUP (systemctl reload) or when the
+file is saved, and works out which options changed, so only the parts of the
+overlay those options affect are set up again.
+
+Options are matched against (section, option) patterns, where * matches any
+text, such as ("ADC *", "*") for every option of every extra ADC channel.
+"""
+
+import configparser
+from fnmatch import fnmatchcase
+
+def read(path):
+    """Return new ConfigParser read from path."""
+    config = configparser.ConfigParser()
+    config.read(path)
+    return config
+
+def diff(old, new):
+    """Return set of (section, option) which differ between old and new config.
+
+    Options which were added or removed are included.
+    """
+    changes = set()
+    for section in set(old.sections()) | set(new.sections()):
+        old_items = dict(old.items(section, raw=True)) if old.has_section(section) else {}
+        new_items = dict(new.items(section, raw=True)) if new.has_section(section) else {}
+        for option in set(old_items) | set(new_items):
+            if old_items.get(option) != new_items.get(option):
+                changes.add((section, option))
+    return changes
+
+def matches(changes, patterns):
+    """Return True if any (section, option) in changes matches one of patterns."""
+    return any(fnmatchcase(section.lower(), pattern[0].lower())
+               and fnmatchcase(option.lower(), pattern[1].lower())
+               for (section, option) in changes for pattern in patterns)
+
+def apply(config, new):
+    """Replace contents of config with new, so code holding config sees the change."""
+    config.clear()
+    config.read_dict(new)
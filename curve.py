@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""Discharge curves for retropie-status-overlay
+github.com/bverc/retropie-status-overlay
+
+Author: bverc
+
+Maps battery voltage to percent charge using a table of points from a
+battery's discharge curve, as LiPo voltage does not fall linearly. The table
+is interpolated into a dense lookup array once, so each mapping is O(1).
+
+Curve files have one "voltage,percent" point per line, # starts a comment.
+A curve can be calibrated from full discharge cycles in the metrics store:
+curve.py [metrics file] [curve file]
+"""
+
+import os
+import sys
+from array import array
+from bisect import bisect_right
+
+import metrics
+
+# Lookup resolution in volts
+STEP = 0.001
+
+# A discharge cycle ends at a gap in samples, such as power lost, or a jump up from charging
+CYCLE_GAP = 600
+CYCLE_JUMP = 0.15
+# Shortest drop in voltage and duration of a cycle to be used for calibration
+CYCLE_MIN_DROP = 0.5
+CYCLE_MIN_TIME = 1800
+# Percent between points of a calibrated curve
+CALIBRATE_STEP = 5
+
+class DischargeCurve:
+    """A voltage to percent mapping interpolated from a table of points."""
+
+    def __init__(self, points, step=STEP):
+        """Initialise curve from points, a list of (voltage, percent)."""
+        self.points = sorted(points)
+        if len(self.points) < 2:
+            raise ValueError("A discharge curve needs at least two points")
+        self.vmin = self.points[0][0]
+        self.step = step
+        voltages = [point[0] for point in self.points]
+        self.table = array("f")
+        for index in range(int(round((self.points[-1][0] - self.vmin) / step)) + 1):
+            voltage = self.vmin + index * step
+            upper = min(bisect_right(voltages, voltage), len(voltages) - 1)
+            ((v_low, p_low), (v_high, p_high)) = (self.points[upper - 1], self.points[upper])
+            if v_high == v_low:
+                self.table.append(p_high)
+            else:
+                self.table.append(p_low + (p_high - p_low) * (voltage - v_low) / (v_high - v_low))
+
+    def percent(self, voltage):
+        """Return percent charge at voltage, limited to the curve's range."""
+        index = int(round((voltage - self.vmin) / self.step))
+        return self.table[min(max(index, 0), len(self.table) - 1)]
+
+    @property
+    def empty_voltage(self):
+        """Return highest voltage at which the curve reaches its lowest percent."""
+        return max(voltage for (voltage, percent) in self.points
+                   if percent == self.points[0][1])
+
+    @classmethod
+    def linear(cls, vmin, vmax):
+        """Return curve falling linearly from 100 percent at vmax to 0 at vmin."""
+        return cls([(vmin, 0), (vmax, 100)])
+
+def load(path):
+    """Return points read from curve file at path."""
+    points = []
+    with open(path, "r", encoding="utf-8") as file:
+        for line in file:
+            line = line.split("#")[0].strip()
+            if line:
+                (voltage, percent) = line.split(",")
+                points.append((float(voltage), float(percent)))
+    return points
+
+def save(path, points):
+    """Write points to curve file at path, highest voltage first."""
+    with open(path, "w", encoding="utf-8") as file:
+        file.write("# voltage,percent\n")
+        for (voltage, percent) in sorted(points, reverse=True):
+            file.write(f"{voltage:.3f},{percent:g}\n")
+
+def discharge_cycles(samples):
+    """Split samples into lists of (time, voltage) for each full discharge cycle."""
+    cycles = [[]]
+    for sample in samples:
+        if sample.voltage is None:
+            continue
+        if cycles[-1] and (sample.time - cycles[-1][-1][0] > CYCLE_GAP
+                           or sample.voltage - cycles[-1][-1][1] > CYCLE_JUMP):
+            cycles.append([])
+        cycles[-1].append((sample.time, sample.voltage))
+    # Discharge starts from the highest voltage, after any charging
+    cycles = [cycle[cycle.index(max(cycle, key=lambda point: point[1])):]
+              for cycle in cycles if cycle]
+    return [cycle for cycle in cycles if len(cycle) > 1
+            and cycle[0][1] - cycle[-1][1] >= CYCLE_MIN_DROP
+            and cycle[-1][0] - cycle[0][0] >= CYCLE_MIN_TIME]
+
+def calibrate(samples, step=CALIBRATE_STEP):
+    """Return curve points from full discharge cycles in samples, or [] if there are none.
+
+    Power draw is taken as constant, so charge is the fraction of each cycle's time remaining.
+    """
+    bins = {}
+    for cycle in discharge_cycles(samples):
+        times = [timestamp for (timestamp, _) in cycle]
+        for percent in range(0, 101, step):
+            # Voltage at the time with percent of the cycle remaining, between samples
+            timestamp = times[-1] - percent / 100 * (times[-1] - times[0])
+            index = min(bisect_right(times, timestamp), len(times) - 1)
+            ((t_low, v_low), (t_high, v_high)) = (cycle[index - 1], cycle[index])
+            voltage = v_low + (v_high - v_low) * (timestamp - t_low) / (t_high - t_low)
+            bins.setdefault(percent, []).append(voltage)
+    points = []
+    for percent in sorted(bins):
+        voltage = sum(bins[percent]) / len(bins[percent])
+        # Voltage must rise with percent for the curve to be usable
+        if points:
+            voltage = max(voltage, points[-1][0])
+        points.append((round(voltage, 3), percent))
+    return points
+
+def main():
+    """Calibrate a curve file from the metrics store."""
+    directory = os.path.dirname(os.path.realpath(__file__))
+    metrics_path = sys.argv[1] if len(sys.argv) > 1 else directory + "/metrics.dat"
+    curve_path = sys.argv[2] if len(sys.argv) > 2 else directory + "/discharge_curve.csv"
+    store = metrics.open_existing(metrics_path)
+    samples = store.samples()
+    store.close()
+    print(f"Found {len(discharge_cycles(samples))} full discharge cycles")
+    points = calibrate(samples)
+    if not points:
+        sys.exit("Unable to calibrate, record a full discharge first")
+    save(curve_path, points)
+    print("Saved curve to " + curve_path)
+
+if __name__ == "__main__":
+    main()
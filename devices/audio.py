@@ -4,10 +4,25 @@ github.com/bverc/retropie-status-overlay
 Author: bverc
 """
 
+import ctypes
 import subprocess
+import threading
+
+import events
 
 NAME = "Audio"
+# Poll interval in seconds, (min, max), mixer changes also arrive as events
+POLL_INTERVAL = (0.5, 5)
+# Options set up again on config reload
+CONFIG = [("Audio", "*")]
+
+# Backend: alsa (in-process via libasound) or amixer
+AUDIO_BACKEND = "alsa"
+AUDIO_CARD = "default"
+# Mixer control to show, empty for the first control with a playback volume
+AUDIO_CONTROL = ""
 AUDIO_CMD = "amixer"
+ALSA_LIB = "libasound.so.2"
 
 def add_icons(icons, iconpath, size):
     """Add audio specific icons."""
@@ -16,23 +31,201 @@ def add_icons(icons, iconpath, size):
     icons['volume_2'] = iconpath + "ic_volume_up_black_" + size + "dp.png"
     icons['volume_mute'] = iconpath + "ic_volume_off_black_"  + size + "dp.png"
 
+class PollFd(ctypes.Structure): # pylint: disable=too-few-public-methods
+    """struct pollfd."""
+    _fields_ = [("fd", ctypes.c_int), ("events", ctypes.c_short), ("revents", ctypes.c_short)]
+
+def load_alsa():
+    """Load libasound and declare the mixer functions used."""
+    lib = ctypes.CDLL(ALSA_LIB)
+    pointer = ctypes.c_void_p
+    signatures = {
+        "snd_mixer_open": (ctypes.c_int, [ctypes.POINTER(pointer), ctypes.c_int]),
+        "snd_mixer_attach": (ctypes.c_int, [pointer, ctypes.c_char_p]),
+        "snd_mixer_selem_register": (ctypes.c_int, [pointer, pointer, pointer]),
+        "snd_mixer_load": (ctypes.c_int, [pointer]),
+        "snd_mixer_first_elem": (pointer, [pointer]),
+        "snd_mixer_elem_next": (pointer, [pointer]),
+        "snd_mixer_selem_get_name": (ctypes.c_char_p, [pointer]),
+        "snd_mixer_selem_has_playback_volume": (ctypes.c_int, [pointer]),
+        "snd_mixer_selem_has_playback_switch": (ctypes.c_int, [pointer]),
+        "snd_mixer_selem_get_playback_volume_range": (
+            ctypes.c_int, [pointer, ctypes.POINTER(ctypes.c_long), ctypes.POINTER(ctypes.c_long)]),
+        "snd_mixer_selem_get_playback_volume": (
+            ctypes.c_int, [pointer, ctypes.c_int, ctypes.POINTER(ctypes.c_long)]),
+        "snd_mixer_selem_get_playback_switch": (
+            ctypes.c_int, [pointer, ctypes.c_int, ctypes.POINTER(ctypes.c_int)]),
+        "snd_mixer_poll_descriptors_count": (ctypes.c_int, [pointer]),
+        "snd_mixer_poll_descriptors": (ctypes.c_int, [pointer, ctypes.POINTER(PollFd),
+                                                      ctypes.c_uint]),
+        "snd_mixer_handle_events": (ctypes.c_int, [pointer]),
+        "snd_mixer_close": (ctypes.c_int, [pointer]),
+    }
+    for name, (restype, argtypes) in signatures.items():
+        function = getattr(lib, name)
+        function.restype = restype
+        function.argtypes = argtypes
+    return lib
+
+class AlsaMixer:
+    """An ALSA mixer opened in-process, whose values alsa-lib keeps current from events.
+
+    alsa-lib's mixer is not thread safe, and is used from the main thread to handle events
+    and from a probe thread to read the volume, so it is only used holding a lock.
+    """
+
+    def __init__(self, lib, card="default", control=""):
+        """Open mixer for card and find control."""
+        self.lib = lib
+        self.lock = threading.Lock()
+        self.handle = ctypes.c_void_p()
+        if lib.snd_mixer_open(ctypes.byref(self.handle), 0) < 0:
+            raise OSError("Unable to open ALSA mixer")
+        if (lib.snd_mixer_attach(self.handle, card.encode()) < 0
+                or lib.snd_mixer_selem_register(self.handle, None, None) < 0
+                or lib.snd_mixer_load(self.handle) < 0):
+            self.close()
+            raise OSError("Unable to load ALSA mixer for " + card)
+        self.elem = self.find_control(control)
+        if self.elem is None:
+            self.close()
+            raise OSError("No ALSA mixer control with playback volume")
+
+    def find_control(self, control):
+        """Return element for named control, or first with a playback volume."""
+        elem = self.lib.snd_mixer_first_elem(self.handle)
+        while elem:
+            if self.lib.snd_mixer_selem_has_playback_volume(elem):
+                name = self.lib.snd_mixer_selem_get_name(elem).decode()
+                if not control or name == control:
+                    return elem
+            elem = self.lib.snd_mixer_elem_next(elem)
+        return None
+
+    def handle_events(self):
+        """Apply pending mixer events to alsa-lib's cached values, without blocking."""
+        with self.lock:
+            self.lib.snd_mixer_handle_events(self.handle)
+
+    def poll_fds(self):
+        """Return file descriptors which become readable on mixer changes."""
+        with self.lock:
+            count = self.lib.snd_mixer_poll_descriptors_count(self.handle)
+            pollfds = (PollFd * max(count, 0))()
+            count = self.lib.snd_mixer_poll_descriptors(self.handle, pollfds, count)
+        return [pollfd.fd for pollfd in pollfds[:max(count, 0)]]
+
+    def get_volume(self):
+        """Return (volume percent, switched on) of control from alsa-lib's cache."""
+        vmin = ctypes.c_long()
+        vmax = ctypes.c_long()
+        value = ctypes.c_long()
+        switch = ctypes.c_int(1)
+        with self.lock:
+            self.lib.snd_mixer_selem_get_playback_volume_range(self.elem, ctypes.byref(vmin),
+                                                               ctypes.byref(vmax))
+            self.lib.snd_mixer_selem_get_playback_volume(self.elem, 0, ctypes.byref(value))
+            if self.lib.snd_mixer_selem_has_playback_switch(self.elem):
+                self.lib.snd_mixer_selem_get_playback_switch(self.elem, 0, ctypes.byref(switch))
+        volume = 0
+        if vmax.value > vmin.value:
+            # Same rounding as amixer
+            volume = round((value.value - vmin.value) * 100 / (vmax.value - vmin.value))
+        return volume, bool(switch.value)
+
+    def close(self):
+        """Close mixer."""
+        with self.lock:
+            self.lib.snd_mixer_close(self.handle)
+
+class MixerSource:
+    """An event source for one of the mixer's poll descriptors."""
+
+    def __init__(self, alsa_mixer, fd):
+        """Initialise source for fd of alsa_mixer."""
+        self.mixer = alsa_mixer
+        self.fd = fd
+
+    def fileno(self):
+        """Return file descriptor to wait on."""
+        return self.fd
+
+    def drain(self):
+        """Handle pending mixer events, always relevant."""
+        self.mixer.handle_events()
+        return True
+
+    def close(self):
+        """Descriptors are owned by the mixer, nothing to close."""
+
+# Opened on first use, None if unavailable
+mixer = {}
+
+def configure(config):
+    """Set backend, card and control from config."""
+    global AUDIO_BACKEND, AUDIO_CARD, AUDIO_CONTROL # pylint: disable=global-statement
+    AUDIO_BACKEND = config.get("Audio", "Backend", fallback="alsa").lower()
+    AUDIO_CARD = config.get("Audio", "Card", fallback="default")
+    AUDIO_CONTROL = config.get("Audio", "Control", fallback="")
+    # Reopen mixer with new settings, such as on config reload
+    if mixer.get("alsa") is not None:
+        mixer["alsa"].close()
+    mixer.clear()
+
+def get_mixer():
+    """Return in-process ALSA mixer, or None if unavailable or amixer backend selected."""
+    if AUDIO_BACKEND != "alsa":
+        return None
+    if "alsa" not in mixer:
+        try:
+            mixer["alsa"] = AlsaMixer(load_alsa(), AUDIO_CARD, AUDIO_CONTROL)
+        except OSError:
+            mixer["alsa"] = None
+    return mixer["alsa"]
+
+def wakeup_sources():
+    """Return event sources which signal a change in volume or mute."""
+    alsa_mixer = get_mixer()
+    if alsa_mixer is not None:
+        return [MixerSource(alsa_mixer, fd) for fd in alsa_mixer.poll_fds()]
+    try:
+        return [events.AlsaControlSource()]
+    except OSError:
+        return []
+
+def volume_state(audio_volume, switch):
+    """Get state of audio device from volume percent and playback switch."""
+    if not switch:
+        return "volume_mute"
+    if audio_volume == 0:
+        return "volume_0"
+    if audio_volume < 50:
+        return "volume_1"
+    return "volume_2"
+
+def read_amixer():
+    """Return (volume percent, switched on) parsed from amixer, or None if not found."""
+    with subprocess.Popen(AUDIO_CMD, stdout=subprocess.PIPE) as proc:
+        for line in proc.stdout:
+            if b'[' in line:
+                audio_volume = int(line.split(b"[")[1].split(b"%")[0])
+                return audio_volume, line.split(b"[")[3].split(b"]")[0] == b"on"
+    return None
+
 def get_state():
     """Get state of audio device."""
     audio_state = "volume_mute"
     audio_volume = 0
     try:
-        with subprocess.Popen(AUDIO_CMD, stdout=subprocess.PIPE) as proc:
-            for line in proc.stdout:
-                if b'[' in line:
-                    audio_volume = int(line.split(b"[")[1].split(b"%")[0])
-                    if line.split(b"[")[3].split(b"]")[0] == b"on":
-                        if audio_volume == 0:
-                            audio_state = "volume_0"
-                        elif audio_volume < 50:
-                            audio_state = "volume_1"
-                        else:
-                            audio_state = "volume_2"
-                    break
+        alsa_mixer = get_mixer()
+        if alsa_mixer is not None:
+            alsa_mixer.handle_events()
+            volume = alsa_mixer.get_volume()
+        else:
+            volume = read_amixer()
+        if volume is not None:
+            audio_volume = volume[0]
+            audio_state = volume_state(*volume)
 
     except IOError:
         pass
@@ -4,9 +4,11 @@ github.com/bverc/retropie-status-overlay
 Authors: bverc, d-rez
 """
 
-import importlib
-from statistics import median
-from collections import deque
+import os
+
+import curve
+import estimator
+import plugins
 
 BAT_STATES = {"discharging": ["alert_red", "alert", "20", "30", "30", "50", "60",
                              "60", "80", "90", "full", "full"],
@@ -15,6 +17,20 @@ BAT_STATES = {"discharging": ["alert_red", "alert", "20", "30", "30", "50", "60"
                              "charging_60", "charging_60", "charging_80",
                              "charging_90", "charging_full", "charging_full"]}
 
+# Readings averaged per poll, for ADC plugins which support read_many()
+ADC_SAMPLES = 16
+
+# Options set up again on config reload
+CONFIG = [("Detection", "ADCType"), ("Detection", "ADCGain"), ("Detection", "ADCChannel*"),
+          ("Detection", "ADCSamples"), ("Detection", "VM*"), ("Detection", "Estimator"),
+          ("Detection", "Hysteresis"), ("Detection", "DischargeCurve"),
+          ("Detection", "Capacity"), ("ADC *", "*")]
+
+def configure(config):
+    """Set number of readings averaged per poll from config."""
+    global ADC_SAMPLES # pylint: disable=global-statement
+    ADC_SAMPLES = config.getint("Detection", "ADCSamples", fallback=16)
+
 def add_icons(icons, iconpath, size):
     """Add battery specific icons."""
     for state in (BAT_STATES["discharging"] + BAT_STATES["charging"]):
@@ -22,48 +38,197 @@ def add_icons(icons, iconpath, size):
     icons["alert_red"] = iconpath + "battery-alert_" + size + ".png"
     icons['battery_critical_shutdown'] = iconpath + "battery-alert_120.png"
 
+class Channel:
+    """An ADC channel, converting its voltage to a reading of a given kind.
+
+    Kinds are pack (battery voltage), cell (a cell voltage), current (amps drawn,
+    negative while charging) and charger (reading above 0 while charging).
+    """
+
+    KINDS = ["pack", "cell", "current", "charger"]
+
+    def __init__(self, name, kind, channel, gain=1.0, offset=0.0):
+        """Initialise channel, reading is (voltage - offset) * gain.
+
+        adc may be set to an ADC plugin to read this channel from, instead of the battery's.
+        """
+        if kind not in self.KINDS:
+            raise ValueError(f"Unknown kind of ADC channel {name}: {kind}")
+        self.name = name
+        self.kind = kind
+        self.channel = channel
+        self.gain = gain
+        self.offset = offset
+        self.adc = None
+        self.value = None
+
+    @classmethod
+    def from_config(cls, config, name):
+        """Return channel configured in section [ADC name]."""
+        section = "ADC " + name
+        channel = cls(name, config.get(section, "Kind").lower(),
+                      config.getint(section, "Channel"),
+                      config.getfloat(section, "Gain", fallback=1.0),
+                      config.getfloat(section, "Offset", fallback=0.0))
+        if config.get(section, "Type", fallback=""):
+            channel.adc = plugins.adcs.load(config.get(section, "Type"))
+        return channel
+
+    def convert(self, voltage):
+        """Set and return reading for voltage read from ADC."""
+        self.value = (voltage - self.offset) * self.gain
+        return self.value
+
 class Battery:
     """A Class to represent a battery and ADC device."""
 
     NAME = "BatteryADC"
+    # Poll interval in seconds, (min, max), voltage changes slowly
+    POLL_INTERVAL = (30, 60)
 
     def __init__(self, config):
         """Initialise battery object using config file for battery and ADC specifications."""
-        self.adc = importlib.import_module('adc.' + config.get("Detection", "ADCType").lower())
+        self.adc = plugins.adcs.load(config.get("Detection", "ADCType"))
+
+        # Pack voltage first, then any extra channels, all read each poll
+        self.channels = [Channel("pack", "pack", config.getint("Detection", "ADCChannel"),
+                                 config.getfloat("Detection", "ADCGain"))]
+        for name in config.get("Detection", "ADCChannels", fallback="").split(","):
+            if name.strip():
+                self.channels.append(Channel.from_config(config, name.strip()))
 
         self.vmax = {"discharging": config.getfloat("Detection", "VMaxDischarging"),
                      "charging"   : config.getfloat("Detection", "VMaxCharging")}
-        self.vmin = {"discharging": config.getfloat("Detection", "VMinDischarging"),
-                     "charging"   : config.getfloat("Detection", "VMinCharging")}
-
-        self.battery_history = deque(maxlen=5)
-        self.adc_channel = config.getint("Detection", "ADCChannel")
-        self.adc_gain = config.getfloat("Detection", "ADCGain")
-
-    def translate(self, voltage):
-        """Get correct battery state given battery voltage."""
+        # Percent charge for each state, linear between VMin and VMax unless a curve is given
+        self.curves = {state: curve.DischargeCurve.linear(
+            config.getfloat("Detection", "VMin" + state.capitalize()), vmax)
+                       for (state, vmax) in self.vmax.items()}
+        curve_file = config.get("Detection", "DischargeCurve", fallback="")
+        if curve_file:
+            self.curves["discharging"] = curve.DischargeCurve(curve.load(
+                os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))),
+                             curve_file)))
+
+        # Smoothed voltage, and level only changes once well past a boundary to stop flicker
+        self.estimator = estimator.create(config.get("Detection", "Estimator", fallback="kalman"))
+        self.hysteresis = estimator.Hysteresis(config.getfloat("Detection", "Hysteresis",
+                                                               fallback=0.25))
+        # Charge is counted from current drawn if there is a current channel and capacity
+        self.counter = None
+        capacity = config.getfloat("Detection", "Capacity", fallback=0)
+        if capacity > 0 and self.reading("current") is not None:
+            self.counter = estimator.CoulombCounter(capacity)
+
+    @property
+    def adc_channel(self):
+        """Return ADC channel of pack voltage."""
+        return self.channels[0].channel
+
+    @property
+    def adc_gain(self):
+        """Return gain of pack voltage."""
+        return self.channels[0].gain
+
+    def reading(self, kind):
+        """Return channel of kind, or None if there is none."""
+        return next((channel for channel in self.channels if channel.kind == kind), None)
+
+    def read_channel(self, channel):
+        """Read channel from its ADC, return variance of reading if known, else None."""
+        adc = self.adc if channel.adc is None else channel.adc
+        if ADC_SAMPLES > 1 and hasattr(adc, "read_many"):
+            # One burst of readings, variance of their mean tells the estimator how noisy
+            (value_v, variance) = adc.read_many(channel.channel, ADC_SAMPLES)
+            channel.convert(value_v)
+            return None if variance is None else variance * channel.gain ** 2
+        channel.convert(adc.read(channel.channel))
+        return None
+
+    def translate(self, voltage, charging=None, percent=None):
+        """Get correct battery state given battery voltage.
+
+        Whether charging and percent charge may be given, if known from other channels.
+        """
         # determine if charging or discharging
-        state = 'discharging' if voltage <= self.vmax['discharging'] else 'charging'
+        if charging is None:
+            charging = voltage > self.vmax['discharging']
+        state = 'charging' if charging else 'discharging'
 
-        # Figure out how 'wide' each range is
-        voltage_span = self.vmax[state] - self.vmin[state]
+        # Voltage above the charging range is an error
+        if voltage > self.vmax['charging']:
+            raise IndexError("Voltage above VMaxCharging")
         state_span = len(BAT_STATES[state]) - 1
 
         # Convert the voltage into a 0-1 range (float)
-        value_scaled = max(float(voltage - self.vmin[state]) / float(voltage_span), 0)
+        if percent is None:
+            percent = self.curves[state].percent(voltage)
+        value_scaled = percent / 100
 
         # Convert the scaled value into the correct state
-        return BAT_STATES[state][int(round(value_scaled * state_span))]
+        return BAT_STATES[state][self.hysteresis.level(state, value_scaled * state_span)]
+
+    def time_to_empty(self):
+        """Return estimated seconds until battery is empty, or None if not discharging."""
+        if self.hysteresis.group != "discharging":
+            return None
+        if self.counter is not None:
+            return self.counter.time_to_empty(self.reading("current").value)
+        return self.estimator.time_to_empty(self.curves["discharging"].empty_voltage)
+
+    @property
+    def current(self):
+        """Return current drawn in amps, or None if unknown."""
+        channel = self.reading("current")
+        return None if channel is None else channel.value
+
+    @property
+    def power(self):
+        """Return power drawn in watts, or None if unknown."""
+        if self.current is None or self.estimator.value is None:
+            return None
+        return self.current * self.estimator.value
+
+    def describe(self):
+        """Return text for log of extra channels, power and time to empty."""
+        text = [f"{channel.name} {channel.value:.3f}" for channel in self.channels[1:]
+                if channel.value is not None]
+        if self.power is not None:
+            text.append(f"{self.power:.2f} W")
+        if self.counter is not None and self.counter.percent is not None:
+            text.append(f"{self.counter.percent:.0f}%")
+        remaining = self.time_to_empty()
+        if remaining is not None:
+            text.append(f"{remaining / 60:.0f} min left")
+        return ", ".join(text)
 
     def get_state(self):
         """Get state of battery device."""
-        value_v = self.adc.read(self.adc_channel) * self.adc_gain
-
-        self.battery_history.append(value_v)
-        median_v = median(self.battery_history)
         try:
-            battery_state = self.translate(median_v)
+            variance = [self.read_channel(channel) for channel in self.channels][0]
+        except OSError:
+            # No reading available, such as stale data from a background reader
+            return ("alert_red", None)
+
+        estimate_v = self.estimator.update(self.channels[0].value, variance=variance)
+        charger = self.reading("charger")
+        if charger is None:
+            charging = estimate_v > self.vmax['discharging']
+        else:
+            charging = charger.value > 0
+        percent = None
+        if self.counter is not None:
+            if self.counter.percent is None or (self.hysteresis.group == "charging"
+                                                and not charging):
+                # Start counting from the voltage, such as at start or once charging ends
+                self.counter.sync(self.curves["discharging"].percent(estimate_v))
+            percent = self.counter.update(self.current)
+        try:
+            battery_state = self.translate(estimate_v, charging, percent)
         except IndexError:
             battery_state = "alert_red"
 
-        return (battery_state, median_v)
+        return (battery_state, estimate_v)
+
+def create(config):
+    """Return battery device configured in config."""
+    return Battery(config)
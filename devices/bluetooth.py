@@ -4,12 +4,27 @@ github.com/bverc/retropie-status-overlay
 Authors: bverc, d-rez
 """
 
-import subprocess
+import fcntl
 import os
+import socket
+import struct
+
+import events
 
 NAME = "Bluetooth"
+# Poll interval in seconds, (min, max), adapter changes also arrive as events
+POLL_INTERVAL = (5, 30)
 BT_DEVICES_DIR = "/sys/class/bluetooth"
-BT_CMD = "hciconfig"
+BT_ADAPTER = "hci0"
+
+# HCI socket constants from bluetooth/hci.h
+AF_BLUETOOTH = 31
+BTPROTO_HCI = 1
+HCIGETDEVINFO = 0x800448d3 # _IOR('H', 211, int)
+HCI_UP = 0x1
+# struct hci_dev_info: dev_id (2), name (8), bdaddr (6), then flags
+HCI_DEV_INFO_SIZE = 128
+HCI_FLAGS_OFFSET = 16
 
 def add_icons(icons, iconpath, size):
     """Add Bluetooth specific icons."""
@@ -17,24 +32,57 @@ def add_icons(icons, iconpath, size):
     icons['bt_connected'] = iconpath + "ic_bluetooth_connected_black_" + size + "dp.png"
     icons['bt_disabled'] = iconpath + "ic_bluetooth_disabled_black_" + size + "dp.png"
 
+def wakeup_sources():
+    """Return event sources which signal a change in Bluetooth state."""
+    try:
+        return [events.uevent_source("bluetooth", "rfkill")]
+    except OSError:
+        return []
+
+def hci_flags(adapter):
+    """Return device flags of adapter from the kernel HCI socket."""
+    request = bytearray(HCI_DEV_INFO_SIZE)
+    struct.pack_into("=H", request, 0, int(adapter[3:]))
+    with socket.socket(AF_BLUETOOTH, socket.SOCK_RAW, BTPROTO_HCI) as sock:
+        fcntl.ioctl(sock.fileno(), HCIGETDEVINFO, request)
+    return struct.unpack_from("=I", request, HCI_FLAGS_OFFSET)[0]
+
+def rfkill_unblocked(adapter):
+    """Return True if adapter's rfkill switch in sysfs is unblocked."""
+    adapter_dir = os.path.join(BT_DEVICES_DIR, adapter)
+    for entry in os.listdir(adapter_dir):
+        if entry.startswith("rfkill"):
+            with open(os.path.join(adapter_dir, entry, "state"), "r", encoding="utf-8") as file:
+                return file.read().rstrip() == "1"
+    return False
+
+def is_up(adapter):
+    """Return True if adapter is powered, falling back to rfkill if HCI socket is unavailable."""
+    try:
+        return bool(hci_flags(adapter) & HCI_UP)
+    except OSError:
+        pass
+    try:
+        return rfkill_unblocked(adapter)
+    except OSError:
+        return False
+
+def count_connections(adapter):
+    """Return number of connected devices, each listed in sysfs as <adapter>:<handle>."""
+    return len([entry for entry in os.listdir(BT_DEVICES_DIR) if entry.startswith(adapter + ":")])
+
 def get_state():
     """Get state of Bluetooth device."""
     bt_state = "bt_disabled"
-    try:
-        with subprocess.Popen(BT_CMD, stdout=subprocess.PIPE) as proc1:
-            cmd = ['awk', 'FNR == 3 {print tolower($1)}']
-            with subprocess.Popen(cmd, stdin=proc1.stdout, stdout=subprocess.PIPE) as proc2:
-                state = proc2.communicate()[0].decode().rstrip()
-        if state == "up":
-            bt_state = "bt_enabled"
-    except IOError:
-        pass
+    connections = 0
+    if is_up(BT_ADAPTER):
+        bt_state = "bt_enabled"
 
     try:
-        devices = os.listdir(BT_DEVICES_DIR)
-        if len(devices) > 1:
+        connections = count_connections(BT_ADAPTER)
+        if connections > 0:
             bt_state = "bt_connected"
     except OSError:
         pass
 
-    return bt_state, ""
+    return bt_state, connections
@@ -6,14 +6,30 @@ Authors: bverc, d-rez
 
 import subprocess
 
+import events
+
 NAME = "Wifi"
-WIFI_CMD = ["iwconfig", "wlan0"]
+# Poll interval in seconds, (min, max), link changes also arrive as events
+POLL_INTERVAL = (5, 30)
+# Options set up again on config reload
+CONFIG = [("Wifi", "*")]
+WIFI_INTERFACES = ["wlan0"]
+
+# Link quality for all interfaces, read in-process
+WIFI_WIRELESS = "/proc/net/wireless"
+WIFI_QUALITY_MAX = 70
+
+# Fallback if interface is missing from WIFI_WIRELESS, interface name is appended
+WIFI_CMD = ["iwconfig"]
 
 # 1 when wifi connected, 0 when disconnected or ifdown
-WIFI_CARRIER = "/sys/class/net/wlan0/carrier"
+WIFI_CARRIER = "/sys/class/net/{}/carrier"
 
 # 1 when ifup, 0 when ifdown
-WIFI_LINKMODE = "/sys/class/net/wlan0/link_mode"
+WIFI_LINKMODE = "/sys/class/net/{}/link_mode"
+
+# States in order of preference when multiple interfaces are monitored
+WIFI_STATES = ["wifi_off", "wifi_0", "wifi_1", "wifi_2", "wifi_3", "wifi_4"]
 
 def add_icons(icons, iconpath, size):
     """Add WIFI specific icons."""
@@ -24,34 +40,72 @@ def add_icons(icons, iconpath, size):
     icons['wifi_0'] = iconpath + "ic_signal_wifi_0_bar_black_" + size + "dp.png"
     icons['wifi_off'] = iconpath + "ic_signal_wifi_off_black_" + size + "dp.png"
 
-def get_state():
-    """Get state of WIFI device."""
+def wakeup_sources():
+    """Return event sources which signal a change in WIFI state."""
+    try:
+        return [events.netlink_link_source()]
+    except OSError:
+        return []
+
+def configure(config):
+    """Set interfaces to monitor from config, a comma separated list."""
+    interfaces = config.get("Wifi", "Interface", fallback="wlan0")
+    WIFI_INTERFACES[:] = [interface.strip() for interface in interfaces.split(",")]
+
+def read_wireless():
+    """Return dict of interface to link quality percentage from WIFI_WIRELESS."""
+    qualities = {}
+    try:
+        with open(WIFI_WIRELESS, "r", encoding="utf-8") as file:
+            # Skip two header lines
+            for line in file.readlines()[2:]:
+                (interface, values) = line.split(":", 1)
+                quality = float(values.split()[1])
+                qualities[interface.strip()] = int(100*quality/WIFI_QUALITY_MAX)
+    except (IOError, ValueError, IndexError):
+        pass
+    return qualities
+
+def read_iwconfig(interface):
+    """Return link quality percentage parsed from iwconfig, or None if not found."""
+    with subprocess.Popen(WIFI_CMD + [interface], stdout=subprocess.PIPE) as proc:
+        for line in proc.stdout:
+            if b'Link Quality' in line:
+                fraction = line.split()[1].split(b"=")[1].split(b"/")
+                return int(100*int(fraction[0])/int(fraction[1]))
+    return None
+
+def quality_state(wifi_quality):
+    """Get state for a connected interface from its link quality percentage."""
+    if wifi_quality < 20:
+        return "wifi_0"
+    if wifi_quality < 40:
+        return "wifi_1"
+    if wifi_quality < 60:
+        return "wifi_2"
+    if wifi_quality < 80:
+        return "wifi_3"
+    return "wifi_4"
+
+def get_interface_state(interface, qualities):
+    """Get state of a single WIFI interface, using qualities from read_wireless()."""
     wifi_state = "wifi_off"
     wifi_quality = 0
     try:
-        with open(WIFI_CARRIER, "r", encoding="utf-8") as file:
+        with open(WIFI_CARRIER.format(interface), "r", encoding="utf-8") as file:
             carrier_state = int(file.read().rstrip())
         if carrier_state == 1:
             # ifup and connected to AP
             wifi_state = "wifi_4"
             # get wifi quality
-            with subprocess.Popen(WIFI_CMD, stdout=subprocess.PIPE) as proc:
-                for line in proc.stdout:
-                    if b'Link Quality' in line:
-                        fraction = line.split()[1].split(b"=")[1].split(b"/")
-                        wifi_quality = int(100*int(fraction[0])/int(fraction[1]))
-                        if wifi_quality < 20:
-                            wifi_state = "wifi_0"
-                        elif wifi_quality < 40:
-                            wifi_state = "wifi_1"
-                        elif wifi_quality < 60:
-                            wifi_state = "wifi_2"
-                        elif wifi_quality < 80:
-                            wifi_state = "wifi_3"
-                        else:
-                            wifi_state = "wifi_4"
+            quality = qualities.get(interface)
+            if quality is None:
+                quality = read_iwconfig(interface)
+            if quality is not None:
+                wifi_quality = quality
+                wifi_state = quality_state(wifi_quality)
         elif carrier_state == 0:
-            with open(WIFI_LINKMODE, "r", encoding="utf-8") as file:
+            with open(WIFI_LINKMODE.format(interface), "r", encoding="utf-8") as file:
                 linkmode_state = int(file.read().rstrip())
             if linkmode_state == 1:
                 # ifup but not connected to any network
@@ -62,3 +116,9 @@ def get_state():
         pass
 
     return wifi_state, wifi_quality
+
+def get_state():
+    """Get state of WIFI device, the best of all monitored interfaces."""
+    qualities = read_wireless()
+    states = [get_interface_state(interface, qualities) for interface in WIFI_INTERFACES]
+    return max(states, key=lambda state: (WIFI_STATES.index(state[0]), state[1]))
@@ -0,0 +1,105 @@
+"""Display discovery for retropie-status-overlay
+github.com/bverc/retropie-status-overlay
+
+Author: bverc
+
+Finds the screen resolution without tvservice, which is not available with
+the KMS display driver. The framebuffer's current mode is used if there is
+one, else the preferred mode of a connected DRM connector from sysfs, with
+tvservice only as a last resort for older firmware.
+
+DRM uevents signal a display being connected or its mode changing, so the
+status bar can be moved without polling.
+"""
+
+import fcntl
+import os
+import re
+import subprocess
+
+import events
+
+DRM_DIR = "/sys/class/drm"
+FB_DEVICE = "/dev/fb{}"
+# FBIOGET_VSCREENINFO from linux/fb.h, fb_var_screeninfo starts with xres, yres
+FBIOGET_VSCREENINFO = 0x4600
+FB_VAR_SCREENINFO_SIZE = 160
+TVSERVICE_CMD = ["tvservice", "-s"]
+DEFAULT_RESOLUTION = ["1920", "1080"]
+
+MODE = re.compile(r"(\d{3,})x(\d{3,})")
+
+def framebuffer_size(index=0):
+    """Return (width, height) of framebuffer index, or None if unavailable."""
+    try:
+        fd = os.open(FB_DEVICE.format(index), os.O_RDONLY)
+    except OSError:
+        return None
+    try:
+        info = fcntl.ioctl(fd, FBIOGET_VSCREENINFO, bytes(FB_VAR_SCREENINFO_SIZE))
+    except OSError:
+        return None
+    finally:
+        os.close(fd)
+    # Native 32 bit fields, as filled in by the kernel
+    size = tuple(memoryview(info).cast("I")[:2])
+    return size if size[0] and size[1] else None
+
+def connectors(drm_dir=DRM_DIR):
+    """Return dict of connected DRM connector name to preferred (width, height)."""
+    found = {}
+    try:
+        entries = sorted(os.listdir(drm_dir))
+    except OSError:
+        return found
+    for entry in entries:
+        # Connectors are card<n>-<name>, such as card1-HDMI-A-1
+        if "-" not in entry:
+            continue
+        path = os.path.join(drm_dir, entry)
+        try:
+            with open(os.path.join(path, "status"), "r", encoding="utf-8") as file:
+                status = file.read().strip()
+            with open(os.path.join(path, "modes"), "r", encoding="utf-8") as file:
+                mode = MODE.match(file.readline())
+        except OSError:
+            continue
+        if status == "connected" and mode:
+            found[entry.split("-", 1)[1]] = (int(mode.group(1)), int(mode.group(2)))
+    return found
+
+def tvservice_size():
+    """Return (width, height) reported by tvservice, or None if unavailable."""
+    try:
+        output = subprocess.check_output(TVSERVICE_CMD, stderr=subprocess.DEVNULL).decode()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    mode = MODE.search(output)
+    return (int(mode.group(1)), int(mode.group(2))) if mode else None
+
+def resolution(connector="", framebuffer=0):
+    """Return [width, height] of the screen, as strings.
+
+    connector names the DRM connector to use, such as HDMI-A-2 or DSI-1,
+    otherwise framebuffer's size or the first connected display is used.
+    """
+    displays = connectors(DRM_DIR)
+    size = None
+    if connector:
+        size = displays.get(connector)
+    if size is None:
+        size = framebuffer_size(framebuffer)
+    if size is None and displays:
+        size = next(iter(displays.values()))
+    if size is None:
+        size = tvservice_size()
+    if size is None:
+        return list(DEFAULT_RESOLUTION)
+    return [str(size[0]), str(size[1])]
+
+def wakeup_sources():
+    """Return event sources which signal a display connected or its mode changed."""
+    try:
+        return [events.uevent_source("drm")]
+    except OSError:
+        return []
@@ -0,0 +1,165 @@
+"""Battery estimators for retropie-status-overlay
+github.com/bverc/retropie-status-overlay
+
+Author: bverc
+
+Smooth noisy battery voltage readings in constant time per sample, and track
+the discharge slope to estimate time until empty. Where current is measured,
+charge can instead be counted from the current drawn. Readings may arrive at any
+interval, as the time between them is taken into account.
+
+A jump larger than JUMP_VOLTAGE, such as when a charger is connected, resets
+the estimate instead of slowly following it.
+"""
+
+import math
+import time
+
+JUMP_VOLTAGE = 0.15
+
+class Estimator:
+    """Base class for an estimator of voltage and its slope."""
+
+    def __init__(self):
+        """Initialise estimator with no readings."""
+        self.value = None
+        self.slope = 0.0
+        self.time = None
+
+    def update(self, reading, now=None, variance=None):
+        """Add reading taken at now (default current time), return new voltage estimate.
+
+        variance of the reading (V^2) may be given if known, such as from averaged samples.
+        """
+        now = time.monotonic() if now is None else now
+        if self.value is None or abs(reading - self.value) > JUMP_VOLTAGE:
+            self.reset(reading)
+        elif now > self.time:
+            self.step(reading, now - self.time, variance)
+        self.time = now
+        return self.value
+
+    def reset(self, reading):
+        """Restart estimate from reading, with unknown slope."""
+        self.value = reading
+        self.slope = 0.0
+
+    def step(self, reading, elapsed, variance=None):
+        """Update estimate with reading taken elapsed seconds after the previous one."""
+        raise NotImplementedError
+
+    def time_to_empty(self, vmin):
+        """Return seconds until estimate falls to vmin at the current slope, or None."""
+        if self.value is None or self.slope >= 0:
+            return None
+        return max(self.value - vmin, 0) / -self.slope
+
+class EmaEstimator(Estimator):
+    """Exponential moving average of voltage and slope (Holt's linear method)."""
+
+    def __init__(self, time_constant=600):
+        """Initialise estimator, which responds to changes within about time_constant seconds."""
+        super().__init__()
+        self.time_constant = time_constant
+
+    def step(self, reading, elapsed, variance=None):
+        """Blend reading into the value predicted from the previous slope."""
+        alpha = 1 - math.exp(-elapsed / self.time_constant)
+        previous = self.value
+        self.value = alpha * reading + (1 - alpha) * (previous + self.slope * elapsed)
+        self.slope = alpha * (self.value - previous) / elapsed + (1 - alpha) * self.slope
+
+class KalmanEstimator(Estimator):
+    """Kalman filter tracking voltage and slope, with the slope changing slowly."""
+
+    def __init__(self, reading_noise=4e-4, voltage_noise=1e-6, slope_noise=1e-13):
+        """Initialise filter with reading variance (V^2), and how fast voltage (V^2/s)
+        and slope (V^2/s^3) may change beyond what the slope predicts."""
+        super().__init__()
+        self.noise = (reading_noise, voltage_noise, slope_noise)
+        # Covariance of (value, slope) estimate
+        self.cov = [[reading_noise, 0.0], [0.0, 1e-8]]
+
+    def reset(self, reading):
+        """Restart estimate from reading, with unknown slope."""
+        super().reset(reading)
+        self.cov = [[self.noise[0], 0.0], [0.0, 1e-8]]
+
+    def step(self, reading, elapsed, variance=None):
+        """Predict forward elapsed seconds, then correct with reading.
+
+        A reading with variance above the configured reading noise is trusted less.
+        """
+        (reading_noise, voltage_noise, slope_noise) = self.noise
+        if variance is not None:
+            reading_noise = max(reading_noise, variance)
+        ((p00, p01), (_, p11)) = self.cov
+        # Predict
+        value = self.value + self.slope * elapsed
+        p00 = p00 + elapsed * (2 * p01 + elapsed * p11) + voltage_noise * elapsed
+        p01 = p01 + elapsed * p11
+        p11 = p11 + slope_noise * elapsed
+        # Correct
+        gain = (p00 / (p00 + reading_noise), p01 / (p00 + reading_noise))
+        error = reading - value
+        self.value = value + gain[0] * error
+        self.slope = self.slope + gain[1] * error
+        self.cov = [[(1 - gain[0]) * p00, (1 - gain[0]) * p01],
+                    [(1 - gain[0]) * p01, p11 - gain[1] * p01]]
+
+class Hysteresis:
+    """Choose a level from a continuous position, only changing once well past a boundary."""
+
+    def __init__(self, band=0.25):
+        """Initialise with band, the fraction of a level to move beyond a boundary."""
+        self.band = band
+        self.last = None
+
+    def level(self, group, position):
+        """Return level for position, keeping the previous level of group if close to it."""
+        level = int(round(position))
+        if self.last is not None and self.last[0] == group \
+                and abs(position - self.last[1]) < 0.5 + self.band:
+            level = self.last[1]
+        self.last = (group, level)
+        return level
+
+    @property
+    def group(self):
+        """Return group of the last level, or None."""
+        return None if self.last is None else self.last[0]
+
+class CoulombCounter:
+    """State of charge counted from current drawn from a battery of known capacity."""
+
+    def __init__(self, capacity):
+        """Initialise counter for a battery of capacity mAh, with unknown charge."""
+        self.capacity = capacity
+        self.percent = None
+        self.time = None
+
+    def sync(self, percent, now=None):
+        """Set charge to percent, such as estimated from voltage."""
+        self.percent = min(max(percent, 0), 100)
+        self.time = time.monotonic() if now is None else now
+
+    def update(self, current, now=None):
+        """Count current in amps drawn since the last update, return percent charge or None."""
+        now = time.monotonic() if now is None else now
+        if self.percent is None:
+            return None
+        used = current * 1000 * (now - self.time) / 3600
+        self.sync(self.percent - 100 * used / self.capacity, now)
+        return self.percent
+
+    def time_to_empty(self, current):
+        """Return seconds until empty at current in amps, or None if not discharging."""
+        if self.percent is None or current <= 0:
+            return None
+        return self.percent / 100 * self.capacity / (current * 1000) * 3600
+
+ESTIMATORS = {"kalman": KalmanEstimator, "ema": EmaEstimator}
+
+def create(name):
+    """Return a new estimator of type name, kalman or ema."""
+    return ESTIMATORS[name.lower()]()
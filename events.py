@@ -0,0 +1,346 @@
+"""Event sources for retropie-status-overlay
+github.com/bverc/retropie-status-overlay
+
+Author: bverc
+
+Lets devices register file descriptors which become readable when their
+state changes, so the main loop can wake immediately instead of waiting
+for the next poll. Each device is also polled at its own adaptive interval.
+
+Everything runs on the main thread. Callbacks from other threads, such as GPIO
+interrupts, only post a value which the main loop picks up as an event.
+"""
+
+import ctypes
+import fcntl
+import heapq
+import os
+import selectors
+import socket
+import struct
+import time
+from collections import deque
+
+# Netlink constants from linux/netlink.h and linux/rtnetlink.h
+NETLINK_ROUTE = 0
+NETLINK_CONNECTOR = 11
+NETLINK_KOBJECT_UEVENT = 15
+RTMGRP_LINK = 0x1
+UEVENT_GROUP_KERNEL = 0x1
+NLMSG_DONE = 3
+
+# Process events connector constants from linux/connector.h and linux/cn_proc.h
+CN_IDX_PROC = 1
+CN_VAL_PROC = 1
+PROC_CN_MCAST_LISTEN = 1
+PROC_EVENT_EXEC = 0x00000002
+PROC_EVENT_EXIT = 0x80000000
+# Offset of proc_event after nlmsghdr (16 bytes) and cn_msg (20 bytes)
+PROC_EVENT_OFFSET = 36
+
+# SNDRV_CTL_IOCTL_SUBSCRIBE_EVENTS = _IOWR('U', 0x16, int) from sound/asound.h
+SNDRV_CTL_IOCTL_SUBSCRIBE_EVENTS = 0xC0045516
+
+# inotify constants from sys/inotify.h
+IN_CLOSE_WRITE = 0x8
+IN_MOVED_TO = 0x80
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+# inotify_event: watch descriptor, mask, cookie, length of name which follows
+INOTIFY_EVENT = struct.Struct("=iIII")
+
+# Time to keep collecting events after the first, so bursts cause a single update
+SETTLE_TIME = 0.05
+
+class NetlinkSource:
+    """A netlink socket subscribed to a multicast group."""
+
+    def __init__(self, protocol, groups, match=None):
+        """Open and bind netlink socket, match optionally filters messages by content."""
+        self.sock = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, protocol)
+        self.sock.setblocking(False)
+        self.sock.bind((0, groups))
+        self.match = match
+
+    def fileno(self):
+        """Return file descriptor to wait on."""
+        return self.sock.fileno()
+
+    def drain(self):
+        """Read all pending messages, return True if any were relevant."""
+        relevant = False
+        while True:
+            try:
+                message = self.sock.recv(65536)
+            except (BlockingIOError, InterruptedError):
+                return relevant
+            if self.match is None or any(match in message for match in self.match):
+                relevant = True
+
+    def close(self):
+        """Close socket."""
+        self.sock.close()
+
+class AlsaControlSource:
+    """An ALSA control device subscribed to mixer change events."""
+
+    def __init__(self, card=0):
+        """Open control device for card and subscribe to its events."""
+        self.fd = os.open(f"/dev/snd/controlC{card}", os.O_RDONLY | os.O_NONBLOCK)
+        try:
+            fcntl.ioctl(self.fd, SNDRV_CTL_IOCTL_SUBSCRIBE_EVENTS, b"\x01\x00\x00\x00")
+        except OSError:
+            os.close(self.fd)
+            raise
+
+    def fileno(self):
+        """Return file descriptor to wait on."""
+        return self.fd
+
+    def drain(self):
+        """Read all pending events, return True if any were read."""
+        relevant = False
+        while True:
+            try:
+                if not os.read(self.fd, 4096):
+                    return relevant
+            except (BlockingIOError, InterruptedError):
+                return relevant
+            relevant = True
+
+    def close(self):
+        """Close control device."""
+        os.close(self.fd)
+
+class ThreadEvents:
+    """Values posted from other threads, waking the main loop through a pipe."""
+
+    def __init__(self):
+        """Open pipe with an empty queue."""
+        (self.read_fd, self.write_fd) = os.pipe()
+        os.set_blocking(self.read_fd, False)
+        os.set_blocking(self.write_fd, False)
+        self.queue = deque()
+
+    def post(self, value):
+        """Queue value from any thread, such as a GPIO callback, and wake the main loop."""
+        self.queue.append(value)
+        try:
+            os.write(self.write_fd, b"\0")
+        except BlockingIOError:
+            # Pipe already full of wakeups
+            pass
+
+    def fileno(self):
+        """Return file descriptor to wait on."""
+        return self.read_fd
+
+    def drain(self):
+        """Read all pending wakeups, return True if any values are queued."""
+        try:
+            while os.read(self.read_fd, 4096):
+                pass
+        except (BlockingIOError, InterruptedError):
+            pass
+        return bool(self.queue)
+
+    def pop(self):
+        """Remove and return list of queued values, oldest first."""
+        values = []
+        while self.queue:
+            values.append(self.queue.popleft())
+        return values
+
+    def close(self):
+        """Close pipe."""
+        os.close(self.read_fd)
+        os.close(self.write_fd)
+
+class InotifySource:
+    """A file written or replaced, watched through its directory so editors' renames are seen."""
+
+    def __init__(self, path):
+        """Watch path for changes."""
+        self.libc = ctypes.CDLL(None, use_errno=True)
+        self.name = os.path.basename(path).encode()
+        self.fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        directory = os.path.dirname(os.path.abspath(path)).encode()
+        if self.libc.inotify_add_watch(self.fd, directory, IN_CLOSE_WRITE | IN_MOVED_TO) < 0:
+            error = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(error, "inotify_add_watch failed")
+
+    def fileno(self):
+        """Return file descriptor to wait on."""
+        return self.fd
+
+    def drain(self):
+        """Read all pending events, return True if any were for the watched file."""
+        relevant = False
+        while True:
+            try:
+                data = os.read(self.fd, 4096)
+            except (BlockingIOError, InterruptedError):
+                return relevant
+            offset = 0
+            while offset + INOTIFY_EVENT.size <= len(data):
+                length = INOTIFY_EVENT.unpack_from(data, offset)[3]
+                start = offset + INOTIFY_EVENT.size
+                if data[start:start + length].rstrip(b"\0") == self.name:
+                    relevant = True
+                offset = start + length
+
+    def close(self):
+        """Close inotify instance."""
+        os.close(self.fd)
+
+class ProcConnectorSource(NetlinkSource):
+    """Kernel process events, relevant when a process starts or the watched one exits."""
+
+    def __init__(self, watcher):
+        """Subscribe to process events for watcher, a ProcessWatcher. Requires root."""
+        super().__init__(NETLINK_CONNECTOR, CN_IDX_PROC)
+        self.watcher = watcher
+        listen = struct.pack("=IIIIHHI", CN_IDX_PROC, CN_VAL_PROC, 0, 0, 4, 0,
+                             PROC_CN_MCAST_LISTEN)
+        header = struct.pack("=IHHII", 16 + len(listen), NLMSG_DONE, 0, 0, os.getpid())
+        self.sock.send(header + listen)
+
+    def drain(self):
+        """Read all pending events, return True if any were relevant."""
+        relevant = False
+        while True:
+            try:
+                message = self.sock.recv(65536)
+            except (BlockingIOError, InterruptedError):
+                return relevant
+            if len(message) < PROC_EVENT_OFFSET + 24:
+                continue
+            # proc_event: what, cpu, timestamp, then pid and tgid
+            (what, _, _, pid, tgid) = struct.unpack_from("=IIQII", message, PROC_EVENT_OFFSET)
+            if what == PROC_EVENT_EXEC:
+                self.watcher.forget(tgid)
+                relevant = relevant or self.watcher.pid is None
+            elif what == PROC_EVENT_EXIT and pid == tgid and str(tgid) == self.watcher.pid:
+                relevant = True
+
+def netlink_link_source():
+    """Return source for network link changes, such as wifi carrier up or down."""
+    return NetlinkSource(NETLINK_ROUTE, RTMGRP_LINK)
+
+def uevent_source(*subsystems):
+    """Return source for kernel uevents (as seen by udev) from the given subsystems."""
+    match = [b"SUBSYSTEM=" + subsystem.encode() for subsystem in subsystems]
+    return NetlinkSource(NETLINK_KOBJECT_UEVENT, UEVENT_GROUP_KERNEL, match)
+
+class Scheduler:
+    """Run each task when it is due or when one of its event sources fires.
+
+    Poll intervals adapt between a minimum and maximum: they tighten to the
+    minimum after a change and back off, doubling, while the value is stable.
+    """
+
+    def __init__(self):
+        """Initialise scheduler with no tasks."""
+        self.selector = selectors.DefaultSelector()
+        self.queue = []
+        self.intervals = {}
+        self.due_at = {}
+
+    def add(self, name, interval=(5, 5)):
+        """Add task name polled every (min, max) seconds, due immediately."""
+        self.intervals[name] = [interval[0], interval[0], interval[1]]
+        self.schedule(name, time.monotonic())
+
+    def schedule(self, name, due):
+        """Set next due time of task name."""
+        self.due_at[name] = due
+        heapq.heappush(self.queue, (due, name))
+
+    def register(self, source, name):
+        """Add an event source for task name, an object with fileno() and drain() methods."""
+        self.selector.register(source, selectors.EVENT_READ, name)
+
+    def register_device(self, device):
+        """Add device as a task using its POLL_INTERVAL and event sources.
+
+        Return number of event sources registered.
+        """
+        self.add(device.NAME, getattr(device, "POLL_INTERVAL", (5, 5)))
+        if not hasattr(device, "wakeup_sources"):
+            return 0
+        sources = device.wakeup_sources()
+        for source in sources:
+            self.register(source, device.NAME)
+        return len(sources)
+
+    def call_later(self, name, delay):
+        """Make task name due once after delay seconds, such as to check a held button."""
+        self.schedule(name, time.monotonic() + delay)
+
+    def remove(self, name):
+        """Remove task name and close its event sources."""
+        self.intervals.pop(name, None)
+        self.due_at.pop(name, None)
+        for key in list(self.selector.get_map().values()):
+            if key.data == name:
+                self.selector.unregister(key.fileobj)
+                key.fileobj.close()
+
+    def report(self, name, changed):
+        """Reschedule task name after it ran, adapting its interval.
+
+        Does nothing if the task was removed since it became due.
+        """
+        if name not in self.intervals:
+            return
+        interval = self.intervals[name]
+        if changed:
+            interval[0] = interval[1]
+        else:
+            interval[0] = min(interval[0] * 2, interval[2])
+        self.schedule(name, time.monotonic() + interval[0])
+
+    def pop_due(self):
+        """Remove and return names of all tasks which are due now."""
+        due = set()
+        now = time.monotonic()
+        while self.queue and self.queue[0][0] <= now:
+            (when, name) = heapq.heappop(self.queue)
+            if self.due_at.get(name) == when:
+                due.add(name)
+        return due
+
+    def wait(self):
+        """Block until at least one task is due or has an event, return set of task names."""
+        while True:
+            due = self.pop_due()
+            timeout = None
+            if due:
+                timeout = 0
+            elif self.queue:
+                timeout = max(self.queue[0][0] - time.monotonic(), 0)
+            due |= self.drain(self.selector.select(timeout))
+            if due:
+                break
+        # Collect any events following immediately after, so bursts cause a single update
+        deadline = time.monotonic() + SETTLE_TIME
+        while True:
+            ready = self.selector.select(max(deadline - time.monotonic(), 0))
+            if not ready:
+                return due
+            due |= self.drain(ready)
+
+    @staticmethod
+    def drain(ready):
+        """Drain ready sources, return set of task names which had relevant events."""
+        return {key.data for key, _ in ready if key.fileobj.drain()}
+
+    def close(self):
+        """Close all registered sources."""
+        for key in list(self.selector.get_map().values()):
+            self.selector.unregister(key.fileobj)
+            key.fileobj.close()
+        self.selector.close()
@@ -79,6 +79,14 @@ if [[ $CONFIG = [bB] ]] ; then
     fi
   done
   echo "Padding = $PAD" >> config.ini
+  echo "" >> config.ini
+  echo "# Icon Color: 24bit hex (e.g. #7d7d7d) or a name (e.g. blue)" >> config.ini
+  echo "Color = #7d7d7d" >> config.ini
+  echo "" >> config.ini
+  echo "# Display number to show icons on, as for pngview -d" >> config.ini
+  echo "Display = 0" >> config.ini
+  echo "# Display connector to read resolution from, such as HDMI-A-1 or DSI-1, empty for the first" >> config.ini
+  echo "Connector =" >> config.ini
   
   echo "" >> config.ini
   echo "[Detection]" >> config.ini
@@ -156,12 +164,33 @@ if [[ $CONFIG = [bB] ]] ; then
   echo "ADCChannel = 0" >> config.ini
   echo "" >> config.ini
 
+  echo "# Readings averaged per poll, for ADCs which support burst reads" >> config.ini
+  echo "ADCSamples = 16" >> config.ini
+  echo "" >> config.ini
+
+  echo "# Extra ADC channels read each poll, separated by commas, each with an [ADC <name>] section" >> config.ini
+  echo "ADCChannels =" >> config.ini
+  echo "# Battery capacity in mAh, counts charge from a current channel if above 0" >> config.ini
+  echo "Capacity = 0" >> config.ini
+  echo "" >> config.ini
+
   echo "# Change how your battery calculations are made, See Read Me" >> config.ini
   echo "VMaxDischarging = 3.95" >> config.ini
   echo "VMaxCharging = 4.5" >> config.ini
   echo "VMinDischarging = 3.2" >> config.ini
   echo "VMinCharging = 4.25" >> config.ini
   echo "" >> config.ini
+
+  echo "# Voltage to percent table for discharging, instead of linear between VMin and VMax" >> config.ini
+  echo "# Path relative to this directory, see adc/README.md" >> config.ini
+  echo "DischargeCurve =" >> config.ini
+  echo "" >> config.ini
+
+  echo "# Smoothing of battery voltage: kalman or ema" >> config.ini
+  echo "Estimator = kalman" >> config.ini
+  echo "# Fraction of a battery level voltage must pass a boundary by before the icon changes" >> config.ini
+  echo "Hysteresis = 0.25" >> config.ini
+  echo "" >> config.ini
   
   echo "# Should low ADC cause shutdown" >> config.ini
   echo "ADCShutdown = False" >> config.ini
@@ -223,6 +252,32 @@ if [[ $CONFIG = [bB] ]] ; then
   echo "HideEnvWarnings = $HEW" >> config.ini
   echo "" >> config.ini
 
+  echo "# Seconds a device check may take before its icon keeps the last state" >> config.ini
+  echo "ProbeTimeout = 2" >> config.ini
+  echo "" >> config.ini
+
+  echo "[Wifi]" >> config.ini
+  echo "# Interfaces to monitor, separated by commas" >> config.ini
+  echo "Interface = wlan0" >> config.ini
+  echo "" >> config.ini
+
+  echo "[Audio]" >> config.ini
+  echo "# Backend: alsa (in-process) or amixer" >> config.ini
+  echo "Backend = alsa" >> config.ini
+  echo "Card = default" >> config.ini
+  echo "# Mixer control, empty for the first with a playback volume" >> config.ini
+  echo "Control =" >> config.ini
+  echo "" >> config.ini
+
+  echo "[Metrics]" >> config.ini
+  echo "# Record battery voltage and current, wifi quality, volume and throttle history to metrics.dat" >> config.ini
+  echo "Enabled = True" >> config.ini
+  echo "# Seconds between samples" >> config.ini
+  echo "Interval = 60" >> config.ini
+  echo "# Samples kept, the oldest are overwritten (20160 is two weeks at 60 seconds)" >> config.ini
+  echo "Capacity = 20160" >> config.ini
+  echo "" >> config.ini
+
   echo "[BatteryLDO]" >> config.ini
   echo "GPIO = $LDOGPIO" >> config.ini
   if [[ $LDPOL = [hH] ]] ; then
@@ -266,7 +321,7 @@ echo "Installing required packages..."
 echo -e "${NONE}"
 echo "--------------------------------------------------"
 sudo apt-get update
-sudo apt-get install python3-psutil python3-rpi.gpio python3-pip imagemagick
+sudo apt-get install python3-rpi.gpio python3-pil python3-pip
 
 echo ""
 echo -e "${CYAN}"
@@ -292,9 +347,9 @@ if [[ $COLOR = "" ]] ; then
   COLOR="#7d7d7d"
 fi
 cd $SCRIPTPATH
-cp -r overlay_icons colored_icons
-echo "Colorizing icons using Imagemagick..."
-mogrify -define png:color-type=6 -fill $COLOR -colorize 100 colored_icons/*black*.png
+echo "Icons will be colorized when the overlay starts."
+echo "Change Color in config.ini at any time to recolor them."
+sed -i "s/^Color = .*/Color = $COLOR/" config.ini
  
 
 
@@ -329,7 +384,7 @@ echo -e "${NONE}"
 echo "--------------------------------------------------"
 echo "Retropie Status Overlay will now run automatically at boot as a service."
 echo ""
-echo "$SCRIPTPATH/config.ini may be edited at any time."
+echo "$SCRIPTPATH/config.ini may be edited at any time, changes apply once saved."
 echo ""
 echo "You can stop and start the overlay service at anytime by doing:"
 echo "sudo service retropie-status-overlay [stop|start]"
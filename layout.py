@@ -0,0 +1,59 @@
+"""Status bar layout for retropie-status-overlay
+github.com/bverc/retropie-status-overlay
+
+Author: bverc
+
+Lays out device and environment icons as consecutive cells of a single
+pre-composited strip, and re-blits only the cells whose content changed.
+"""
+
+from PIL import Image
+
+class StatusBar:
+    """A fixed size strip of icon cells anchored to the left or right of the screen."""
+
+    def __init__(self, capacity, size, padding, horizontal="right"):
+        """Initialise an empty strip with room for capacity icons."""
+        self.size = int(size)
+        self.padding = int(padding)
+        self.horizontal = horizontal
+        self.width = capacity * (self.size + self.padding) - self.padding
+        self.image = Image.new("RGBA", (self.width, self.size))
+        self.cells = [None] * capacity
+
+    def cell_x(self, index):
+        """Return x position of cell index relative to the strip."""
+        step = (self.size + self.padding) * index
+        if self.horizontal == "right":
+            return self.width - self.size - step
+        return step
+
+    def x_pos(self, screen_width):
+        """Return x position of the strip on a screen screen_width wide."""
+        if self.horizontal == "right":
+            return int(screen_width) - self.padding - self.width
+        return self.padding
+
+    def render(self, icons, alpha, loader):
+        """Lay out icons, a list of (name, state), in order and re-blit changed cells.
+
+        loader is called with state and alpha to get an RGBA image, such as IconAtlas.get,
+        and may return None to leave the cell blank.
+        Return list of cell indexes which were redrawn.
+        """
+        cells = [(state, str(alpha)) for (_, state) in icons][:len(self.cells)]
+        cells += [None] * (len(self.cells) - len(cells))
+        dirty = [index for index, cell in enumerate(cells) if cell != self.cells[index]]
+        for index in dirty:
+            box = (self.cell_x(index), 0, self.cell_x(index) + self.size, self.size)
+            self.image.paste((0, 0, 0, 0), box)
+            image = loader(*cells[index]) if cells[index] is not None else None
+            if image is not None:
+                self.image.alpha_composite(image, box[:2])
+            self.cells[index] = cells[index]
+        return dirty
+
+    @property
+    def empty(self):
+        """Return True if no cells contain an icon."""
+        return all(cell is None for cell in self.cells)
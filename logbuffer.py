@@ -0,0 +1,61 @@
+"""Log buffer for retropie-status-overlay
+github.com/bverc/retropie-status-overlay
+
+Author: bverc
+
+Holds log records in memory and passes them to the file handler in batches,
+when enough are pending, after an interval, or at once for warnings, so the
+SD card sees a few large writes instead of one per status line.
+
+Consecutive identical lines are collapsed into a single "unchanged xN" line.
+"""
+
+import logging
+import logging.handlers
+import time
+
+class BufferedHandler(logging.handlers.MemoryHandler):
+    """A MemoryHandler which also flushes after an interval and collapses repeated lines."""
+
+    def __init__(self, target, capacity=100, interval=600):
+        """Buffer up to capacity records for target, flushing at least every interval seconds."""
+        super().__init__(capacity, logging.WARNING, target)
+        self.interval = interval
+        self.flushed_at = time.monotonic()
+        self.last = None
+        self.repeat = None
+        self.repeats = 0
+
+    def emit(self, record):
+        """Buffer record, or count it if it repeats the previous one."""
+        if (self.last is not None and record.levelno == self.last.levelno
+                and record.getMessage() == self.last.getMessage()):
+            self.repeat = record
+            self.repeats += 1
+        else:
+            self.collapse()
+            self.last = record
+            self.buffer.append(record)
+        if self.shouldFlush(record):
+            self.flush()
+
+    def collapse(self):
+        """Buffer a single record in place of any counted repeats."""
+        if self.repeats:
+            summary = logging.makeLogRecord(self.repeat.__dict__)
+            summary.msg = "unchanged ×%d"
+            summary.args = (self.repeats,)
+            self.buffer.append(summary)
+            self.repeats = 0
+
+    def shouldFlush(self, record):
+        """Return True if buffer is full, record is a warning, or interval has passed."""
+        return (super().shouldFlush(record)
+                or time.monotonic() - self.flushed_at >= self.interval)
+
+    def flush(self):
+        """Pass all buffered records to target now."""
+        with self.lock:
+            self.collapse()
+            super().flush()
+            self.flushed_at = time.monotonic()
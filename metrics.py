@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""Metrics store for retropie-status-overlay
+github.com/bverc/retropie-status-overlay
+
+Author: bverc
+
+Records battery voltage and current, wifi quality, volume and throttle flags to a ring
+file of fixed size records, memory-mapped so appending costs no system calls.
+Samples are written to the file in batches to keep SD card writes down.
+
+Records carry a sequence number and a CRC, so the ring's head is found again
+on start without a header to update, and a record torn by a power cut is
+simply skipped.
+
+Run directly to print history as CSV: metrics.py [file] [bucket seconds]
+"""
+
+import math
+import mmap
+import os
+import struct
+import sys
+import time
+import zlib
+from collections import namedtuple
+
+import atomicfile
+
+# Magic, version, record size, capacity
+HEADER = struct.Struct("=4sHHI")
+MAGIC = b"RSOM"
+VERSION = 1
+# Sequence, time, voltage, wifi quality, volume, current (mA), throttle flags, CRC of all before
+RECORD = struct.Struct("=IIfbbhII")
+CURRENT_UNKNOWN = -32768
+
+Sample = namedtuple("Sample", ["time", "voltage", "quality", "volume", "throttle", "current"],
+                    defaults=[None])
+Aggregate = namedtuple("Aggregate", ["time", "count", "voltage_min", "voltage_mean",
+                                     "voltage_max", "quality", "volume", "throttle", "current"])
+
+def pack(seq, sample):
+    """Return record for sample, with None values stored as NaN, -1 or CURRENT_UNKNOWN."""
+    voltage = math.nan if sample.voltage is None else sample.voltage
+    quality = -1 if sample.quality is None else min(int(sample.quality), 127)
+    volume = -1 if sample.volume is None else min(int(sample.volume), 127)
+    current = CURRENT_UNKNOWN
+    if sample.current is not None:
+        current = min(max(int(round(sample.current * 1000)), CURRENT_UNKNOWN + 1), 32767)
+    data = RECORD.pack(seq, int(sample.time), voltage, quality, volume, current,
+                       sample.throttle, 0)
+    return data[:-4] + struct.pack("=I", zlib.crc32(data[:-4]))
+
+def unpack(data):
+    """Return (sequence, sample) from record, or None if record is empty or torn."""
+    (seq, timestamp, voltage, quality, volume, current, throttle, crc) = RECORD.unpack(data)
+    if seq == 0 or crc != zlib.crc32(data[:-4]):
+        return None
+    if current == CURRENT_UNKNOWN:
+        current = None
+    else:
+        current /= 1000
+    return seq, Sample(timestamp, None if math.isnan(voltage) else voltage,
+                       None if quality < 0 else quality, None if volume < 0 else volume,
+                       throttle, current)
+
+def mean(values):
+    """Return mean of values, or None if there are none."""
+    return sum(values) / len(values) if values else None
+
+class MetricsStore:
+    """An append-only ring of samples, overwriting the oldest when full."""
+
+    def __init__(self, path, capacity=20160, flush_every=10):
+        """Open ring file at path, creating it with room for capacity samples.
+
+        An existing file keeps the capacity it was created with.
+        Samples are buffered and written flush_every at a time.
+        """
+        if not os.path.exists(path) or os.path.getsize(path) < HEADER.size:
+            with atomicfile.replace(path) as file:
+                file.write(HEADER.pack(MAGIC, VERSION, RECORD.size, capacity))
+                file.truncate(HEADER.size + capacity * RECORD.size)
+        with open(path, "r+b") as file:
+            self.map = mmap.mmap(file.fileno(), 0)
+        (magic, version, size, self.capacity) = HEADER.unpack_from(self.map)
+        if magic != MAGIC or version != VERSION or size != RECORD.size or \
+                len(self.map) < HEADER.size + self.capacity * RECORD.size:
+            self.map.close()
+            raise ValueError("Not a metrics file: " + path)
+        self.flush_every = flush_every
+        self.pending = []
+
+        # Head follows the record with the highest sequence number
+        self.seq = 0
+        self.index = 0
+        for index in range(self.capacity):
+            record = unpack(self.read(index))
+            if record is not None and record[0] > self.seq:
+                self.seq = record[0]
+                self.index = (index + 1) % self.capacity
+
+    def read(self, index):
+        """Return raw record at index."""
+        offset = HEADER.size + index * RECORD.size
+        return self.map[offset:offset + RECORD.size]
+
+    def append(self, sample):
+        """Add sample, a Sample, writing buffered samples to file once enough are pending."""
+        self.pending.append(sample)
+        if len(self.pending) >= self.flush_every:
+            self.flush()
+
+    def record(self, voltage=None, quality=None, volume=None, throttle=0, current=None):
+        """Add a sample of current values, None for any which are unknown."""
+        self.append(Sample(int(time.time()), voltage, quality, volume, throttle, current))
+
+    def flush(self):
+        """Write pending samples to file and sync it to storage."""
+        if not self.pending:
+            return
+        for sample in self.pending:
+            self.seq += 1
+            offset = HEADER.size + self.index * RECORD.size
+            self.map[offset:offset + RECORD.size] = pack(self.seq, sample)
+            self.index = (self.index + 1) % self.capacity
+        self.pending = []
+        self.map.flush()
+
+    def samples(self, start=None, end=None):
+        """Return list of samples, oldest first, with start <= time < end if given."""
+        samples = []
+        for offset in range(self.capacity):
+            record = unpack(self.read((self.index + offset) % self.capacity))
+            if record is not None:
+                samples.append(record[1])
+        return [sample for sample in samples + self.pending
+                if (start is None or sample.time >= start) and (end is None or sample.time < end)]
+
+    def downsample(self, bucket, start=None, end=None):
+        """Return list of Aggregate, one per bucket seconds which has samples."""
+        buckets = {}
+        for sample in self.samples(start, end):
+            buckets.setdefault(sample.time - sample.time % bucket, []).append(sample)
+        aggregates = []
+        for (bucket_time, samples) in sorted(buckets.items()):
+            voltages = [sample.voltage for sample in samples if sample.voltage is not None]
+            throttle = 0
+            for sample in samples:
+                throttle |= sample.throttle
+            aggregates.append(Aggregate(
+                bucket_time, len(samples), min(voltages, default=None), mean(voltages),
+                max(voltages, default=None),
+                mean([sample.quality for sample in samples if sample.quality is not None]),
+                mean([sample.volume for sample in samples if sample.volume is not None]),
+                throttle,
+                mean([sample.current for sample in samples if sample.current is not None])))
+        return aggregates
+
+    def close(self):
+        """Write pending samples and close file."""
+        self.flush()
+        self.map.close()
+
+def open_existing(path):
+    """Return store of existing file at path, exit with a message if it cannot be read."""
+    if not os.path.exists(path):
+        sys.exit(f"No metrics file {path}, set [Metrics] Enabled = True to record one")
+    try:
+        return MetricsStore(path)
+    except (OSError, ValueError) as error:
+        sys.exit(f"Unable to read metrics file: {error}")
+
+def main():
+    """Print history as CSV, downsampled if a bucket size is given."""
+    path = os.path.dirname(os.path.realpath(__file__)) + "/metrics.dat"
+    if len(sys.argv) > 1:
+        path = sys.argv[1]
+    store = open_existing(path)
+    if len(sys.argv) > 2:
+        print(",".join(Aggregate._fields))
+        rows = store.downsample(int(sys.argv[2]))
+    else:
+        print(",".join(Sample._fields))
+        rows = store.samples()
+    for row in rows:
+        print(",".join("" if value is None else str(value) for value in row))
+    store.close()
+
+if __name__ == "__main__":
+    main()
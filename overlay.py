@@ -5,151 +5,251 @@ github.com/bverc/retropie-status-overlay
 Authors: d-rez, bverc, louisvarley
 
 Requires:
-- pngview by AndrewFromMelbourne
+- pngview by AndrewFromMelbourne (if Dispmanx is unavailable)
+- Pillow
 - an entry in crontab
 """
 
-import time
-import subprocess
 import os
-import re
+import signal
+import sys
 import logging
 import logging.handlers
 import configparser
-from datetime import datetime
 
-import psutil
-try:
-    from RPi import GPIO
-except RuntimeError:
-    print("This module can only be run on a Raspberry Pi!")
-    print("Proceeding, as likely a unit test.")
-
-from devices import wifi, audio, bluetooth, battery
+import atlas
+import compositor
+import configreload
+import display
+import events
+import layout
+import logbuffer
+import metrics
+import plugins
+import probe
+import procwatch
+import settings
+import startup
+import throttle
+
+# Imported by setup_gpio() only if GPIO interrupts are enabled
+GPIO = None
+# Channels with interrupts set up, removed again on config reload
+gpio_channels = []
 
 # Load Configuration
+CONFIG_FILE = os.path.dirname(os.path.realpath(__file__)) + '/config.ini'
 config = configparser.ConfigParser()
-config.read(os.path.dirname(os.path.realpath(__file__)) + '/config.ini')
+config.read(CONFIG_FILE)
+
+# Resolution and icons shown by the previous run, so icons can be drawn before anything is detected
+startup_timer = startup.StartupTimer()
+STARTUP_CACHE = os.path.dirname(os.path.realpath(__file__)) + "/startup_cache.json"
+startup_cache = startup.load_cache(STARTUP_CACHE)
 
 # Set up logging
 logfile = os.path.dirname(os.path.realpath(__file__)) + "/overlay.log"
 my_logger = logging.getLogger('MyLogger')
 my_logger.setLevel(logging.INFO)
+log_format = logging.Formatter("%(asctime)s %(message)s")
 handler = logging.handlers.RotatingFileHandler(logfile, maxBytes=102400, backupCount=1)
-my_logger.addHandler(handler)
+handler.setFormatter(log_format)
+# Write log to SD card in batches, at least every LOG_FLUSH_INTERVAL seconds
+LOG_BUFFER_RECORDS = 100
+LOG_FLUSH_INTERVAL = 600
+log_buffer = logbuffer.BufferedHandler(handler, LOG_BUFFER_RECORDS, LOG_FLUSH_INTERVAL)
+my_logger.addHandler(log_buffer)
 console = logging.StreamHandler()
+console.setFormatter(log_format)
 my_logger.addHandler(console)
 
-# Get Framebuffer resolution
-FB_FILE = "tvservice -s"
+# Settings are checked once here, device plugins read their own options from config
+# Neither this nor anything else before cached icons are shown imports device plugins or looks up
+# those installed by other packages, so the first icons are drawn quickly
 try:
-    FB_OUTPUT = subprocess.check_output(FB_FILE.split()).decode().rstrip()
-    resolution = re.search(r"(\d{3,}x\d{3,})", FB_OUTPUT).group().split('x')
-except FileNotFoundError:
-    resolution = ['1920', '1080'] # Default to 1080p if unable to check
+    options = settings.Settings.from_config(config)
+except settings.SettingsError as config_error:
+    my_logger.error("Invalid config.ini: %s", config_error)
+    log_buffer.flush()
+    sys.exit(1)
+
+def detect_resolution():
+    """Return screen resolution as [width, height]."""
+    return display.resolution(options.icons.connector)
+
+# Cached resolution is checked once icons are shown
+resolution = list(startup_cache.get("resolution") or detect_resolution())
 my_logger.info(resolution)
 
 # Setup icons
-ICON_PATH = os.path.dirname(os.path.realpath(__file__)) + "/colored_icons/"
-ICON_SIZE = config['Icons']['Size']
-ICON_PADDING = config['Icons']['Padding']
-
-PNGVIEW_PATH = "/usr/local/bin/pngview"
-Y_POS = ICON_PADDING
-if config['Icons']['Vertical'] == "bottom":
-    Y_POS = str(int(resolution[1]) - int(ICON_SIZE) - int(ICON_PADDING))
-
-def pngview(device, x_pos, y_pos, icon_path, alpha=255):
-    """Call pngview from binary location."""
-    call = [PNGVIEW_PATH, "-d", "0", "-b", "0x0000",
-            "-n", "-l", "15000", "-y", str(y_pos), "-x", str(x_pos)]
-    if int(alpha) < 255:
-        call += ["-a", str(alpha)]
-    call += [icon_path]
-    kill_overlay_process(device)
-    overlay_processes[device] = subprocess.Popen(call) # pylint: disable=consider-using-with
-
-icons = {
-    "under-voltage": ICON_PATH + "flash_" + ICON_SIZE + ".png",
-    "freq-capped": ICON_PATH + "thermometer_" + ICON_SIZE + ".png",
-    "throttled": ICON_PATH + "thermometer-lines_" + ICON_SIZE + ".png",
-}
-for module in [wifi, bluetooth, audio, battery]:
-    module.add_icons(icons, ICON_PATH, ICON_SIZE)
-
-ENV_CMD = "vcgencmd get_throttled"
-
-def get_x_pos(count):
-    """Return x position for next icon based on number or icons already displayed."""
-    if config['Icons']['Horizontal'] == "right":
-        return int(resolution[0]) - (int(ICON_SIZE) + int(ICON_PADDING)) * count
-    return int(ICON_PADDING) + (int(ICON_SIZE) + int(ICON_PADDING)) * (count - 1)
-
-def environment():
-    """Return state of environment, such as unndervoltage or throttled."""
-    env_output = subprocess.check_output(ENV_CMD.split()).decode().rstrip()
-    val = int(re.search(r"throttled=(0x\d+)", env_output).groups()[0], 16)
-    env = {
-        "under-voltage": bool(val & 0x01),
-        "freq-capped": bool(val & 0x02),
-        "throttled": bool(val & 0x04)
+ICON_CACHE = os.path.dirname(os.path.realpath(__file__)) + "/icon_cache/"
+ENV_ICONS = ["under-voltage", "freq-capped", "throttled"]
+
+def icon_settings():
+    """Return (color, path, size) of icons, with size as in icon file names."""
+    # Icons are tinted at runtime if a color is configured, else use icons colored by an
+    # older install, if there are any, or the monochrome icons as they are
+    color = options.icons.color or None
+    path = os.path.dirname(os.path.realpath(__file__)) + "/colored_icons/"
+    if color or not os.path.isdir(path):
+        path = os.path.dirname(os.path.realpath(__file__)) + "/overlay_icons/"
+    return color, path, str(options.icons.size)
+
+def base_icons(path, size):
+    """Return dict of icons which are not provided by device plugins."""
+    return {
+        "under-voltage": path + "flash_" + size + ".png",
+        "freq-capped": path + "thermometer_" + size + ".png",
+        "throttled": path + "thermometer-lines_" + size + ".png",
+        "battery_critical_shutdown": path + "battery-alert_120.png",
     }
-    return env
 
-def check_process(process):
-    """Check to see if process is already running."""
-    #Iterate over the all the running process
-    for proc in psutil.process_iter():
-        try:
-            # Check if process name contains the given name string.
-            if process.lower() in proc.name().lower():
-                return True
-        except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
-            pass
-    return False
-
-def kill_overlay_process(device):
-    """Kill process for specific icon type."""
-    if device in overlay_processes:
-        overlay_processes[device].kill()
-        del overlay_processes[device]
-
-def interrupt_shutdown(channel):
-    """Shutdown system if interrupt activated."""
-    if channel == int(config['BatteryLDO']['GPIO']):
-        if GPIO.input(channel) != config.getboolean('BatteryLDO', 'ActiveLow'):
+def new_status_layout():
+    """Return empty status bar layout with a cell for each enabled device and warning."""
+    return layout.StatusBar(len(options.detection.devices) + len(ENV_ICONS), options.icons.size,
+                            options.icons.padding, options.icons.horizontal)
+
+(ICON_COLOR, ICON_PATH, ICON_SIZE) = icon_settings()
+ICON_SET = [ICON_PATH, ICON_SIZE, ICON_COLOR]
+
+# One overlay for the whole status bar, one for the shutdown warning
+status_bar = compositor.Overlay("status", options.icons.display)
+caution = compositor.Overlay("caution", options.icons.display)
+status_layout = new_status_layout()
+
+icons = base_icons(ICON_PATH, ICON_SIZE)
+# Device icons are added as device plugins are loaded
+icon_atlas = atlas.IconAtlas(icons, ICON_SIZE, ICON_COLOR or None, cache_dir=ICON_CACHE)
+
+throttle_monitor = throttle.ThrottleMonitor()
+
+# Device checks run in parallel, one which takes too long keeps its last state
+PROBE_WORKERS = 4
+probe_pool = probe.ProbePool(PROBE_WORKERS, options.detection.probe_timeout)
+
+# Poll intervals in seconds, (min, max), for checks which have no device module
+ENV_POLL_INTERVAL = (5, 30)
+INGAME_POLL_INTERVAL = (2, 10)
+DISPLAY_POLL_INTERVAL = (60, 600)
+
+# Options which set up GPIO interrupts again on config reload
+GPIO_CONFIG = [("Detection", "BatteryLDO"), ("Detection", "ShutdownGPIO"),
+               ("BatteryLDO", "*"), ("ShutdownGPIO", "*")]
+
+METRICS_FILE = os.path.dirname(os.path.realpath(__file__)) + "/metrics.dat"
+
+def environment():
+    """Return state of environment, such as unndervoltage or throttled.
+
+    A warning is also shown once if it occurred since the last check, even if no longer active.
+    """
+    return throttle_monitor.state()
+
+def get_y_pos():
+    """Return y position of status bar."""
+    if options.icons.vertical == "bottom":
+        return int(resolution[1]) - options.icons.size - options.icons.padding
+    return options.icons.padding
+
+def load_icon(state, alpha="255"):
+    """Return icon image for state, or None if its file cannot be read."""
+    try:
+        return icon_atlas.get(state, alpha)
+    except OSError as error:
+        my_logger.warning("Unable to load icon for %s: %s", state, error)
+        return None
+
+def render_status_bar(status_icons, alpha):
+    """Lay out status icons, a list of (name, state), and update the status bar overlay."""
+    if not status_layout.render(status_icons, alpha, load_icon):
+        return
+    if status_layout.empty:
+        status_bar.hide()
+    else:
+        status_bar.update(status_layout.image, status_layout.x_pos(resolution[0]), get_y_pos())
+
+def show_cached_icons():
+    """Draw icons shown by the previous run, if they are from the same icon set."""
+    if startup_cache.get("icon_set") != ICON_SET:
+        return
+    cached = [(state, path) for (state, path) in startup_cache.get("icons", [])
+              if os.path.exists(path)]
+    for (state, path) in cached:
+        icon_atlas.icons.setdefault(state, path)
+    render_status_bar([(None, state) for (state, _) in cached], startup_cache.get("alpha", "255"))
+
+def save_startup_cache():
+    """Save resolution and icons currently shown for the next start."""
+    cells = [cell for cell in status_layout.cells if cell is not None]
+    cache = {"resolution": resolution, "icon_set": ICON_SET,
+             "icons": [[state, icon_atlas.icons[state]] for (state, _) in cells],
+             "alpha": cells[0][1] if cells else "255"}
+    try:
+        startup.save_cache(STARTUP_CACHE, cache)
+    except OSError as error:
+        my_logger.warning("Unable to save startup cache: %s", error)
+
+def update_resolution():
+    """Detect resolution, moving overlays if it changed, return whether it changed."""
+    detected = detect_resolution()
+    if detected == resolution:
+        return False
+    my_logger.info(detected)
+    resolution[:] = detected
+    if status_bar.visible:
+        status_bar.update(status_layout.image, status_layout.x_pos(resolution[0]), get_y_pos())
+    if caution.visible:
+        show_caution()
+    return True
+
+def interrupt_shutdown(channel, scheduler):
+    """Shutdown system if interrupt activated, called from the main loop."""
+    if channel == options.battery_ldo.gpio:
+        if GPIO.input(channel) != options.battery_ldo.active_low:
             shutdown()
         else:
             abort_shutdown()
-    elif channel == int(config['ShutdownGPIO']['GPIO']):
-        if GPIO.input(channel) != config.getboolean('ShutdownGPIO', 'ActiveLow'):
-            time.sleep(1)
-            if GPIO.input(channel) != config.getboolean('ShutdownGPIO', 'ActiveLow'):
-                my_logger.warning("Shutdown button pressed, shutting down now.")
-                os.system("sudo shutdown -P now")
-            else:
-                my_logger.info("Shutdown button pressed, but not long enough to trigger Shutdown.")
+    elif channel == options.shutdown_gpio.gpio:
+        if GPIO.input(channel) != options.shutdown_gpio.active_low:
+            # Check again once the button has been held for a second
+            scheduler.call_later("shutdown_button", 1)
+
+def shutdown_button():
+    """Shutdown system now if shutdown button is still held."""
+    if GPIO.input(options.shutdown_gpio.gpio) != options.shutdown_gpio.active_low:
+        my_logger.warning("Shutdown button pressed, shutting down now.")
+        log_buffer.flush()
+        os.system("sudo shutdown -P now")
+    else:
+        my_logger.info("Shutdown button pressed, but not long enough to trigger Shutdown.")
+
+def show_caution():
+    """Show shutdown warning in the centre of the screen."""
+    x_pos = int(resolution[0]) / 2 - 60
+    y_pos = int(resolution[1]) / 2 - 60
+    image = load_icon("battery_critical_shutdown")
+    if image is not None:
+        caution.update(image, x_pos, y_pos)
 
 def shutdown():
     """Shutdown system in 60 seconds."""
     my_logger.warning("Low Battery. Initiating shutdown in 60 seconds.")
-    x_pos = int(resolution[0]) / 2 - 60
-    y_pos = int(resolution[1]) / 2 - 60
-    pngview("caution", x_pos, y_pos, icons["battery_critical_shutdown"])
+    show_caution()
+    log_buffer.flush()
     os.system("sudo shutdown -P +1")
 
 def abort_shutdown():
     """Abort pending shutdown."""
     os.system("sudo shutdown -c")
-    kill_overlay_process("caution")
+    caution.hide()
     my_logger.info("Power Restored, shutdown aborted.")
 
 def adc_shutdown(shutdown_pending, voltage):
     """Check if battery voltage should trigger a shutdown or recover a pending shutdown."""
-    if shutdown_pending and voltage > config.getfloat("Detection", "VMinCharging"):
+    if shutdown_pending and voltage > options.detection.vmin_charging:
         abort_shutdown()
         shutdown_pending = False
-    elif voltage < config.getfloat("Detection", "VMinDischarging"):
+    elif voltage < options.detection.vmin_discharging:
         shutdown()
         shutdown_pending = True
     return shutdown_pending
@@ -157,80 +257,329 @@ def adc_shutdown(shutdown_pending, voltage):
 def get_alpha(ingame):
     """Get alpha value if in game, otherwise max."""
     if ingame:
-        return config['Detection']['InGameAlpha']
+        return options.detection.ingame_alpha
     return "255"
 
-def setup_interrupts():
-    """setup interrupts for shutdown."""
-    GPIO.setmode(GPIO.BCM)
-    for interrupt in ['BatteryLDO', 'ShutdownGPIO']:
-        if config.getboolean('Detection', interrupt):
-            channel = config[interrupt]['GPIO']
-            my_logger.info("%s active on GPIO %s", interrupt, channel)
-            GPIO.setup(int(channel), GPIO.IN, pull_up_down=GPIO.PUD_UP)
-            GPIO.add_event_detect(int(channel), GPIO.BOTH, callback=interrupt_shutdown,
-                                  bouncetime=500)
-
-def update_device_icon(count, device, states, new_ingame, alpha):
-    """Check if device states hav changed; if so, update icons."""
-    (new_state, info) = device.get_state()
-    if new_state != states[device.NAME] or new_ingame != states["ingame"]:
-        pngview(device.NAME, get_x_pos(count), Y_POS, icons[new_state], alpha)
-        states[device.NAME] = new_state
-    return info
-
-def update_env_icons(count, alpha):
-    """Check environment status, and display any relevant icons."""
-    env = environment()
+def load_gpio():
+    """Import RPi.GPIO if not already imported."""
+    global GPIO # pylint: disable=global-statement
+    if GPIO is None:
+        from RPi import GPIO as rpi_gpio # pylint: disable=import-outside-toplevel
+        GPIO = rpi_gpio
+
+def setup_interrupts(scheduler):
+    """setup interrupts for shutdown, return queue of channels to pass to interrupt_shutdown().
+
+    GPIO callbacks run on their own thread, so they only queue the channel for the main loop.
+    """
+    gpio_events = events.ThreadEvents()
+    scheduler.register(gpio_events, "gpio")
+    setup_gpio(gpio_events)
+    return gpio_events
+
+def setup_gpio(gpio_events):
+    """Set up interrupts enabled in config, removing any set up before, posting to gpio_events."""
+    for channel in gpio_channels:
+        GPIO.remove_event_detect(channel)
+    gpio_channels.clear()
+    interrupts = [interrupt for interrupt in [options.battery_ldo, options.shutdown_gpio]
+                  if interrupt.enabled]
+    if interrupts:
+        load_gpio()
+        GPIO.setmode(GPIO.BCM)
+    for interrupt in interrupts:
+        my_logger.info("%s active on GPIO %s", interrupt.name, interrupt.gpio)
+        GPIO.setup(interrupt.gpio, GPIO.IN, pull_up_down=GPIO.PUD_UP)
+        GPIO.add_event_detect(interrupt.gpio, GPIO.BOTH, callback=gpio_events.post,
+                              bouncetime=500)
+        gpio_channels.append(interrupt.gpio)
+
+def set_device_state(name, states, result):
+    """Store (state, info) result of device check, return whether it changed and info."""
+    (new_state, info) = result
+    changed = new_state != states[name]
+    states[name] = new_state
+    return changed, info
+
+def set_env_state(states, env):
+    """Store environment status, return whether it changed and text for log."""
     env_text = 'normal'
+    active = []
     for key, value in env.items():
         if value:
             env_text = key
-            if not key in overlay_processes:
-                count += 1
-                pngview(key, get_x_pos(count), Y_POS, icons[key], alpha)
+            active.append(key)
+    changed = active != states["environment"]
+    states["environment"] = active
+    return changed, env_text
+
+def get_status_icons(devices, states):
+    """Return list of (name, state) for all devices and active environment warnings."""
+    status_icons = [(device.NAME, states[device.NAME]) for device in devices
+                    if states[device.NAME] is not None]
+    return status_icons + [(key, key) for key in states["environment"]]
+
+def poll(due, devices, states, scheduler):
+    """Poll due devices and environment in parallel, return dict of info for log."""
+    probes = {device.NAME: device.get_state for device in devices if device.NAME in due}
+    # Environment task is removed, though may already be due, if a reload hides warnings
+    if "environment" in due and not options.detection.hide_env_warnings:
+        probes["environment"] = environment
+    (results, stale) = probe_pool.run(probes)
+    for name in stale:
+        # Keep last known state until the check finishes
+        my_logger.info("%s: %s stale, check timed out", name, states[name])
+        scheduler.report(name, False)
+    info = {}
+    for (name, result) in results.items():
+        if name == "environment":
+            (changed, info[name]) = set_env_state(states, result)
         else:
-            kill_overlay_process(key)
-    return env_text
+            (changed, info[name]) = set_device_state(name, states, result)
+        scheduler.report(name, changed)
+    return info
 
-overlay_processes = {}
+def setup_scheduler(devices, game):
+    """Return scheduler for devices, game detection and environment checks."""
+    # Each device is polled at its own interval, and immediately on device events
+    scheduler = events.Scheduler()
+    scheduler.add("ingame", INGAME_POLL_INTERVAL)
+    for source in game.wakeup_sources():
+        scheduler.register(source, "ingame")
+    if not options.detection.hide_env_warnings:
+        scheduler.add("environment", ENV_POLL_INTERVAL)
+    # Resolution is checked when a display is connected or changes mode
+    scheduler.add("display", DISPLAY_POLL_INTERVAL)
+    for source in display.wakeup_sources():
+        scheduler.register(source, "display")
+    for device in devices:
+        scheduler.register_device(device)
+    return scheduler
+
+def format_info(devices, states, info):
+    """Return text for log of polled devices and environment."""
+    log = []
+    for device in devices:
+        if device.NAME in info:
+            log.append(f'{device.NAME}: {states[device.NAME]} {info[device.NAME]}')
+            text = getattr(device, "describe", lambda: "")()
+            if text:
+                log[-1] += f' ({text})'
+    if "environment" in info:
+        log.append(f'environment: {info["environment"]}')
+    return ", ".join(log)
+
+def open_metrics(scheduler):
+    """Return metrics store if enabled in config and schedule its samples, else None."""
+    if not options.metrics.enabled:
+        return None
+    try:
+        store = metrics.MetricsStore(METRICS_FILE, options.metrics.capacity)
+    except (OSError, ValueError) as error:
+        my_logger.warning("Unable to open metrics: %s", error)
+        return None
+    scheduler.add("metrics", (options.metrics.interval, options.metrics.interval))
+    return store
+
+def record_metrics(store, readings, devices):
+    """Add a sample of the latest device readings to metrics store."""
+    current = None
+    for device in devices:
+        current = getattr(device, "current", current)
+    store.record(readings.get("BatteryADC"), readings.get("Wifi"), readings.get("Audio"),
+                 throttle_monitor.read() or 0, current)
+
+def load_devices(kept=()):
+    """Import enabled device plugins and return their devices, logging any which failed to load.
+
+    Devices in kept are used for their plugins rather than creating them again.
+    """
+    (device_plugins, plugin_errors) = plugins.enabled_devices(config)
+    reused = {plugins.device_module(device): device for device in kept}
+    devices = []
+    for module in device_plugins:
+        if module in reused:
+            devices.append(reused[module])
+            continue
+        module.add_icons(icons, ICON_PATH, ICON_SIZE)
+        try:
+            devices.append(plugins.create_device(module, config))
+        except plugins.PluginError as error:
+            plugin_errors.append(str(error))
+            continue
+        my_logger.info("%s: %s", devices[-1].NAME,
+                       ", ".join(plugins.capabilities(module)) or "polled")
+    for error in plugin_errors:
+        my_logger.warning(error)
+    return devices
+
+def finish_startup():
+    """Report startup time and prepare for later redraws, once the first poll is shown."""
+    startup_timer.mark("first update")
+    my_logger.info(startup_timer.report())
+    save_startup_cache()
+    preload_icons()
+
+def preload_icons():
+    """Decode all icons now so later redraws need no file access."""
+    missing = icon_atlas.preload(["255", get_alpha(True)])
+    if missing:
+        my_logger.warning("Unable to load icons: %s", ", ".join(missing))
+
+def reload_icons():
+    """Set up icons, status bar layout and overlays again from config."""
+    global ICON_COLOR, ICON_PATH, ICON_SIZE, ICON_SET # pylint: disable=global-statement
+    global icon_atlas, status_layout # pylint: disable=global-statement
+    (ICON_COLOR, ICON_PATH, ICON_SIZE) = icon_settings()
+    ICON_SET = [ICON_PATH, ICON_SIZE, ICON_COLOR]
+    icons.clear()
+    icons.update(base_icons(ICON_PATH, ICON_SIZE))
+    for module in plugins.devices.loaded.values():
+        module.add_icons(icons, ICON_PATH, ICON_SIZE)
+    icon_atlas = atlas.IconAtlas(icons, ICON_SIZE, ICON_COLOR or None, cache_dir=ICON_CACHE)
+    status_layout = new_status_layout()
+    # Redrawn on the next render, on the configured display
+    shutdown_shown = caution.visible
+    for layer in (status_bar, caution):
+        layer.hide()
+        layer.display = options.icons.display
+    update_resolution()
+    if shutdown_shown:
+        show_caution()
+    preload_icons()
+
+def setup_reload(scheduler):
+    """Reload config on SIGHUP, such as from systemctl reload, or when the config file is saved.
+
+    Return queue of signals, to be emptied when the reload task is due.
+    """
+    reload_events = events.ThreadEvents()
+    scheduler.register(reload_events, "reload")
+    signal.signal(signal.SIGHUP, lambda signum, _: reload_events.post(signum))
+    try:
+        scheduler.register(events.InotifySource(CONFIG_FILE), "reload")
+    except OSError as error:
+        my_logger.warning("Unable to watch config file, reload with SIGHUP: %s", error)
+    return reload_events
+
+def reload_devices(devices, states, scheduler, changes):
+    """Set up devices again whose config changed or which were enabled, return devices."""
+    (modules, _) = plugins.enabled_devices(config)
+    kept = [device for device in devices if plugins.device_module(device) in modules
+            and not plugins.affected(device, changes)]
+    for device in devices:
+        if device not in kept:
+            scheduler.remove(device.NAME)
+            del states[device.NAME]
+    new_devices = load_devices(kept)
+    for device in new_devices:
+        if device not in kept:
+            states[device.NAME] = None
+            scheduler.register_device(device)
+    return new_devices
+
+def reload_config(devices, states, scheduler, gpio_events):
+    """Read config file again and set up only what changed options affect, return devices.
+
+    A config which is invalid is not applied. Settings the main loop reads, such as
+    VMinDischarging or InGameAlpha, apply from the next update.
+    """
+    global options # pylint: disable=global-statement
+    try:
+        new_config = configreload.read(CONFIG_FILE)
+        new_options = settings.Settings.from_config(new_config)
+    except (configparser.Error, settings.SettingsError) as error:
+        my_logger.error("Config not reloaded, invalid config.ini: %s", error)
+        return devices
+    changes = configreload.diff(config, new_config)
+    if not changes:
+        return devices
+    configreload.apply(config, new_config)
+    options = new_options
+    my_logger.info("Config reloaded, changed: %s",
+                   ", ".join(f"[{section}] {option}" for (section, option) in sorted(changes)))
+    new_devices = reload_devices(devices, states, scheduler, changes)
+    if configreload.matches(changes, [("Icons", "*")]) or \
+            [device.NAME for device in new_devices] != [device.NAME for device in devices]:
+        reload_icons()
+    if configreload.matches(changes, GPIO_CONFIG):
+        setup_gpio(gpio_events)
+    probe_pool.timeout = options.detection.probe_timeout
+    if options.detection.hide_env_warnings:
+        scheduler.remove("environment")
+        states["environment"] = []
+    elif "environment" not in scheduler.intervals:
+        scheduler.add("environment", ENV_POLL_INTERVAL)
+    if configreload.matches(changes, [("Metrics", "*")]):
+        my_logger.warning("Metrics settings take effect when the overlay is restarted.")
+    return new_devices
 
 def main():
     """ Main Function."""
-    states = {"Wifi": None, "Bluetooth": None, "Audio": None, "BatteryADC": None, "ingame": None}
-    devices = [wifi, bluetooth, audio]
-    if config.getboolean('Detection', 'BatteryADC'):
-        bat = battery.Battery(config)
-        devices.append(bat)
+    show_cached_icons()
+    startup_timer.mark("cached icons")
+    devices = load_devices()
+    states = {"environment": [], "ingame": False}
+    states.update({device.NAME: None for device in devices})
     shutdown_pending = False
-    setup_interrupts()
+    # Stopping the service, such as at system shutdown, runs cleanup below
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+
+    game = procwatch.ProcessWatcher('retroarch')
+    scheduler = setup_scheduler(devices, game)
+    gpio_events = setup_interrupts(scheduler)
+    reload_events = setup_reload(scheduler)
+    store = open_metrics(scheduler)
+    readings = {}
+    startup_timer.mark("devices")
+    starting = True
 
     # Main Loop
-    while True:
-        count = 0
-        log = str(datetime.now())
-
-        # Check if retroarch is running then set alpha
-        new_ingame = check_process('retroarch')
-        alpha = get_alpha(new_ingame)
-
-        # Device Icons
-        for device in devices:
-            if config.getboolean('Detection', device.NAME):
-                count += 1
-                info = update_device_icon(count, device, states, new_ingame, alpha)
-                log = log + f', {device.NAME}: {states[device.NAME]} {info}'
-                if device.NAME == "BatteryADC" and config.getboolean('Detection', 'ADCShutdown'):
-                    shutdown_pending = adc_shutdown(shutdown_pending, info)
-
-        # Enviroment Icons
-        if not config.getboolean('Detection', 'HideEnvWarnings'):
-            env_text = update_env_icons(count, alpha)
-            log = log + f', environment: {env_text}'
-
-        my_logger.info(log)
-        states["ingame"] = new_ingame
-        time.sleep(5)
+    try:
+        while True:
+            due = scheduler.wait()
+
+            for channel in gpio_events.pop():
+                interrupt_shutdown(channel, scheduler)
+            if "shutdown_button" in due:
+                shutdown_button()
+
+            if "reload" in due:
+                reload_events.pop()
+                devices = reload_config(devices, states, scheduler, gpio_events)
+
+            if "display" in due:
+                scheduler.report("display", update_resolution())
+
+            # Check if retroarch is running, icons are drawn with alpha when in game
+            if "ingame" in due:
+                new_ingame = game.running()
+                scheduler.report("ingame", new_ingame != states["ingame"])
+                states["ingame"] = new_ingame
+
+            info = poll(due, devices, states, scheduler)
+            voltage = info.get("BatteryADC")
+            if voltage is not None and options.detection.adc_shutdown:
+                shutdown_pending = adc_shutdown(shutdown_pending, voltage)
+
+            readings.update(info)
+            if "metrics" in due:
+                record_metrics(store, readings, devices)
+                scheduler.report("metrics", False)
+
+            render_status_bar(get_status_icons(devices, states), get_alpha(states["ingame"]))
+
+            if info:
+                my_logger.info(format_info(devices, states, info))
+            if starting:
+                finish_startup()
+                starting = False
+    finally:
+        save_startup_cache()
+        if store is not None:
+            store.close()
+        probe_pool.close()
+        log_buffer.flush()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,165 @@
+"""Plugin registry for retropie-status-overlay
+github.com/bverc/retropie-status-overlay
+
+Author: bverc
+
+Finds device plugins in devices/ and ADC plugins in adc/ without importing
+them, along with any installed by other packages through entry points in the
+retropie_status_overlay.devices and retropie_status_overlay.adc groups.
+A plugin is only imported once it is enabled, so the libraries of unused
+plugins, such as Adafruit or pijuice, are never loaded. Entry points are only
+looked up for a name which is not built in, as scanning installed packages is
+slow on a Pi Zero.
+
+A device plugin is a module with add_icons(icons, iconpath, size) and either
+NAME and get_state(), or create(config) returning an object with them. It may
+also define POLL_INTERVAL, configure(config), wakeup_sources() and describe(),
+and CONFIG, a list of (section, option) patterns it reads, so that it is set up
+again when they change on reload. It is enabled by [Detection] <name> = True.
+
+An ADC plugin is a module with read(channel), and optionally
+read_many(channel, samples).
+"""
+
+import configparser
+from fnmatch import fnmatchcase
+import importlib
+import inspect
+import os
+import pkgutil
+
+import configreload
+
+ENTRY_POINT_GROUP = "retropie_status_overlay."
+
+# Optional functions a plugin may define, reported as its capabilities
+CAPABILITIES = ["configure", "create", "wakeup_sources", "describe", "read_many"]
+
+# [Detection] options enabling built-in devices whose option differs from the module name
+DEVICE_OPTIONS = {"batteryadc": "battery"}
+# [Detection] options of the overlay and built-in devices, which never name a plugin
+OVERLAY_OPTIONS = ["adcshutdown", "batteryldo", "shutdowngpio", "hideenvwarnings", "ingamealpha",
+                   "probetimeout", "adctype", "adcgain", "adcchannel*", "adcsamples", "capacity",
+                   "vm*", "estimator", "hysteresis", "dischargecurve"]
+TRUE_STATES = ["1", "yes", "true", "on"]
+
+class PluginError(ImportError):
+    """A plugin could not be found or imported."""
+
+class Registry:
+    """Plugins of one kind, imported on first use."""
+
+    def __init__(self, package):
+        """Find plugins in directory package next to this file, and in its entry point group."""
+        directory = os.path.join(os.path.dirname(os.path.realpath(__file__)), package)
+        self.group = ENTRY_POINT_GROUP + package
+        # name: module path or entry point
+        self.plugins = {module.name: package + "." + module.name
+                        for module in pkgutil.iter_modules([directory])}
+        self.entry_points_found = False
+        self.loaded = {}
+
+    def find_entry_points(self):
+        """Add plugins installed by other packages, looking them up only the first time."""
+        if self.entry_points_found:
+            return
+        self.entry_points_found = True
+        from importlib import metadata # pylint: disable=import-outside-toplevel
+        entry_points = metadata.entry_points()
+        if hasattr(entry_points, "select"):
+            entry_points = entry_points.select(group=self.group)
+        else:
+            entry_points = entry_points.get(self.group, [])
+        for entry_point in entry_points:
+            self.plugins.setdefault(entry_point.name.lower(), entry_point)
+
+    def names(self):
+        """Return sorted list of plugin names."""
+        self.find_entry_points()
+        return sorted(self.plugins)
+
+    def exists(self, name):
+        """Return True if there is a plugin name, looking up entry points only if not built in."""
+        if name.lower() not in self.plugins:
+            self.find_entry_points()
+        return name.lower() in self.plugins
+
+    def load(self, name):
+        """Return plugin module name, importing it if needed.
+
+        Raise PluginError if there is no such plugin or it fails to import,
+        such as when a library it needs is not installed.
+        """
+        name = name.lower()
+        if name not in self.loaded:
+            if not self.exists(name):
+                raise PluginError(f"No plugin named {name}, found: {', '.join(self.names())}")
+            plugin = self.plugins[name]
+            try:
+                if isinstance(plugin, str):
+                    self.loaded[name] = importlib.import_module(plugin)
+                else:
+                    self.loaded[name] = plugin.load()
+            except ImportError as error:
+                raise PluginError(f"Unable to load plugin {name}: {error}") from error
+        return self.loaded[name]
+
+devices = Registry("devices")
+adcs = Registry("adc")
+
+def capabilities(module):
+    """Return list of optional functions plugin module defines."""
+    return [name for name in CAPABILITIES if hasattr(module, name)]
+
+def enabled_names(config):
+    """Return names of device plugins enabled in [Detection], in the order of their options."""
+    names = []
+    for option in config.options("Detection"):
+        name = DEVICE_OPTIONS.get(option, option)
+        if name not in devices.plugins:
+            # Only an option switched on may name a plugin installed by another package
+            if any(fnmatchcase(option, pattern) for pattern in OVERLAY_OPTIONS) or \
+                    config.get("Detection", option).lower() not in TRUE_STATES or \
+                    not devices.exists(name):
+                continue
+        if config.getboolean("Detection", option):
+            names.append(name)
+    return names
+
+def enabled_devices(config):
+    """Import device plugins enabled in [Detection], return (modules, errors).
+
+    Modules are in the order of their options, errors is a list of text for
+    each enabled plugin which failed to load.
+    """
+    modules = []
+    errors = []
+    for name in enabled_names(config):
+        try:
+            modules.append(devices.load(name))
+        except PluginError as error:
+            errors.append(str(error))
+    return modules, errors
+
+def device_module(device):
+    """Return plugin module which provided device."""
+    return inspect.getmodule(device)
+
+def affected(device, changes):
+    """Return True if changes, a set of (section, option), include config device's plugin reads."""
+    return configreload.matches(changes, getattr(device_module(device), "CONFIG", []))
+
+def create_device(module, config):
+    """Configure device plugin module and return its device.
+
+    Raise PluginError if the plugin's options in config are missing or invalid,
+    or a file they name cannot be read.
+    """
+    try:
+        if hasattr(module, "configure"):
+            module.configure(config)
+        if hasattr(module, "create"):
+            return module.create(config)
+    except (configparser.Error, KeyError, ValueError, OSError) as error:
+        raise PluginError(f"Unable to set up plugin {module.__name__}: {error}") from error
+    return module
@@ -0,0 +1,85 @@
+"""Device probes for retropie-status-overlay
+github.com/bverc/retropie-status-overlay
+
+Author: bverc
+
+Runs device checks, such as calling iwconfig or reading an ADC, in parallel on
+a small thread pool, so a tick takes as long as the slowest check rather than
+all of them added together.
+
+A check still running after its timeout is left to finish in the background,
+and its result is picked up on a later tick. It is not started again until it
+has finished, so a hung check can only ever hold one worker. Workers are daemon
+threads, so a check which never returns does not stop the overlay exiting.
+"""
+
+import queue
+import threading
+import time
+from concurrent import futures
+
+class ProbePool:
+    """A bounded thread pool running named checks, each with a deadline."""
+
+    def __init__(self, workers=4, timeout=2.0):
+        """Initialise pool of workers threads, checks may take timeout seconds."""
+        # (future, function) of checks waiting for a worker, None to stop one
+        self.queue = queue.Queue()
+        self.workers = [threading.Thread(target=self.work, name=f"probe_{number}", daemon=True)
+                        for number in range(workers)]
+        for worker in self.workers:
+            worker.start()
+        self.timeout = timeout
+        # name: (future, deadline) of checks started
+        self.running = {}
+
+    def work(self):
+        """Run checks from the queue until told to stop."""
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            (future, function) = item
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(function())
+            except BaseException as error: # pylint: disable=broad-except
+                future.set_exception(error)
+
+    def submit(self, function):
+        """Return future of function, queued to run on a worker."""
+        future = futures.Future()
+        self.queue.put((future, function))
+        return future
+
+    def run(self, probes):
+        """Run probes, a dict of name: function, return (results, stale).
+
+        results is a dict of name: return value for checks which finished in time,
+        stale is a list of names which timed out or are still running from before.
+        Exceptions raised by a check are raised here.
+        """
+        for (name, function) in probes.items():
+            if name not in self.running:
+                self.running[name] = (self.submit(function),
+                                      time.monotonic() + self.timeout)
+        results = {}
+        stale = []
+        for name in sorted(probes, key=lambda name: self.running[name][1]):
+            (future, deadline) = self.running[name]
+            futures.wait([future], max(deadline - time.monotonic(), 0))
+            if not future.done():
+                stale.append(name)
+                continue
+            del self.running[name]
+            results[name] = future.result()
+        return results, stale
+
+    def close(self):
+        """Stop workers once they are idle, without waiting for checks still running.
+
+        A worker stuck in a check is a daemon thread, so is dropped when the overlay exits.
+        """
+        for _ in self.workers:
+            self.queue.put(None)
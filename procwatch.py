@@ -0,0 +1,76 @@
+"""Process watcher for retropie-status-overlay
+github.com/bverc/retropie-status-overlay
+
+Author: bverc
+
+Detects whether a process, such as retroarch, is running without scanning
+every process each time. While the process is alive only its cached PID is
+checked. Otherwise only processes which appeared since the last scan are
+checked, found by diffing /proc entries by PID and inode.
+
+A process that exec()s into the watched name keeps its PID and inode, so
+the known set is also dropped on exec events, and periodically otherwise.
+"""
+
+import os
+
+import events
+
+# Number of scans after which every process is checked again
+FULL_SCAN_EVERY = 30
+
+class ProcessWatcher:
+    """Watch for a process whose name contains a given string."""
+
+    def __init__(self, name, proc_dir="/proc"):
+        """Initialise watcher for process name."""
+        self.name = name.lower()
+        self.proc_dir = proc_dir
+        self.pid = None
+        self.known = set()
+        self.scans = 0
+
+    def matches(self, pid):
+        """Return True if process pid exists and its name contains the watched name."""
+        try:
+            with open(os.path.join(self.proc_dir, pid, "comm"), "r", encoding="utf-8") as file:
+                return self.name in file.read().lower()
+        except OSError:
+            return False
+
+    def running(self):
+        """Return True if watched process is running."""
+        if self.pid is not None:
+            if self.matches(self.pid):
+                return True
+            self.pid = None
+
+        self.scans += 1
+        if self.scans % FULL_SCAN_EVERY == 0:
+            self.known = set()
+
+        # A /proc entry's inode changes with each new process, even if its PID is reused
+        seen = set()
+        with os.scandir(self.proc_dir) as entries:
+            for entry in entries:
+                if not entry.name.isdigit():
+                    continue
+                key = (entry.name, entry.inode())
+                if key not in self.known and self.matches(entry.name):
+                    self.pid = entry.name
+                    break
+                seen.add(key)
+        self.known = seen
+        return self.pid is not None
+
+    def forget(self, pid):
+        """Check process pid again on next scan, e.g. after it called exec()."""
+        pid = str(pid)
+        self.known = {key for key in self.known if key[0] != pid}
+
+    def wakeup_sources(self):
+        """Return event sources which signal process starts and exits (requires root)."""
+        try:
+            return [events.ProcConnectorSource(self)]
+        except OSError:
+            return []
@@ -0,0 +1,180 @@
+"""Settings for retropie-status-overlay
+github.com/bverc/retropie-status-overlay
+
+Author: bverc
+
+Parses config.ini once into immutable settings, checking every value, so a
+mistake in the file is reported when it is loaded rather than part way
+through running, and the main loop reads plain attributes.
+
+Only options the overlay itself reads are held here. Device and ADC plugins
+read their own options from the ConfigParser when they are set up, so each
+option has one parser and one default.
+
+Options added in later versions fall back to their defaults, so older
+config files still load. Shutdown voltages are only required if BatteryADC
+is enabled, and GPIO options only if their interrupt is enabled.
+"""
+
+import configparser
+from dataclasses import dataclass
+
+from PIL import ImageColor
+
+import plugins
+
+# Fallback for options which must be present
+REQUIRED = object()
+
+class SettingsError(ValueError):
+    """A config option is missing or has an invalid value."""
+
+def boolean(text):
+    """Return bool for text such as True, off or 1."""
+    if text.lower() not in configparser.ConfigParser.BOOLEAN_STATES:
+        raise ValueError("expected True or False")
+    return configparser.ConfigParser.BOOLEAN_STATES[text.lower()]
+
+def alpha(text):
+    """Return text of an alpha value from 0 to 255."""
+    if not 0 <= int(text) <= 255:
+        raise ValueError("expected 0 to 255")
+    return str(int(text))
+
+def color(text):
+    """Return text of a color, empty to leave icons untinted."""
+    if text:
+        ImageColor.getrgb(text)
+    return text
+
+def one_of(*choices):
+    """Return parser of lowercase text which must be one of choices."""
+    def parse(text):
+        if text.lower() not in choices:
+            raise ValueError("expected one of: " + ", ".join(choices))
+        return text.lower()
+    return parse
+
+def get(config, section, option, parse=str, fallback=REQUIRED):
+    """Return option parsed by parse, or fallback if not set or empty.
+
+    Raise SettingsError if option is required but not set, or cannot be parsed.
+    """
+    text = config.get(section, option, fallback="")
+    if not text and fallback is not REQUIRED:
+        return fallback
+    if not config.has_option(section, option):
+        raise SettingsError(f"[{section}] {option} is missing")
+    try:
+        return parse(text)
+    except ValueError as error:
+        raise SettingsError(f"[{section}] {option} = {text} is invalid, {error}") from error
+
+@dataclass(frozen=True)
+class Icons:
+    """[Icons]: icon appearance and where the status bar is shown."""
+
+    size: int
+    horizontal: str
+    vertical: str
+    padding: int
+    color: str
+    display: int
+    connector: str
+
+    @classmethod
+    def from_config(cls, config):
+        """Return icon settings from config."""
+        return cls(get(config, "Icons", "Size", int),
+                   get(config, "Icons", "Horizontal", one_of("left", "right")),
+                   get(config, "Icons", "Vertical", one_of("top", "bottom")),
+                   get(config, "Icons", "Padding", int),
+                   get(config, "Icons", "Color", color, ""),
+                   get(config, "Icons", "Display", int, 0),
+                   get(config, "Icons", "Connector", fallback=""))
+
+@dataclass(frozen=True)
+class Detection:
+    """[Detection]: devices enabled, when to shut down and how devices are checked.
+
+    Shutdown voltages are None if BatteryADC is disabled and they are not set.
+    """
+
+    devices: tuple
+    adc_shutdown: bool
+    vmin_discharging: float
+    vmin_charging: float
+    ingame_alpha: str
+    hide_env_warnings: bool
+    probe_timeout: float
+
+    @classmethod
+    def from_config(cls, config):
+        """Return detection settings from config."""
+        if not config.has_section("Detection"):
+            raise SettingsError("[Detection] is missing")
+        try:
+            devices = tuple(plugins.enabled_names(config))
+        except ValueError as error:
+            raise SettingsError(f"[Detection] {error}") from error
+        battery = REQUIRED if "battery" in devices else None
+        return cls(devices,
+                   get(config, "Detection", "ADCShutdown", boolean, False),
+                   get(config, "Detection", "VMinDischarging", float, battery),
+                   get(config, "Detection", "VMinCharging", float, battery),
+                   get(config, "Detection", "InGameAlpha", alpha),
+                   get(config, "Detection", "HideEnvWarnings", boolean, False),
+                   get(config, "Detection", "ProbeTimeout", float, 2.0))
+
+@dataclass(frozen=True)
+class Metrics:
+    """[Metrics]: history recorded to metrics.dat."""
+
+    enabled: bool
+    interval: int
+    capacity: int
+
+    @classmethod
+    def from_config(cls, config):
+        """Return metrics settings from config."""
+        return cls(get(config, "Metrics", "Enabled", boolean, False),
+                   get(config, "Metrics", "Interval", int, 60),
+                   get(config, "Metrics", "Capacity", int, 20160))
+
+@dataclass(frozen=True)
+class Interrupt:
+    """[BatteryLDO] or [ShutdownGPIO]: a GPIO pin watched for interrupts.
+
+    Enabled by the [Detection] option of the same name, gpio is None if the
+    interrupt is disabled and no pin is set.
+    """
+
+    name: str
+    enabled: bool
+    gpio: int
+    active_low: bool
+
+    @classmethod
+    def from_config(cls, config, name):
+        """Return settings of interrupt name from config, its pin must be set if enabled."""
+        enabled = get(config, "Detection", name, boolean, False)
+        return cls(name, enabled, get(config, name, "GPIO", int, REQUIRED if enabled else None),
+                   get(config, name, "ActiveLow", boolean, True))
+
+@dataclass(frozen=True)
+class Settings:
+    """Settings of config.ini which the overlay itself reads."""
+
+    icons: Icons
+    detection: Detection
+    metrics: Metrics
+    battery_ldo: Interrupt
+    shutdown_gpio: Interrupt
+
+    @classmethod
+    def from_config(cls, config):
+        """Return settings parsed from config, raise SettingsError if any are invalid."""
+        return cls(Icons.from_config(config), Detection.from_config(config),
+                   Metrics.from_config(config),
+                   Interrupt.from_config(config, "BatteryLDO"),
+                   Interrupt.from_config(config, "ShutdownGPIO"))
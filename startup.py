@@ -0,0 +1,63 @@
+"""Startup cache for retropie-status-overlay
+github.com/bverc/retropie-status-overlay
+
+Author: bverc
+
+Remembers the screen resolution and the icons last shown, so on the next
+start the status bar is drawn straight away from the cache, before device
+plugins are imported or the display is queried. Devices then replace the
+cached icons as they are first polled.
+
+Also times each phase of startup from when the process started, so slow
+starts can be measured.
+"""
+
+import json
+import os
+import time
+
+import atomicfile
+
+def process_age():
+    """Return seconds since this process started, or 0 if unknown."""
+    try:
+        with open("/proc/self/stat", "r", encoding="utf-8") as file:
+            # Fields after the command name, which may contain spaces
+            fields = file.read().rsplit(")", 1)[1].split()
+        with open("/proc/uptime", "r", encoding="utf-8") as file:
+            uptime = float(file.read().split()[0])
+    except (OSError, IndexError, ValueError):
+        return 0.0
+    # starttime is field 22, the 20th after the command name
+    return max(uptime - int(fields[19]) / os.sysconf("SC_CLK_TCK"), 0.0)
+
+def load_cache(path):
+    """Return dict read from cache file at path, empty if missing or unreadable."""
+    try:
+        with open(path, "r", encoding="utf-8") as file:
+            cache = json.load(file)
+    except (OSError, ValueError):
+        return {}
+    return cache if isinstance(cache, dict) else {}
+
+def save_cache(path, cache):
+    """Write dict cache to file at path."""
+    with atomicfile.replace(path, "w", encoding="utf-8") as file:
+        json.dump(cache, file)
+
+class StartupTimer:
+    """Time of each phase of startup, in seconds since the process started."""
+
+    def __init__(self):
+        """Start timing, counting time already spent starting Python and importing."""
+        self.start = time.monotonic() - process_age()
+        self.marks = [("modules", time.monotonic() - self.start)]
+
+    def mark(self, phase):
+        """Record that phase has finished now."""
+        self.marks.append((phase, time.monotonic() - self.start))
+
+    def report(self):
+        """Return text listing the time each phase finished."""
+        return "Startup: " + ", ".join(f"{phase} {elapsed:.2f} s"
+                                       for (phase, elapsed) in self.marks)
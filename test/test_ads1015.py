@@ -29,5 +29,14 @@ class TestADS1015(unittest.TestCase):
         self.assertTrue(ads1015.read(1) == 1.536)
         self.assertTrue(ads1015.read(2) == 3.072)
 
+    def test_read_many(self):
+        """Test ads1015.read_many() averages a burst in continuous mode."""
+        ads1015.adc.get_last_result.side_effect = [1000, 1002, 1000, 1002]
+        (mean, variance) = ads1015.read_many(1, 4)
+        ads1015.adc.start_adc.assert_called_once_with(1, gain=2/3, data_rate=3300)
+        self.assertTrue(ads1015.adc.stop_adc.called)
+        self.assertTrue(abs(mean - 3.003) < 1e-9)
+        self.assertTrue(abs(variance - 0.003 ** 2 / 4) < 1e-12)
+
 if __name__ == '__main__':
     unittest.main()
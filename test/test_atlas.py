@@ -0,0 +1,87 @@
+"""Unit tests for atlas.py
+github.com/bverc/retropie-status-overlay
+
+Author: bverc
+"""
+
+import unittest
+import os
+import tempfile
+from unittest.mock import Mock
+
+from PIL import Image
+
+import atlas
+
+ICONS = {
+    "flash": "overlay_icons/flash_48.png",
+    "volume_2": "overlay_icons/ic_volume_up_black_48dp.png",
+    "thermometer": "overlay_icons/thermometer_48.png",
+    "missing": "overlay_icons/missing_48.png",
+}
+
+class TestAtlas(unittest.TestCase):
+    """A Class used to test atlas module."""
+
+    def test_get(self):
+        """Test get() decodes each icon once and applies alpha."""
+        icon_atlas = atlas.IconAtlas(ICONS, "48")
+        icon_atlas.decode = Mock(side_effect=icon_atlas.decode)
+        icon = icon_atlas.get("flash")
+        self.assertTrue(icon.mode == "RGBA")
+        self.assertTrue(icon.size == (48, 48))
+        self.assertTrue(icon_atlas.get("flash") is icon)
+        self.assertTrue(icon_atlas.decode.call_count == 1)
+
+        # Alpha variant is built from the decoded icon without another file read
+        faded = icon_atlas.get("flash", "100")
+        self.assertTrue(max(faded.getchannel("A").getdata()) == 100)
+        self.assertTrue(icon_atlas.decode.call_count == 1)
+        self.assertTrue(("flash", "48", None, "100") in icon_atlas.cache)
+
+    def test_lru(self):
+        """Test least recently used icons are evicted beyond capacity."""
+        icon_atlas = atlas.IconAtlas(ICONS, "48", capacity=2)
+        icon_atlas.get("flash")
+        icon_atlas.get("thermometer")
+        icon_atlas.get("flash")
+        icon_atlas.get("flash", 100)
+        self.assertTrue(len(icon_atlas.cache) == 2)
+        self.assertFalse(("thermometer", "48", None, "255") in icon_atlas.cache)
+        self.assertTrue(("flash", "48", None, "255") in icon_atlas.cache)
+
+    def test_preload(self):
+        """Test preload() decodes every icon and reports missing files."""
+        icon_atlas = atlas.IconAtlas(ICONS, "48")
+        self.assertTrue(icon_atlas.preload(["255", "100"]) == ["missing"])
+        self.assertTrue(len(icon_atlas.cache) == 6)
+
+    def test_tint(self):
+        """Test tint() replaces colour and keeps alpha."""
+        image = Image.new("RGBA", (2, 1), (0, 0, 0, 0))
+        image.putpixel((0, 0), (0, 0, 0, 200))
+        tinted = atlas.tint(image, "#7d7d7d")
+        self.assertTrue(tinted.getpixel((0, 0)) == (125, 125, 125, 200))
+        self.assertTrue(tinted.getpixel((1, 0)) == (125, 125, 125, 0))
+
+    def test_tint_cache(self):
+        """Test black icons are tinted once, cached on disk and reused."""
+        with tempfile.TemporaryDirectory() as cache_dir:
+            icon_atlas = atlas.IconAtlas(ICONS, "48", "blue", cache_dir=cache_dir)
+            self.assertTrue(icon_atlas.color == "0000ff")
+            icon = icon_atlas.get("volume_2")
+            self.assertTrue(set(icon.getdata()) <= {(0, 0, 255, a) for a in range(256)})
+            cached = os.path.join(cache_dir, "0000ff_48", "ic_volume_up_black_48dp.png")
+            self.assertTrue(os.path.exists(cached))
+
+            # Coloured icons are not tinted
+            self.assertTrue(icon_atlas.get("flash").getpixel((24, 24)) == (255, 179, 0, 255))
+
+            # New atlas reads tinted icon back from disk cache
+            icon_atlas = atlas.IconAtlas(ICONS, "48", "#0000FF", cache_dir=cache_dir)
+            icon_atlas.icons = dict(ICONS, volume_2="overlay_icons/does_not_exist_black_48dp.png")
+            os.rename(cached, os.path.join(cache_dir, "0000ff_48", "does_not_exist_black_48dp.png"))
+            self.assertTrue(list(icon_atlas.get("volume_2").getdata()) == list(icon.getdata()))
+
+if __name__ == '__main__':
+    unittest.main()
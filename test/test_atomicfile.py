@@ -0,0 +1,36 @@
+"""Unit tests for atomicfile.py
+github.com/bverc/retropie-status-overlay
+
+Author: bverc
+"""
+
+import unittest
+import os
+import tempfile
+
+import atomicfile
+
+class TestAtomicFile(unittest.TestCase):
+    """A Class used to test atomicfile module."""
+
+    def test_replace(self):
+        """Test file is only replaced once fully written."""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "file.json")
+            with atomicfile.replace(path, "w", encoding="utf-8") as file:
+                file.write("old")
+                self.assertFalse(os.path.exists(path))
+            with open(path, "r", encoding="utf-8") as file:
+                self.assertTrue(file.read() == "old")
+
+            # A failed write leaves the old file, and no temporary file
+            with self.assertRaises(ValueError):
+                with atomicfile.replace(path, "w", encoding="utf-8") as file:
+                    file.write("new")
+                    raise ValueError("failed")
+            with open(path, "r", encoding="utf-8") as file:
+                self.assertTrue(file.read() == "old")
+            self.assertTrue(os.listdir(tmp) == ["file.json"])
+
+if __name__ == '__main__':
+    unittest.main()
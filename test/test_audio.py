@@ -5,9 +5,40 @@ Author: bverc
 """
 
 import unittest
+import configparser
+import threading
+from unittest.mock import Mock
 
 from devices import audio
 
+def mock_alsa(volume, switch):
+    """Create a mock libasound with a single control, range 0-255."""
+    lib = Mock()
+    lib.snd_mixer_open.return_value = 0
+    lib.snd_mixer_attach.return_value = 0
+    lib.snd_mixer_selem_register.return_value = 0
+    lib.snd_mixer_load.return_value = 0
+    lib.snd_mixer_first_elem.return_value = 1
+    lib.snd_mixer_selem_has_playback_volume.return_value = 1
+    lib.snd_mixer_selem_get_name.return_value = b"PCM"
+    lib.snd_mixer_elem_next.return_value = None
+
+    # Arguments are ctypes.byref() results, _obj is the referenced value
+    def get_range(_, vmin, vmax):
+        vmin._obj.value = 0 # pylint: disable=protected-access
+        vmax._obj.value = 255 # pylint: disable=protected-access
+
+    def get_volume(_, __, value):
+        value._obj.value = volume # pylint: disable=protected-access
+
+    def get_switch(_, __, value):
+        value._obj.value = switch # pylint: disable=protected-access
+
+    lib.snd_mixer_selem_get_playback_volume_range.side_effect = get_range
+    lib.snd_mixer_selem_get_playback_volume.side_effect = get_volume
+    lib.snd_mixer_selem_get_playback_switch.side_effect = get_switch
+    return lib
+
 class TestAudio(unittest.TestCase):
     """A Class used to test Audio module."""
 
@@ -26,6 +57,7 @@ class TestAudio(unittest.TestCase):
 
     def test_get_state(self):
         """Test audio.get_state() by overriding amixer with different volumes."""
+        audio.AUDIO_BACKEND = "amixer"
         audio.AUDIO_CMD = ["echo", "\n[100%] [0dB] [off]"]
         (audio_state, audio_volume) = audio.get_state()
         self.assertTrue(audio_state == "volume_mute")
@@ -46,5 +78,55 @@ class TestAudio(unittest.TestCase):
         self.assertTrue(audio_state == "volume_2")
         self.assertTrue(audio_volume == 50)
 
+    def test_get_state_alsa(self):
+        """Test audio.get_state() with in-process ALSA mixer."""
+        audio.AUDIO_BACKEND = "alsa"
+        audio.mixer["alsa"] = audio.AlsaMixer(mock_alsa(128, 1))
+        (audio_state, audio_volume) = audio.get_state()
+        self.assertTrue(audio_state == "volume_2")
+        self.assertTrue(audio_volume == 50)
+        self.assertTrue(audio.mixer["alsa"].lib.snd_mixer_handle_events.called)
+
+        audio.mixer["alsa"] = audio.AlsaMixer(mock_alsa(128, 0))
+        (audio_state, audio_volume) = audio.get_state()
+        self.assertTrue(audio_state == "volume_mute")
+        self.assertTrue(audio_volume == 50)
+
+        # Mixer is not used by a probe while events are being handled
+        with audio.mixer["alsa"].lock:
+            probe = threading.Thread(target=audio.get_state)
+            probe.start()
+            probe.join(0.1)
+            self.assertTrue(probe.is_alive())
+        probe.join(1)
+        self.assertFalse(probe.is_alive())
+
+        # Control not found
+        with self.assertRaises(OSError):
+            audio.AlsaMixer(mock_alsa(128, 1), control="Master")
+
+        del audio.mixer["alsa"]
+
+    def test_get_mixer_unavailable(self):
+        """Test audio.get_mixer() falls back to None without libasound or for amixer."""
+        audio.ALSA_LIB = "libdoesnotexist.so"
+        audio.AUDIO_BACKEND = "alsa"
+        self.assertTrue(audio.get_mixer() is None)
+        del audio.mixer["alsa"]
+        audio.AUDIO_BACKEND = "amixer"
+        self.assertTrue(audio.get_mixer() is None)
+        self.assertFalse("alsa" in audio.mixer)
+
+    def test_configure(self):
+        """Test audio.configure() with and without Audio section."""
+        config = configparser.ConfigParser()
+        audio.configure(config)
+        self.assertTrue(audio.AUDIO_BACKEND == "alsa")
+        self.assertTrue(audio.AUDIO_CONTROL == "")
+        config['Audio'] = {'Backend': 'AMixer', 'Control': 'PCM'}
+        audio.configure(config)
+        self.assertTrue(audio.AUDIO_BACKEND == "amixer")
+        self.assertTrue(audio.AUDIO_CONTROL == "PCM")
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,59 @@
+"""Unit tests for background.py
+github.com/bverc/retropie-status-overlay
+
+Author: bverc
+"""
+
+import unittest
+import threading
+import time
+
+import background
+
+class TestBackground(unittest.TestCase):
+    """A Class used to test background module."""
+
+    def test_recent(self):
+        """Test values read in background are returned without blocking."""
+        values = iter(["3.7", "bad", "3.8", "3.9"])
+        done = threading.Event()
+
+        def read():
+            try:
+                return float(next(values))
+            except StopIteration:
+                done.set()
+                threading.Event().wait() # Block, like a serial read with nothing to read
+                return None
+
+        reader = background.BackgroundReader(read, max_age=10)
+        reader.start()
+        self.assertTrue(done.wait(5))
+        self.assertTrue(reader.latest() == 3.9)
+        self.assertTrue(reader.recent(2) == [3.8, 3.9])
+        self.assertTrue(reader.recent(5) == [3.7, 3.8, 3.9])
+        values = reader.since(float("-inf"), 2)
+        self.assertTrue([value for (value, _) in values] == [3.8, 3.9])
+        self.assertFalse(reader.since(values[-1][1], 2))
+        self.assertTrue(isinstance(reader.error, ValueError))
+
+    def test_stale(self):
+        """Test StaleError is raised with no values, or only old values."""
+        reader = background.BackgroundReader(lambda: 3.7, max_age=10)
+        with self.assertRaises(background.StaleError):
+            reader.latest()
+
+        # Reading has started but nothing has arrived yet, does not wait for it
+        reader = background.BackgroundReader(lambda: threading.Event().wait(), max_age=10)
+        reader.start()
+        start = time.monotonic()
+        with self.assertRaises(background.StaleError):
+            reader.latest()
+        self.assertTrue(time.monotonic() - start < 1)
+
+        reader.values.append((3.7, time.monotonic() - 11))
+        with self.assertRaises(OSError):
+            reader.latest()
+
+if __name__ == '__main__':
+    unittest.main()
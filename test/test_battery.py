@@ -8,6 +8,8 @@ import unittest
 import configparser
 from unittest.mock import Mock
 
+import curve
+import estimator
 from devices import battery
 
 def mock_read(channel): # pylint: disable=unused-argument
@@ -43,12 +45,121 @@ class TestBattery(unittest.TestCase):
         bat = battery.Battery(config)
         self.assertTrue(bat.adc_gain == 1)
 
-        bat.adc = Mock()
+        bat.adc = Mock(spec=["read"])
         bat.adc.read.side_effect = mock_read
 
         (bat_state, median_v) = bat.get_state()
         self.assertTrue(bat_state == "charging_full")
         self.assertTrue(median_v == 4.5)
+        self.assertTrue(bat.time_to_empty() is None)
+
+    def test_read_many(self):
+        """Test battery uses read_many() if plugin supports it."""
+        config = configparser.ConfigParser()
+        config['Detection'] = {'ADCType': 'ads1015',
+                               'VMaxCharging': '4.5',
+                               'VMinCharging': '4.25',
+                               'VMaxDischarging': '4',
+                               'VMinDischarging': '3.2',
+                               'ADCChannel': '1',
+                               'ADCGain': '2',
+                               'ADCSamples': '4'}
+        battery.configure(config)
+        bat = battery.Battery(config)
+        bat.adc = Mock()
+        bat.adc.read_many.return_value = (1.85, 0.01)
+        (bat_state, voltage) = bat.get_state()
+        bat.adc.read_many.assert_called_once_with(1, 4)
+        self.assertFalse(bat.adc.read.called)
+        self.assertTrue(bat_state == "60")
+        self.assertTrue(voltage == 3.7)
+
+        # No recent reading
+        bat.adc.read_many.side_effect = OSError
+        self.assertTrue(bat.get_state() == ("alert_red", None))
+
+        # Single reading
+        config['Detection']['ADCSamples'] = '1'
+        battery.configure(config)
+        bat.adc.read.return_value = 1.8
+        bat.get_state()
+        self.assertTrue(bat.adc.read.called)
+        battery.configure(configparser.ConfigParser())
+
+    def test_translate_hysteresis(self):
+        """Test battery level does not flicker when voltage is near a boundary."""
+        config = configparser.ConfigParser()
+        config['Detection'] = {'ADCType': 'ads1015',
+                               'VMaxCharging': '4.5',
+                               'VMinCharging': '4.25',
+                               'VMaxDischarging': '4.3',
+                               'VMinDischarging': '3.2',
+                               'ADCChannel': '0',
+                               'ADCGain': '1',
+                               'Estimator': 'ema'}
+        bat = battery.Battery(config)
+        self.assertTrue(isinstance(bat.estimator, estimator.EmaEstimator))
+        # Each of the 11 steps is 0.1 V, boundary between "50" and "60" at 3.75 V
+        self.assertTrue(bat.translate(3.74) == "50")
+        self.assertTrue(bat.translate(3.76) == "50")
+        self.assertTrue(bat.translate(3.74) == "50")
+        self.assertTrue(bat.translate(3.78) == "60")
+        self.assertTrue(bat.translate(3.74) == "60")
+        self.assertTrue(bat.translate(3.72) == "50")
+
+        # Voltage above charging range
+        with self.assertRaises(IndexError):
+            bat.translate(4.6)
+
+        # Discharge curve, where half charge is at 3.8 V rather than 3.75 V
+        bat.curves["discharging"] = curve.DischargeCurve([(3.2, 0), (3.8, 50), (4.3, 100)])
+        self.assertTrue(bat.translate(3.8) == "50")
+        self.assertTrue(bat.translate(4.0) == "80")
+
+    def test_channels(self):
+        """Test extra channels for current and charger status are read each poll."""
+        config = configparser.ConfigParser()
+        config['Detection'] = {'ADCType': 'ads1015',
+                               'VMaxCharging': '4.5',
+                               'VMinCharging': '4.25',
+                               'VMaxDischarging': '4.2',
+                               'VMinDischarging': '3.2',
+                               'ADCChannel': '0',
+                               'ADCGain': '1',
+                               'ADCChannels': 'Current, Charger',
+                               'Capacity': '1000'}
+        config['ADC Current'] = {'Kind': 'current', 'Channel': '1',
+                                 'Gain': '2', 'Offset': '1.5'}
+        config['ADC Charger'] = {'Kind': 'Charger', 'Channel': '2'}
+        bat = battery.Battery(config)
+        self.assertTrue([channel.name for channel in bat.channels]
+                        == ["pack", "Current", "Charger"])
+        self.assertTrue(bat.counter is not None)
+
+        # 3.7 V is half charge, drawing 1 A, charger not connected
+        voltages = {0: 3.7, 1: 2.0, 2: 0.0}
+        bat.adc = Mock(spec=["read"])
+        bat.adc.read.side_effect = lambda channel: voltages[channel]
+        (bat_state, voltage) = bat.get_state()
+        self.assertTrue(bat_state == "50")
+        self.assertTrue(voltage == 3.7)
+        self.assertTrue(bat.current == 1.0)
+        self.assertTrue(abs(bat.power - 3.7) < 1e-9)
+        # Half of 1000 mAh at 1 A
+        self.assertTrue(abs(bat.time_to_empty() - 1800) < 1)
+        self.assertTrue(bat.describe() == "Current 1.000, Charger 0.000, 3.70 W, 50%, 30 min left")
+
+        # Charger pin decides charging, even below VMaxDischarging
+        voltages[2] = 3.3
+        self.assertTrue(bat.get_state()[0] == "charging_50")
+        self.assertTrue(bat.time_to_empty() is None)
+
+    def test_channel_kind(self):
+        """Test an unknown kind of channel raises ValueError."""
+        config = configparser.ConfigParser()
+        config['ADC Temp'] = {'Kind': 'temperature', 'Channel': '3'}
+        with self.assertRaises(ValueError):
+            battery.Channel.from_config(config, "Temp")
 
 if __name__ == '__main__':
     unittest.main()
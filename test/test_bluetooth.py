@@ -6,12 +6,34 @@ Author: bverc
 
 import unittest
 import os
+import shutil
+import tempfile
+from unittest.mock import Mock
 
 from devices import bluetooth
 
 class TestBluetooth(unittest.TestCase):
     """A Class used to test devices.bluetooth module."""
 
+    def setUp(self):
+        """Create fake sysfs bluetooth class directory with adapter hci0 and its rfkill."""
+        bluetooth.BT_DEVICES_DIR = tempfile.mkdtemp()
+        os.makedirs(os.path.join(bluetooth.BT_DEVICES_DIR, "hci0", "rfkill1"))
+        self.set_rfkill("1")
+        self.hci_flags = bluetooth.hci_flags
+
+    def tearDown(self):
+        """Remove fake sysfs directory."""
+        shutil.rmtree(bluetooth.BT_DEVICES_DIR)
+        bluetooth.hci_flags = self.hci_flags
+
+    @staticmethod
+    def set_rfkill(state):
+        """Set rfkill state of fake adapter."""
+        path = os.path.join(bluetooth.BT_DEVICES_DIR, "hci0", "rfkill1", "state")
+        with open(path, "w", encoding="utf-8") as file:
+            file.write(state + "\n")
+
     def test_add_icons(self):
         """Setup empty dictionary and dummy icon_path and size, call function,
         then check dictionary length and content are correct"""
@@ -25,27 +47,44 @@ class TestBluetooth(unittest.TestCase):
         self.assertTrue(icons['bt_disabled'] == "random_dir/ic_bluetooth_disabled_black_48dp.png")
 
     def test_get_state_connected(self):
-        """Test bluetooth.get_state() with a directory with at least one file"""
-        cwd = os.getcwd()
-        bluetooth.BT_DEVICES_DIR = cwd + "/test/dir2"
-        (bt_state, info) = bluetooth.get_state()
+        """Test bluetooth.get_state() counts connections listed as hci0:<handle>"""
+        bluetooth.hci_flags = Mock(return_value=bluetooth.HCI_UP)
+        os.makedirs(os.path.join(bluetooth.BT_DEVICES_DIR, "hci0:11"))
+        (bt_state, connections) = bluetooth.get_state()
+        self.assertTrue(bt_state == "bt_connected")
+        self.assertTrue(connections == 1)
+
+        os.makedirs(os.path.join(bluetooth.BT_DEVICES_DIR, "hci0:12"))
+        os.makedirs(os.path.join(bluetooth.BT_DEVICES_DIR, "hci1"))
+        (bt_state, connections) = bluetooth.get_state()
         self.assertTrue(bt_state == "bt_connected")
-        self.assertTrue(info == "")
+        self.assertTrue(connections == 2)
 
     def test_get_state_disconnected(self):
-        """Test bluetooth.get_state() with an empty directory"""
-        cwd = os.getcwd()
-        bluetooth.BT_DEVICES_DIR = cwd + "/test/dir0"
+        """Test bluetooth.get_state() with adapter up or down and no connections"""
+        bluetooth.hci_flags = Mock(return_value=bluetooth.HCI_UP)
+        (bt_state, connections) = bluetooth.get_state()
+        self.assertTrue(bt_state == "bt_enabled")
+        self.assertTrue(connections == 0)
+
+        bluetooth.hci_flags = Mock(return_value=0)
+        (bt_state, connections) = bluetooth.get_state()
+        self.assertTrue(bt_state == "bt_disabled")
+        self.assertTrue(connections == 0)
 
-        bluetooth.BT_CMD = ["echo", "-e", "\n\nUP"]
-        (bt_state, info) = bluetooth.get_state()
+    def test_get_state_rfkill(self):
+        """Test bluetooth.get_state() falls back to rfkill without an HCI socket"""
+        bluetooth.hci_flags = Mock(side_effect=OSError)
+        (bt_state, _) = bluetooth.get_state()
         self.assertTrue(bt_state == "bt_enabled")
-        self.assertTrue(info == "")
 
-        bluetooth.BT_CMD = ["echo", "-e", "\n\nDOWN"]
-        (bt_state, info) = bluetooth.get_state()
+        self.set_rfkill("0")
+        (bt_state, _) = bluetooth.get_state()
+        self.assertTrue(bt_state == "bt_disabled")
+
+        shutil.rmtree(os.path.join(bluetooth.BT_DEVICES_DIR, "hci0"))
+        (bt_state, _) = bluetooth.get_state()
         self.assertTrue(bt_state == "bt_disabled")
-        self.assertTrue(info == "")
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,76 @@
+"""Unit tests for compositor.py
+github.com/bverc/retropie-status-overlay
+
+Author: bverc
+"""
+
+import unittest
+from unittest.mock import Mock
+
+from PIL import Image
+
+import compositor
+
+compositor.PNGVIEW_PATH = "echo"
+compositor.BCM_HOST_LIBS = []
+
+class TestCompositor(unittest.TestCase):
+    """A Class used to test compositor module."""
+
+    def test_set_alpha(self):
+        """Test set_alpha() scales alpha channel and leaves colour alone."""
+        image = Image.new("RGBA", (2, 2), (10, 20, 30, 200))
+        self.assertTrue(compositor.set_alpha(image, 255) is image)
+        faded = compositor.set_alpha(image, 100)
+        self.assertTrue(faded.getpixel((0, 0)) == (10, 20, 30, 78))
+        self.assertTrue(image.getpixel((0, 0)) == (10, 20, 30, 200))
+
+    def test_create_layer_fallback(self):
+        """Test create_layer() falls back to pngview without libbcm_host."""
+        layer = compositor.create_layer("test")
+        self.assertTrue(isinstance(layer, compositor.PngviewLayer))
+
+    def test_overlay_update(self):
+        """Test Overlay only pushes changed images and reuses one process."""
+        overlay = compositor.Overlay("test")
+        self.assertFalse(overlay.visible)
+        image = Image.new("RGBA", (4, 4), (255, 0, 0, 255))
+        self.assertTrue(overlay.update(image, 10, 20))
+        self.assertTrue(overlay.visible)
+        process = overlay.backend.process
+        self.assertTrue(process.args[-5:-1] == ["-y", "20", "-x", "10"])
+
+        # Identical image and position, nothing to do
+        self.assertFalse(overlay.update(image.copy(), 10, 20))
+        self.assertTrue(overlay.backend.process is process)
+
+        # New image replaces the single process
+        self.assertTrue(overlay.update(Image.new("RGBA", (4, 4)), 10, 20))
+        self.assertFalse(overlay.backend.process is process)
+
+        overlay.hide()
+        self.assertFalse(overlay.visible)
+        self.assertTrue(overlay.backend is None)
+
+    def test_dispmanx_layer(self):
+        """Test DispmanxLayer reuses its element when geometry is unchanged."""
+        bcm = Mock()
+        layer = compositor.DispmanxLayer(bcm)
+        image = Image.new("RGBA", (20, 4))
+        layer.update(image, 0, 0)
+        self.assertTrue(bcm.vc_dispmanx_element_add.call_count == 1)
+        self.assertTrue(layer.geometry == (0, 0, 32, 4)) # pitch aligned to 16 pixels
+
+        layer.update(image, 0, 0)
+        self.assertTrue(bcm.vc_dispmanx_element_add.call_count == 1)
+        self.assertTrue(bcm.vc_dispmanx_element_modified.call_count == 1)
+
+        layer.update(image, 5, 0)
+        self.assertTrue(bcm.vc_dispmanx_element_add.call_count == 2)
+        self.assertTrue(bcm.vc_dispmanx_element_remove.call_count == 1)
+
+        layer.close()
+        self.assertTrue(bcm.vc_dispmanx_display_close.call_count == 1)
+
+if __name__ == '__main__':
+    unittest.main()
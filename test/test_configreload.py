@@ -0,0 +1,41 @@
+"""Unit tests for configreload.py
+github.com/bverc/retropie-status-overlay
+
+Author: bverc
+"""
+
+import unittest
+import configparser
+
+import configreload
+
+class TestConfigReload(unittest.TestCase):
+    """A Class used to test configreload module."""
+
+    def test_diff(self):
+        """Test changed, added and removed options and sections are found."""
+        old = configparser.ConfigParser()
+        old.read_dict({"Icons": {"Size": "48", "Color": "#7d7d7d"},
+                       "Audio": {"Card": "default"}})
+        new = configparser.ConfigParser()
+        new.read_dict({"Icons": {"Size": "36", "Color": "#7d7d7d", "Display": "2"},
+                       "Wifi": {"Interface": "wlan0"}})
+        self.assertTrue(configreload.diff(old, new) == {("Icons", "size"), ("Icons", "display"),
+                                                        ("Audio", "card"),
+                                                        ("Wifi", "interface")})
+        self.assertFalse(configreload.diff(old, old))
+
+        configreload.apply(old, new)
+        self.assertFalse(configreload.diff(old, new))
+        self.assertFalse(old.has_section("Audio"))
+
+    def test_matches(self):
+        """Test patterns match sections and options ignoring case."""
+        changes = {("ADC Current", "gain")}
+        self.assertTrue(configreload.matches(changes, [("ADC *", "*")]))
+        self.assertTrue(configreload.matches(changes, [("Icons", "*"), ("adc current", "Gain")]))
+        self.assertFalse(configreload.matches(changes, [("Detection", "ADC*")]))
+        self.assertFalse(configreload.matches(changes, []))
+
+if __name__ == '__main__':
+    unittest.main()
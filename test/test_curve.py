@@ -0,0 +1,65 @@
+"""Unit tests for curve.py
+github.com/bverc/retropie-status-overlay
+
+Author: bverc
+"""
+
+import unittest
+import os
+import tempfile
+
+import curve
+import metrics
+
+class TestCurve(unittest.TestCase):
+    """A Class used to test curve module."""
+
+    def test_percent(self):
+        """Test percent() interpolates between points and limits to the curve's range."""
+        discharge_curve = curve.DischargeCurve([(4.1, 100), (3.3, 0), (3.7, 20)])
+        self.assertTrue(abs(discharge_curve.percent(3.7) - 20) < 0.1)
+        self.assertTrue(abs(discharge_curve.percent(3.5) - 10) < 0.1)
+        self.assertTrue(abs(discharge_curve.percent(3.9) - 60) < 0.1)
+        self.assertTrue(discharge_curve.percent(3.0) == 0)
+        self.assertTrue(discharge_curve.percent(4.5) == 100)
+        self.assertTrue(discharge_curve.empty_voltage == 3.3)
+
+        linear = curve.DischargeCurve.linear(3.2, 4.2)
+        self.assertTrue(abs(linear.percent(3.7) - 50) < 0.1)
+
+        with self.assertRaises(ValueError):
+            curve.DischargeCurve([(3.3, 0)])
+
+    def test_load_save(self):
+        """Test curve file round trips."""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "curve.csv")
+            curve.save(path, [(3.3, 0), (4.1, 100)])
+            with open(path, "r", encoding="utf-8") as file:
+                self.assertTrue(file.read() == "# voltage,percent\n4.100,100\n3.300,0\n")
+            self.assertTrue(curve.load(path) == [(4.1, 100), (3.3, 0)])
+
+    def test_calibrate(self):
+        """Test calibrate() finds full discharge cycles and builds a rising curve."""
+        samples = []
+        # Charging, then a 2 hour discharge from 4.1 V to 3.3 V falling faster at the end
+        for minute in range(30):
+            samples.append(metrics.Sample(minute * 60, 3.8 + minute * 0.01, None, None, 0))
+        for minute in range(121):
+            voltage = 4.1 - 0.5 * minute / 100 if minute <= 100 else 3.6 - 0.3 * (minute - 100) / 20
+            samples.append(metrics.Sample(1800 + minute * 60, voltage, None, None, 0))
+        # Too short after power was restored
+        samples.append(metrics.Sample(20000, 4.1, None, None, 0))
+        samples.append(metrics.Sample(20060, 3.5, None, None, 0))
+
+        self.assertTrue(len(curve.discharge_cycles(samples)) == 1)
+        points = curve.calibrate(samples)
+        self.assertTrue(points[0] == (3.3, 0))
+        self.assertTrue(points[-1] == (4.1, 100))
+        self.assertTrue(len(points) == 21)
+        # A quarter of the time remaining is at 3.65 V, not a quarter way from 3.3 V to 4.1 V
+        self.assertTrue(dict((percent, voltage) for (voltage, percent) in points)[25] == 3.65)
+        self.assertFalse(curve.calibrate(samples[:30]))
+
+if __name__ == '__main__':
+    unittest.main()
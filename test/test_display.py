@@ -0,0 +1,60 @@
+"""Unit tests for display.py
+github.com/bverc/retropie-status-overlay
+
+Author: bverc
+"""
+
+import unittest
+import os
+import tempfile
+
+import display
+
+def make_connector(drm_dir, name, status, modes):
+    """Create a fake DRM connector directory."""
+    os.makedirs(os.path.join(drm_dir, name))
+    with open(os.path.join(drm_dir, name, "status"), "w", encoding="utf-8") as file:
+        file.write(status + "\n")
+    with open(os.path.join(drm_dir, name, "modes"), "w", encoding="utf-8") as file:
+        file.write(modes)
+
+class TestDisplay(unittest.TestCase):
+    """A Class used to test display module."""
+
+    def setUp(self):
+        """Create fake sysfs with an HDMI and a DSI display connected."""
+        self.tmp = tempfile.TemporaryDirectory() # pylint: disable=consider-using-with
+        display.DRM_DIR = self.tmp.name
+        display.FB_DEVICE = os.path.join(self.tmp.name, "fb{}")
+        display.TVSERVICE_CMD = ["no_tvservice"]
+        os.makedirs(os.path.join(self.tmp.name, "card1"))
+        make_connector(self.tmp.name, "card1-HDMI-A-1", "connected", "1920x1080\n1280x720\n")
+        make_connector(self.tmp.name, "card1-HDMI-A-2", "disconnected", "")
+        make_connector(self.tmp.name, "card1-DSI-1", "connected", "800x480\n")
+
+    def tearDown(self):
+        """Remove fake sysfs."""
+        self.tmp.cleanup()
+
+    def test_connectors(self):
+        """Test only connected displays are found, with their preferred mode."""
+        self.assertTrue(display.connectors(self.tmp.name)
+                        == {"DSI-1": (800, 480), "HDMI-A-1": (1920, 1080)})
+        self.assertFalse(display.connectors(os.path.join(self.tmp.name, "missing")))
+
+    def test_resolution(self):
+        """Test resolution of a chosen display, the first display, tvservice or default."""
+        self.assertTrue(display.framebuffer_size() is None)
+        self.assertTrue(display.resolution("HDMI-A-1") == ["1920", "1080"])
+        self.assertTrue(display.resolution() == ["800", "480"])
+        self.assertTrue(display.resolution("HDMI-A-2") == ["800", "480"])
+
+        display.DRM_DIR = os.path.join(self.tmp.name, "missing")
+        display.TVSERVICE_CMD = ["echo", "state 0x12000a [HDMI CEA (4) RGB lim 16:9], "
+                                         "1280x720 @ 60.00Hz, progressive"]
+        self.assertTrue(display.resolution() == ["1280", "720"])
+        display.TVSERVICE_CMD = ["no_tvservice"]
+        self.assertTrue(display.resolution() == ["1920", "1080"])
+
+if __name__ == '__main__':
+    unittest.main()
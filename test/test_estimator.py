@@ -0,0 +1,77 @@
+"""Unit tests for estimator.py
+github.com/bverc/retropie-status-overlay
+
+Author: bverc
+"""
+
+import unittest
+import random
+
+import estimator
+
+# Discharging 0.2 V per hour
+SLOPE = -0.2 / 3600
+
+def discharge(battery_estimator, samples, noise=0.02):
+    """Feed readings of a steady discharge from 4 V every 30 seconds, return last estimate."""
+    rand = random.Random(1)
+    for sample in range(samples):
+        value = battery_estimator.update(4 + SLOPE * sample * 30 + rand.gauss(0, noise),
+                                         sample * 30)
+    return value
+
+class TestEstimator(unittest.TestCase):
+    """A Class used to test estimator module."""
+
+    def test_create(self):
+        """Test create() returns estimator by name."""
+        self.assertTrue(isinstance(estimator.create("Kalman"), estimator.KalmanEstimator))
+        self.assertTrue(isinstance(estimator.create("ema"), estimator.EmaEstimator))
+        with self.assertRaises(KeyError):
+            estimator.create("median")
+
+    def test_discharge(self):
+        """Test both estimators smooth noise and track discharge slope."""
+        for name in estimator.ESTIMATORS:
+            battery_estimator = estimator.create(name)
+            self.assertTrue(battery_estimator.time_to_empty(3.2) is None)
+            self.assertTrue(battery_estimator.update(4.0, 0) == 4.0)
+            # After 2 hours, expect 3.6 V
+            value = discharge(battery_estimator, 241)
+            self.assertTrue(abs(value - 3.6) < 0.02, name)
+            self.assertTrue(abs(battery_estimator.slope - SLOPE) < abs(SLOPE) / 4, name)
+            # Expect about 2 hours left to 3.2 V
+            remaining = battery_estimator.time_to_empty(3.2)
+            self.assertTrue(5400 < remaining < 9600, name)
+
+    def test_jump(self):
+        """Test a jump in voltage resets estimate."""
+        battery_estimator = estimator.KalmanEstimator()
+        discharge(battery_estimator, 100)
+        self.assertTrue(battery_estimator.update(4.4, 3000) == 4.4)
+        self.assertTrue(battery_estimator.slope == 0)
+        self.assertTrue(battery_estimator.time_to_empty(3.2) is None)
+
+    def test_hysteresis(self):
+        """Test level only changes once well past a boundary."""
+        hysteresis = estimator.Hysteresis(0.25)
+        self.assertTrue(hysteresis.level("discharging", 5.4) == 5)
+        self.assertTrue(hysteresis.level("discharging", 5.6) == 5)
+        self.assertTrue(hysteresis.level("discharging", 4.3) == 5)
+        self.assertTrue(hysteresis.level("discharging", 4.2) == 4)
+        self.assertTrue(hysteresis.level("charging", 4.6) == 5)
+
+    def test_coulomb_counter(self):
+        """Test charge is counted down from current drawn."""
+        counter = estimator.CoulombCounter(2000)
+        self.assertTrue(counter.update(1.0, 0) is None)
+        counter.sync(50, 0)
+        # 1 A for half an hour is 500 mAh, a quarter of capacity
+        self.assertTrue(abs(counter.update(1.0, 1800) - 25) < 1e-9)
+        self.assertTrue(abs(counter.time_to_empty(1.0) - 1800) < 1e-6)
+        self.assertTrue(counter.time_to_empty(-0.5) is None)
+        # Charging counts up, limited to 100 percent
+        self.assertTrue(counter.update(-2.0, 7200) == 100)
+
+if __name__ == '__main__':
+    unittest.main()
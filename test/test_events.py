@@ -0,0 +1,178 @@
+"""Unit tests for events.py
+github.com/bverc/retropie-status-overlay
+
+Author: bverc
+"""
+
+import unittest
+import os
+import tempfile
+import threading
+import time
+from unittest.mock import Mock
+
+import events
+
+class PipeSource:
+    """An event source backed by a pipe, used to simulate device events."""
+
+    def __init__(self, relevant=True):
+        """Open pipe."""
+        self.read_fd, self.write_fd = os.pipe()
+        os.set_blocking(self.read_fd, False)
+        self.relevant = relevant
+
+    def fileno(self):
+        """Return file descriptor to wait on."""
+        return self.read_fd
+
+    def fire(self):
+        """Simulate an event."""
+        os.write(self.write_fd, b"x")
+
+    def drain(self):
+        """Read all pending events."""
+        try:
+            os.read(self.read_fd, 4096)
+        except BlockingIOError:
+            pass
+        return self.relevant
+
+    def close(self):
+        """Close pipe."""
+        os.close(self.read_fd)
+        os.close(self.write_fd)
+
+class TestEvents(unittest.TestCase):
+    """A Class used to test events module."""
+
+    def test_wait_poll(self):
+        """Test wait() returns tasks as they become due."""
+        scheduler = events.Scheduler()
+        scheduler.add("fast", (0.01, 0.04))
+        scheduler.add("slow", (10, 10))
+        self.assertTrue(scheduler.wait() == {"fast", "slow"})
+        scheduler.report("fast", False)
+        scheduler.report("slow", False)
+        self.assertTrue(scheduler.wait() == {"fast"})
+        scheduler.close()
+
+    def test_report(self):
+        """Test report() backs off while stable and tightens after a change."""
+        scheduler = events.Scheduler()
+        scheduler.add("task", (1, 4))
+        scheduler.report("task", False)
+        self.assertTrue(scheduler.intervals["task"][0] == 2)
+        scheduler.report("task", False)
+        scheduler.report("task", False)
+        self.assertTrue(scheduler.intervals["task"][0] == 4)
+        scheduler.report("task", True)
+        self.assertTrue(scheduler.intervals["task"][0] == 1)
+        # Only the latest schedule counts, earlier entries are discarded when popped
+        scheduler.schedule("task", time.monotonic() + 10)
+        scheduler.queue.sort()
+        scheduler.queue[0] = (0, "task")
+        self.assertFalse(scheduler.pop_due())
+        scheduler.schedule("task", 0)
+        self.assertTrue(scheduler.pop_due() == {"task"})
+
+    def test_wait_event(self):
+        """Test wait() wakes immediately on a relevant event and coalesces bursts."""
+        scheduler = events.Scheduler()
+        scheduler.add("device", (10, 10))
+        self.assertTrue(scheduler.wait() == {"device"})
+        scheduler.report("device", False)
+        source = PipeSource()
+        scheduler.register(source, "device")
+        source.fire()
+        source.fire()
+        start = time.monotonic()
+        self.assertTrue(scheduler.wait() == {"device"})
+        self.assertTrue(time.monotonic() - start < 1)
+        scheduler.close()
+
+    def test_wait_irrelevant_event(self):
+        """Test wait() ignores events which are not relevant."""
+        scheduler = events.Scheduler()
+        scheduler.add("device", (0.05, 0.05))
+        scheduler.report("device", False)
+        source = PipeSource(relevant=False)
+        scheduler.register(source, "irrelevant")
+        source.fire()
+        self.assertTrue(scheduler.wait() == {"device"})
+        scheduler.close()
+
+    def test_register_device(self):
+        """Test register_device() with and without wakeup sources."""
+        scheduler = events.Scheduler()
+        device = Mock(spec=["NAME", "get_state"])
+        device.NAME = "Device1"
+        self.assertTrue(scheduler.register_device(device) == 0)
+        self.assertTrue(scheduler.intervals["Device1"] == [5, 5, 5])
+        device = Mock()
+        device.NAME = "Device2"
+        device.POLL_INTERVAL = (1, 60)
+        device.wakeup_sources.return_value = [PipeSource(), PipeSource()]
+        self.assertTrue(scheduler.register_device(device) == 2)
+        self.assertTrue(scheduler.intervals["Device2"] == [1, 1, 60])
+        scheduler.close()
+
+    def test_thread_events(self):
+        """Test values posted from another thread wake the scheduler."""
+        scheduler = events.Scheduler()
+        scheduler.add("idle", (10, 10))
+        scheduler.wait()
+        scheduler.report("idle", False)
+        thread_events = events.ThreadEvents()
+        scheduler.register(thread_events, "gpio")
+        thread = threading.Thread(target=lambda: [thread_events.post(channel)
+                                                  for channel in (17, 27)])
+        thread.start()
+        self.assertTrue(scheduler.wait() == {"gpio"})
+        thread.join()
+        self.assertTrue(thread_events.pop() == [17, 27])
+        self.assertFalse(thread_events.pop())
+
+        # One-off timer
+        scheduler.call_later("button", 0.01)
+        self.assertTrue(scheduler.wait() == {"button"})
+        scheduler.close()
+
+    def test_remove(self):
+        """Test remove() stops a task and closes its event sources."""
+        scheduler = events.Scheduler()
+        scheduler.add("idle", (0.05, 0.05))
+        scheduler.add("device", (0.01, 0.01))
+        source = PipeSource()
+        scheduler.register(source, "device")
+        scheduler.remove("device")
+        self.assertFalse("device" in scheduler.intervals)
+        self.assertFalse(scheduler.selector.get_map())
+        self.assertTrue(scheduler.wait() == {"idle"})
+        # A task removed after it became due is not rescheduled
+        scheduler.report("device", False)
+        self.assertFalse("device" in scheduler.due_at)
+        scheduler.close()
+
+    def test_inotify_source(self):
+        """Test a file being written or replaced is seen, and other files ignored."""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "config.ini")
+            source = events.InotifySource(path)
+            self.assertFalse(source.drain())
+            with open(os.path.join(directory, "other.ini"), "w", encoding="utf-8") as file:
+                file.write("[Icons]")
+            self.assertFalse(source.drain())
+            with open(path, "w", encoding="utf-8") as file:
+                file.write("[Icons]")
+            self.assertTrue(source.drain())
+            self.assertFalse(source.drain())
+            # Editors which save to a new file and rename it over the old
+            with open(path + ".tmp", "w", encoding="utf-8") as file:
+                file.write("[Icons]")
+            os.replace(path + ".tmp", path)
+            self.assertTrue(source.drain())
+            source.close()
+
+if __name__ == '__main__':
+    unittest.main()
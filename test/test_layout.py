@@ -0,0 +1,68 @@
+"""Unit tests for layout.py
+github.com/bverc/retropie-status-overlay
+
+Author: bverc
+"""
+
+import unittest
+
+from PIL import Image
+
+import compositor
+import layout
+
+def mock_loader(state, alpha):
+    """A function to mock IconAtlas.get(), returns a solid red or blue icon."""
+    colour = (255, 0, 0, 255) if state == "red" else (0, 0, 255, 255)
+    return compositor.set_alpha(Image.new("RGBA", (48, 48), colour), alpha)
+
+class TestLayout(unittest.TestCase):
+    """A Class used to test layout module."""
+
+    def test_cell_x_left(self):
+        """Test cell positions from left side."""
+        status_bar = layout.StatusBar(7, "48", "8", "left")
+        self.assertTrue(status_bar.x_pos(1920) == 8)
+        self.assertTrue(status_bar.x_pos(1920) + status_bar.cell_x(0) == 8) # 8
+        self.assertTrue(status_bar.x_pos(1920) + status_bar.cell_x(1) == 64) # 8+48+8
+        self.assertTrue(status_bar.x_pos(1920) + status_bar.cell_x(6) == 344) # ((8+48)*6)+8
+
+    def test_cell_x_right(self):
+        """Test cell positions from right side."""
+        status_bar = layout.StatusBar(7, "24", "4", "right")
+        self.assertTrue(status_bar.x_pos(480) + status_bar.cell_x(0) == 452) # 480-(4+24)
+        self.assertTrue(status_bar.x_pos(480) + status_bar.cell_x(1) == 424) # 480-2*(4+24)
+        self.assertTrue(status_bar.x_pos(480) + status_bar.cell_x(6) == 284) # 480-7*(4+24)
+
+    def test_render(self):
+        """Test render() only redraws cells that changed and re-lays out following cells."""
+        status_bar = layout.StatusBar(3, "48", "8", "left")
+        self.assertTrue(status_bar.empty)
+        self.assertTrue(status_bar.render([("a", "red"), ("b", "blue")], 255, mock_loader)
+                        == [0, 1])
+        self.assertFalse(status_bar.empty)
+        self.assertTrue(status_bar.image.getpixel((0, 0)) == (255, 0, 0, 255))
+        self.assertTrue(status_bar.image.getpixel((56, 0)) == (0, 0, 255, 255))
+        self.assertTrue(status_bar.image.getpixel((50, 0)) == (0, 0, 0, 0)) # padding
+
+        # Nothing changed
+        self.assertTrue(status_bar.render([("a", "red"), ("b", "blue")], 255, mock_loader)
+                        == [])
+
+        # Only second cell changed
+        self.assertTrue(status_bar.render([("a", "red"), ("b", "red")], 255, mock_loader)
+                        == [1])
+
+        # First icon removed, second moves into its cell
+        self.assertTrue(status_bar.render([("b", "red")], 255, mock_loader) == [1])
+        self.assertTrue(status_bar.image.getpixel((56, 0)) == (0, 0, 0, 0))
+
+        # Alpha change redraws every occupied cell
+        self.assertTrue(status_bar.render([("b", "red")], 100, mock_loader) == [0])
+        self.assertTrue(status_bar.image.getpixel((0, 0)) == (255, 0, 0, 100))
+
+        status_bar.render([], 255, mock_loader)
+        self.assertTrue(status_bar.empty)
+
+if __name__ == '__main__':
+    unittest.main()
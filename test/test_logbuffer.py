@@ -0,0 +1,70 @@
+"""Unit tests for logbuffer.py
+github.com/bverc/retropie-status-overlay
+
+Author: bverc
+"""
+
+import unittest
+import logging
+from unittest.mock import Mock
+
+import logbuffer
+
+def make_logger(name, target, capacity=100, interval=600):
+    """Return logger writing to target through a BufferedHandler, and the handler."""
+    logger = logging.getLogger(name)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    handler = logbuffer.BufferedHandler(target, capacity, interval)
+    logger.addHandler(handler)
+    return logger, handler
+
+def written(target):
+    """Return messages passed to target."""
+    return [args[0].getMessage() for (args, _) in target.handle.call_args_list]
+
+class TestLogBuffer(unittest.TestCase):
+    """A Class used to test logbuffer module."""
+
+    def test_batches(self):
+        """Test records are held until capacity is reached or a warning is logged."""
+        target = Mock()
+        (logger, _) = make_logger("test_batches", target, capacity=3)
+        logger.info("one")
+        logger.info("two")
+        self.assertFalse(target.handle.called)
+        logger.info("three")
+        self.assertTrue(written(target) == ["one", "two", "three"])
+        logger.info("four")
+        logger.warning("shutting down")
+        self.assertTrue(written(target)[3:] == ["four", "shutting down"])
+
+    def test_interval(self):
+        """Test records are flushed once interval has passed."""
+        target = Mock()
+        (logger, handler) = make_logger("test_interval", target, interval=60)
+        logger.info("one")
+        self.assertFalse(target.handle.called)
+        handler.flushed_at -= 60
+        logger.info("two")
+        self.assertTrue(written(target) == ["one", "two"])
+
+    def test_collapse(self):
+        """Test consecutive identical lines are collapsed into a count."""
+        target = Mock()
+        (logger, handler) = make_logger("test_collapse", target)
+        for _ in range(4):
+            logger.info("Wifi: %s", "wifi_3")
+        logger.info("Wifi: wifi_2")
+        logger.info("Wifi: wifi_2")
+        handler.flush()
+        self.assertTrue(written(target) == ["Wifi: wifi_3", "unchanged ×3",
+                                            "Wifi: wifi_2", "unchanged ×1"])
+
+        # Repeats continue to be counted after a flush
+        logger.info("Wifi: wifi_2")
+        handler.flush()
+        self.assertTrue(written(target)[4:] == ["unchanged ×1"])
+
+if __name__ == '__main__':
+    unittest.main()
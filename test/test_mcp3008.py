@@ -32,5 +32,10 @@ class TestMCP3008(unittest.TestCase):
         self.assertTrue(mcp3008.read(2) == 1.65)
         self.assertTrue(mcp3008.read(3) == 3.3)
 
+    def test_read_many(self):
+        """Test mcp3008.read_many() averages back to back readings."""
+        mcp3008.adc.read_adc.side_effect = mock_read_adc
+        self.assertTrue(mcp3008.read_many(1, 4) == (0.825, 0))
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,92 @@
+"""Unit tests for metrics.py
+github.com/bverc/retropie-status-overlay
+
+Author: bverc
+"""
+
+import unittest
+import os
+import tempfile
+
+import metrics
+
+class TestMetrics(unittest.TestCase):
+    """A Class used to test metrics module."""
+
+    def setUp(self):
+        """Create a temporary directory for the ring file."""
+        self.tmp = tempfile.TemporaryDirectory() # pylint: disable=consider-using-with
+        self.path = os.path.join(self.tmp.name, "metrics.dat")
+
+    def tearDown(self):
+        """Remove temporary directory."""
+        self.tmp.cleanup()
+
+    def test_pack_unpack(self):
+        """Test a record round trips, and empty or torn records are rejected."""
+        sample = metrics.Sample(1000, 3.5, 80, None, 0x50005)
+        record = metrics.pack(7, sample)
+        self.assertTrue(len(record) == metrics.RECORD.size)
+        self.assertTrue(metrics.unpack(record) == (7, sample))
+        self.assertTrue(metrics.unpack(bytes(metrics.RECORD.size)) is None)
+        self.assertTrue(metrics.unpack(record[:8] + b"\xff" + record[9:]) is None)
+
+        # Current in mA
+        sample = metrics.Sample(1000, 3.5, 80, None, 0, -0.25)
+        self.assertTrue(metrics.unpack(metrics.pack(7, sample)) == (7, sample))
+
+    def test_ring(self):
+        """Test samples are buffered, wrap around and survive reopening."""
+        store = metrics.MetricsStore(self.path, capacity=4, flush_every=3)
+        self.assertTrue(os.path.getsize(self.path) == 12 + 4 * metrics.RECORD.size)
+        for timestamp in range(2):
+            store.append(metrics.Sample(timestamp, 4.0, 50, 50, 0))
+        # Nothing written until flush_every samples are pending
+        self.assertTrue(store.seq == 0)
+        self.assertTrue(len(store.samples()) == 2)
+        for timestamp in range(2, 6):
+            store.append(metrics.Sample(timestamp, 4.0, 50, 50, 0))
+        self.assertTrue(store.seq == 6)
+        store.close()
+
+        store = metrics.MetricsStore(self.path, capacity=100)
+        self.assertTrue(store.capacity == 4)
+        self.assertTrue([sample.time for sample in store.samples()] == [2, 3, 4, 5])
+        self.assertTrue([sample.time for sample in store.samples(3, 5)] == [3, 4])
+        store.record(voltage=3.9)
+        self.assertTrue(store.samples()[-1].quality is None)
+        store.close()
+
+    def test_downsample(self):
+        """Test downsample() aggregates each bucket, ignoring unknown values."""
+        store = metrics.MetricsStore(self.path, capacity=10)
+        store.append(metrics.Sample(60, 4.0, 40, None, 0))
+        store.append(metrics.Sample(90, 3.0, None, None, 0x10000))
+        store.append(metrics.Sample(120, None, 80, 20, 0))
+        aggregates = store.downsample(60)
+        self.assertTrue(len(aggregates) == 2)
+        self.assertTrue(aggregates[0] == (60, 2, 3.0, 3.5, 4.0, 40, None, 0x10000, None))
+        self.assertTrue(aggregates[1] == (120, 1, None, None, None, 80, 20, 0, None))
+        store.close()
+
+    def test_not_metrics_file(self):
+        """Test opening a file which is not a metrics file raises ValueError."""
+        with open(self.path, "wb") as file:
+            file.write(b"not a metrics file")
+        with self.assertRaises(ValueError):
+            metrics.MetricsStore(self.path)
+        with self.assertRaises(SystemExit):
+            metrics.open_existing(self.path)
+
+    def test_open_existing(self):
+        """Test open_existing() exits without creating a file if there is none."""
+        with self.assertRaises(SystemExit):
+            metrics.open_existing(self.path)
+        self.assertFalse(os.path.exists(self.path))
+        metrics.MetricsStore(self.path, capacity=4).close()
+        store = metrics.open_existing(self.path)
+        self.assertTrue(store.capacity == 4)
+        store.close()
+
+if __name__ == '__main__':
+    unittest.main()
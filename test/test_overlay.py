@@ -5,68 +5,49 @@ Author: bverc
 """
 
 import unittest
-import subprocess
+import configparser
+import dataclasses
 import os
+import tempfile
+import threading
 from unittest.mock import Mock
 
+import atlas
+import compositor
+import configreload
+import events
+import layout
 import overlay
+import plugins
+import settings
+import startup
+import throttle
 
 overlay.GPIO = Mock()
 overlay.GPIO.input = Mock()
+compositor.PNGVIEW_PATH = "echo"
+compositor.BCM_HOST_LIBS = []
+overlay.icon_atlas = atlas.IconAtlas({
+    "battery_critical_shutdown": "overlay_icons/battery-alert_120.png",
+    "flash": "overlay_icons/flash_48.png",
+    "thermometer": "overlay_icons/thermometer_48.png",
+}, "48")
+
+def set_option(section, option, value):
+    """Change option in overlay's config and parse its settings again."""
+    overlay.config[section][option] = value
+    overlay.options = settings.Settings.from_config(overlay.config)
+
+def mock_throttle(value):
+    """Create a throttle monitor with only vcgencmd available, replaced by echo."""
+    return throttle.ThrottleMonitor("no_sysfs", "no_vcio", ["echo", "throttled=" + value])
 
 class TestOverlay(unittest.TestCase):
     """A Class used to test overlay module."""
 
-    def test_pngview(self):
-        """Test pngview adds to overlay_processes by checking key was added."""
-        overlay.PNGVIEW_PATH = "echo"
-        self.assertFalse("test1" in overlay.overlay_processes)
-        overlay.pngview("test1", 0, 0, overlay.icons["under-voltage"])
-        self.assertTrue("test1" in overlay.overlay_processes)
-        overlay.overlay_processes["test1"].kill()
-
-        self.assertFalse("test2" in overlay.overlay_processes)
-        overlay.pngview("test2", 0, 0, overlay.icons["under-voltage"],0)
-        self.assertTrue("test2" in overlay.overlay_processes)
-        overlay.overlay_processes["test2"].kill()
-
-    def test_kill_overlay_process(self):
-        """Test kill_overlay_process() by checking key is removed from overlay_processes."""
-        overlay.overlay_processes["test3"] = subprocess.Popen("top") # pylint: disable=consider-using-with
-        self.assertTrue("test3" in overlay.overlay_processes)
-        overlay.kill_overlay_process("test3")
-        self.assertFalse("test3" in overlay.overlay_processes)
-        # Test raises an unexpected ResourceWarning, but test passes
-
-    def test_get_x_pos_left(self):
-        """Test get_x_pos() function from left side."""
-        overlay.ICON_PADDING = "8"
-        overlay.ICON_SIZE = "48"
-        overlay.resolution[0] = "1920"
-        overlay.config['Icons']['Horizontal'] = "left"
-        count = 1
-        self.assertTrue(overlay.get_x_pos(count) == 8) # 8
-        count = 2
-        self.assertTrue(overlay.get_x_pos(count) == 64) # 8+48+8
-        count = 7
-        self.assertTrue(overlay.get_x_pos(count) == 344) # ((8+48)*6)+8
-
-    def test_get_x_pos_right(self):
-        """Test get_x_pos() function from right side."""
-        overlay.ICON_PADDING = "4"
-        overlay.ICON_SIZE = "24"
-        overlay.resolution[0] = "480"
-        overlay.config['Icons']['Horizontal'] = "right"
-        count = 1
-        self.assertTrue(overlay.get_x_pos(count) == 452) # 480-(4+24)
-        count = 2
-        self.assertTrue(overlay.get_x_pos(count) == 424) # 480-2*(4+24)
-        count = 7
-        self.assertTrue(overlay.get_x_pos(count) == 284) # 480-7*(4+24)
-
     def test_environment_normal(self):
         """Test environment() function in normal operation."""
-        overlay.ENV_CMD = "echo throttled=0x0"
+        overlay.throttle_monitor = mock_throttle("0x0")
         env = overlay.environment()
         self.assertFalse(env["under-voltage"])
         self.assertFalse(env["freq-capped"])
@@ -74,13 +55,13 @@ class TestOverlay(unittest.TestCase):
 
     def test_environment_throttled(self):
         """Test environment() function in while throttled."""
-        overlay.ENV_CMD = "echo throttled=0x4"
+        overlay.throttle_monitor = mock_throttle("0x4")
         env = overlay.environment()
         self.assertFalse(env["under-voltage"])
         self.assertFalse(env["freq-capped"])
         self.assertTrue(env["throttled"])
 
-        overlay.ENV_CMD = "echo throttled=0x40004"
+        overlay.throttle_monitor = mock_throttle("0x40004")
         env = overlay.environment()
         self.assertFalse(env["under-voltage"])
         self.assertFalse(env["freq-capped"])
@@ -88,13 +69,13 @@ class TestOverlay(unittest.TestCase):
 
     def test_environment_throttled_under_voltage(self):
         """Test environment() function in while throttled and under voltage."""
-        overlay.ENV_CMD = "echo throttled=0x5"
+        overlay.throttle_monitor = mock_throttle("0x5")
         env = overlay.environment()
         self.assertTrue(env["under-voltage"])
         self.assertFalse(env["freq-capped"])
         self.assertTrue(env["throttled"])
 
-        overlay.ENV_CMD = "echo throttled=0x50005"
+        overlay.throttle_monitor = mock_throttle("0x50005")
         env = overlay.environment()
         self.assertTrue(env["under-voltage"])
         self.assertFalse(env["freq-capped"])
@@ -102,13 +83,13 @@ class TestOverlay(unittest.TestCase):
 
     def test_environment_freq_capped(self):
         """Test environment() function in while frequency capped."""
-        overlay.ENV_CMD = "echo throttled=0x2"
+        overlay.throttle_monitor = mock_throttle("0x2")
         env = overlay.environment()
         self.assertFalse(env["under-voltage"])
         self.assertTrue(env["freq-capped"])
         self.assertFalse(env["throttled"])
 
-        overlay.ENV_CMD = "echo throttled=0x20002"
+        overlay.throttle_monitor = mock_throttle("0x20002")
         env = overlay.environment()
         self.assertFalse(env["under-voltage"])
         self.assertTrue(env["freq-capped"])
@@ -116,48 +97,40 @@ class TestOverlay(unittest.TestCase):
 
     def test_environment_under_voltage(self):
         """Test environment() function in while under voltage."""
-        overlay.ENV_CMD = "echo throttled=0x1"
+        overlay.throttle_monitor = mock_throttle("0x1")
         env = overlay.environment()
         self.assertTrue(env["under-voltage"])
         self.assertFalse(env["freq-capped"])
         self.assertFalse(env["throttled"])
 
-        overlay.ENV_CMD = "echo throttled=0x10001"
+        overlay.throttle_monitor = mock_throttle("0x10001")
         env = overlay.environment()
         self.assertTrue(env["under-voltage"])
         self.assertFalse(env["freq-capped"])
         self.assertFalse(env["throttled"])
 
-    def test_check_process(self):
-        """Test check_process() with various processes names."""
-        # process abcdefg should not exist
-        self.assertFalse(overlay.check_process("abcdefg"))
-        # process systemd should be running
-        self.assertTrue(overlay.check_process("systemd"))
-
     def test_shutdown_abort_shutdown(self):
         """Start a shutdown then abort, check icon has been added then removed."""
-        self.assertFalse("caution" in overlay.overlay_processes)
+        self.assertFalse(overlay.caution.visible)
         overlay.shutdown()
-        self.assertTrue("caution" in overlay.overlay_processes)
+        self.assertTrue(overlay.caution.visible)
         overlay.abort_shutdown()
-        self.assertFalse("caution" in overlay.overlay_processes)
+        self.assertFalse(overlay.caution.visible)
 
     def test_get_alpha(self):
         """Test get_alpha() with different game states."""
-        overlay.config['Detection']['InGameAlpha'] = "255"
+        set_option('Detection', 'InGameAlpha', "255")
         self.assertTrue(overlay.get_alpha(False) == "255")
         self.assertTrue(overlay.get_alpha(True) == "255")
 
-        overlay.config['Detection']['InGameAlpha'] = "100"
+        set_option('Detection', 'InGameAlpha', "100")
         self.assertTrue(overlay.get_alpha(False) == "255")
         self.assertTrue(overlay.get_alpha(True) == "100")
 
     def test_adc_shutdown(self):
         """Test adc_shutdown() with various voltages and pending shutdown states."""
-        overlay.PNGVIEW_PATH = "echo"
-        overlay.config['Detection']['VMinCharging'] = "4"
-        overlay.config['Detection']['VMinDischarging'] = "3.2"
+        set_option('Detection', 'VMinCharging', "4")
+        set_option('Detection', 'VMinDischarging', "3.2")
 
         # Voltage below minimum discharging voltage, expect always True
         self.assertTrue(overlay.adc_shutdown(True, 3.0))
@@ -177,31 +150,43 @@ class TestOverlay(unittest.TestCase):
     def test_interrupt_shutdown_rising(self):
         """Test interrupt_shutdown() with rising edge GPIO."""
         overlay.GPIO.input.return_value = True
+        scheduler = Mock()
 
         # GPIO Rising Edge Interrupt
-        overlay.config['BatteryLDO']['GPIO'] = "1"
-        overlay.config['ShutdownGPIO']['GPIO'] = "2"
+        set_option('BatteryLDO', 'GPIO', "1")
+        set_option('ShutdownGPIO', 'GPIO', "2")
 
         # BatteryLDO, ActiveLow, GPIO High, no shutdown
-        overlay.config['BatteryLDO']['ActiveLow'] = "True"
-        self.assertFalse("caution" in overlay.overlay_processes)
-        overlay.interrupt_shutdown(1)
-        self.assertFalse("caution" in overlay.overlay_processes)
+        set_option('BatteryLDO', 'ActiveLow', "True")
+        self.assertFalse(overlay.caution.visible)
+        overlay.interrupt_shutdown(1, scheduler)
+        self.assertFalse(overlay.caution.visible)
 
         # BatteryLDO, ActiveHigh, GPIO High, Shutdown
-        overlay.config['BatteryLDO']['ActiveLow'] = "False"
-        self.assertFalse("caution" in overlay.overlay_processes)
-        overlay.interrupt_shutdown(1)
-        self.assertTrue("caution" in overlay.overlay_processes)
+        set_option('BatteryLDO', 'ActiveLow', "False")
+        self.assertFalse(overlay.caution.visible)
+        overlay.interrupt_shutdown(1, scheduler)
+        self.assertTrue(overlay.caution.visible)
         overlay.abort_shutdown()
 
         # ShutdownGPIO, ActiveLow, GPIO High, no shutdown
-        overlay.config['ShutdownGPIO']['ActiveLow'] = "True"
-        self.assertFalse("caution" in overlay.overlay_processes)
-        overlay.interrupt_shutdown(2)
-        self.assertFalse("caution" in overlay.overlay_processes)
+        set_option('ShutdownGPIO', 'ActiveLow', "True")
+        self.assertFalse(overlay.caution.visible)
+        overlay.interrupt_shutdown(2, scheduler)
+        self.assertFalse(overlay.caution.visible)
+        self.assertFalse(scheduler.call_later.called)
+
+        # ShutdownGPIO, ActiveHigh, GPIO High, checked again after held for a second
+        set_option('ShutdownGPIO', 'ActiveLow', "False")
+        overlay.interrupt_shutdown(2, scheduler)
+        scheduler.call_later.assert_called_once_with("shutdown_button", 1)
+
+        # Released before the check, no shutdown
+        set_option('ShutdownGPIO', 'ActiveLow', "True")
+        overlay.shutdown_button()
+        self.assertFalse(overlay.caution.visible)
 
-        # Cannot test ShutdownGPIO, ActiveHigh, GPIO High, as will cause immediate shutdown
+        # Cannot test ShutdownGPIO still held, as will cause immediate shutdown
 
         # Abort any pending shutdown
         os.system("sudo shutdown -c")
@@ -209,110 +194,273 @@ class TestOverlay(unittest.TestCase):
     def test_interrupt_shutdown_falling(self):
         """Test interrupt_shutdown() with falling edge GPIO."""
         overlay.GPIO.input.return_value = False
+        scheduler = Mock()
 
         # GPIO Falling Edge Interrupt
-        overlay.config['BatteryLDO']['GPIO'] = "11"
-        overlay.config['ShutdownGPIO']['GPIO'] = "12"
+        set_option('BatteryLDO', 'GPIO', "11")
+        set_option('ShutdownGPIO', 'GPIO', "12")
 
         # BatteryLDO, ActiveLow, GPIO Low, Shutdown
-        overlay.config['BatteryLDO']['ActiveLow'] = "True"
-        self.assertFalse("caution" in overlay.overlay_processes)
-        overlay.interrupt_shutdown(11)
-        self.assertTrue("caution" in overlay.overlay_processes)
+        set_option('BatteryLDO', 'ActiveLow', "True")
+        self.assertFalse(overlay.caution.visible)
+        overlay.interrupt_shutdown(11, scheduler)
+        self.assertTrue(overlay.caution.visible)
         overlay.abort_shutdown()
 
         # BatteryLDO, ActiveHigh, GPIO Low, no shutdown
-        overlay.config['BatteryLDO']['ActiveLow'] = "False"
-        self.assertFalse("caution" in overlay.overlay_processes)
-        overlay.interrupt_shutdown(11)
-        self.assertFalse("caution" in overlay.overlay_processes)
+        set_option('BatteryLDO', 'ActiveLow', "False")
+        self.assertFalse(overlay.caution.visible)
+        overlay.interrupt_shutdown(11, scheduler)
+        self.assertFalse(overlay.caution.visible)
 
         # ShutdownGPIO, ActiveHigh, GPIO Low, no shutdown
-        overlay.config['ShutdownGPIO']['ActiveLow'] = "False"
-        self.assertFalse("caution" in overlay.overlay_processes)
-        overlay.interrupt_shutdown(12)
-        self.assertFalse("caution" in overlay.overlay_processes)
+        set_option('ShutdownGPIO', 'ActiveLow', "False")
+        self.assertFalse(overlay.caution.visible)
+        overlay.interrupt_shutdown(12, scheduler)
+        self.assertFalse(overlay.caution.visible)
 
         # Cannot test ShutdownGPIO, ActiveLow, GPIO Low, as will cause immediate shutdown
 
         # Abort any pending shutdown
         os.system("sudo shutdown -c")
 
-    def test_update_device_icon(self):
-        """Test update_device_icon() with mock data."""
-        overlay.PNGVIEW_PATH = "echo"
-        overlay.icons = {
-            "state1": "state1.png",
-            "state2": "state2.png",
-        }
+    def test_set_device_state(self):
+        """Test set_device_state() with mock data."""
+        states = {"DeviceName": None}
 
-        # Create mock device
-        device = Mock()
-        device.NAME = "DeviceName"
-        device.get_state.return_value = "state1", "info"
-
-        states = {"DeviceName": "state1", "ingame": False}
-
-        # State unchanged, ingame unchanged
-        info = overlay.update_device_icon(1, device, states, False, 255)
+        (changed, info) = overlay.set_device_state("DeviceName", states, ("state1", "info"))
+        self.assertTrue(changed)
         self.assertTrue(info == "info")
-        self.assertFalse("DeviceName" in overlay.overlay_processes)
+        self.assertTrue(states["DeviceName"] == "state1")
 
-        # State unchanged, ingame changed
-        info = overlay.update_device_icon(1, device, states, True, 255)
-        self.assertTrue(info == "info")
-        self.assertTrue("state1.png" in overlay.overlay_processes["DeviceName"].args)
+        # State unchanged
+        (changed, info) = overlay.set_device_state("DeviceName", states, ("state1", "info"))
+        self.assertFalse(changed)
 
-        # State changed, ingame unchanged
-        device.get_state.return_value = "state2", "new_info"
-        info = overlay.update_device_icon(1, device, states, True, 255)
+        (changed, info) = overlay.set_device_state("DeviceName", states, ("state2", "new_info"))
+        self.assertTrue(changed)
         self.assertTrue(info == "new_info")
-        self.assertTrue("state2.png" in overlay.overlay_processes["DeviceName"].args)
+        self.assertTrue(states["DeviceName"] == "state2")
 
-        # Kill process
-        overlay.kill_overlay_process("DeviceName")
-
-    def test_update_env_icons(self):
-        """Test update_env_icons() with mock data."""
-        overlay.PNGVIEW_PATH = "echo"
-        overlay.environment = Mock()
-        overlay.icons = {
-            "under-voltage": "flash.png",
-            "freq-capped": "thermometer.png",
-            "throttled": "thermometer-lines.png"
-        }
+    def test_set_env_state(self):
+        """Test set_env_state() with mock data."""
+        states = {"environment": []}
 
         # Normal Environment
-        overlay.environment.return_value = {
-            "under-voltage": False,
-            "freq-capped": False,
-            "throttled": False
-        }
-        self.assertEqual(overlay.update_env_icons(1, 255), "normal")
+        env = {"under-voltage": False, "freq-capped": False, "throttled": False}
+        self.assertEqual(overlay.set_env_state(states, env), (False, "normal"))
+        self.assertFalse(states["environment"])
 
         # Under voltage
-        overlay.environment.return_value = {
-            "under-voltage": True,
-            "freq-capped": False,
-            "throttled": False
-        }
-        self.assertEqual(overlay.update_env_icons(1, 255), "under-voltage")
+        env = {"under-voltage": True, "freq-capped": False, "throttled": False}
+        self.assertEqual(overlay.set_env_state(states, env), (True, "under-voltage"))
+        self.assertTrue(states["environment"] == ["under-voltage"])
 
         # Frequency capped
-        overlay.environment.return_value = {
-            "under-voltage": False,
-            "freq-capped": True,
-            "throttled": False
-        }
-        self.assertEqual(overlay.update_env_icons(1, 255), "freq-capped")
+        env = {"under-voltage": False, "freq-capped": True, "throttled": False}
+        self.assertEqual(overlay.set_env_state(states, env), (True, "freq-capped"))
+        self.assertTrue(states["environment"] == ["freq-capped"])
 
         # Throttled
-        overlay.environment.return_value = {
-            "under-voltage": False,
-            "freq-capped": False,
-            "throttled": True
-        }
-        self.assertEqual(overlay.update_env_icons(1, 255), "throttled")
+        env = {"under-voltage": False, "freq-capped": False, "throttled": True}
+        self.assertEqual(overlay.set_env_state(states, env), (True, "throttled"))
+        self.assertEqual(overlay.set_env_state(states, env), (False, "throttled"))
+
+    def test_poll(self):
+        """Test poll() only polls due devices and reports changes to scheduler."""
+        device1 = Mock()
+        device1.NAME = "Device1"
+        device1.get_state.return_value = "state1", "info1"
+        device2 = Mock()
+        device2.NAME = "Device2"
+        device2.get_state.return_value = "state2", "info2"
+        states = {"Device1": None, "Device2": "state2", "environment": []}
+        scheduler = Mock()
+
+        info = overlay.poll({"Device1"}, [device1, device2], states, scheduler)
+        self.assertTrue(info == {"Device1": "info1"})
+        self.assertFalse(device2.get_state.called)
+        scheduler.report.assert_called_once_with("Device1", True)
+
+        # Device check which takes too long keeps its last state
+        release = threading.Event()
+        device2.get_state.side_effect = lambda: release.wait(5) and ("state3", "info3")
+        overlay.probe_pool.timeout = 0.1
+        scheduler.reset_mock()
+        info = overlay.poll({"Device2"}, [device1, device2], states, scheduler)
+        self.assertFalse(info)
+        self.assertTrue(states["Device2"] == "state2")
+        scheduler.report.assert_called_once_with("Device2", False)
+        release.set()
+        overlay.probe_pool.running["Device2"][0].result(1)
+        info = overlay.poll({"Device2"}, [device1, device2], states, scheduler)
+        self.assertTrue(info == {"Device2": "info3"})
+        self.assertTrue(states["Device2"] == "state3")
+        overlay.probe_pool.timeout = 2.0
+
+        # Environment is checked when due
+        environment = overlay.environment
+        overlay.environment = Mock(return_value={"under-voltage": False, "freq-capped": False,
+                                                 "throttled": True})
+        scheduler.reset_mock()
+        info = overlay.poll({"environment"}, [device1, device2], states, scheduler)
+        overlay.environment = environment
+        self.assertTrue(info == {"environment": "throttled"})
+        self.assertTrue(states["environment"] == ["throttled"])
+        scheduler.report.assert_called_once_with("environment", True)
+
+        icons = overlay.get_status_icons([device1, device2], states)
+        self.assertTrue(icons == [("Device1", "state1"), ("Device2", "state3"),
+                                  ("throttled", "throttled")])
+
+    def test_icon_settings(self):
+        """Test icons are tinted if a color is set, else come from an older install if present."""
+        options = overlay.options
+        overlay.options = dataclasses.replace(
+            options, icons=dataclasses.replace(options.icons, color="blue"))
+        (color, path, size) = overlay.icon_settings()
+        self.assertTrue(color == "blue" and path.endswith("/overlay_icons/"))
+        self.assertTrue(size == str(options.icons.size))
+        overlay.options = dataclasses.replace(
+            options, icons=dataclasses.replace(options.icons, color=""))
+        (color, path, size) = overlay.icon_settings()
+        self.assertTrue(color is None)
+        self.assertTrue(os.path.isdir(path))
+        overlay.options = options
+
+    def test_render_status_bar(self):
+        """Test render_status_bar() composites all icons into one overlay."""
+        overlay.resolution[0] = "1920"
+        overlay.status_layout = layout.StatusBar(3, "48", "8", "left")
+        status_icons = [("test1", "flash"), ("test2", "thermometer")]
+        overlay.render_status_bar(status_icons, 255)
+        self.assertTrue(overlay.status_bar.visible)
+        self.assertTrue(overlay.status_bar.backend.process.args[-3:-1] == ["-x", "8"])
+
+        # Nothing changed, overlay is not touched
+        process = overlay.status_bar.backend.process
+        overlay.render_status_bar(status_icons, 255)
+        self.assertTrue(overlay.status_bar.backend.process is process)
+
+        # Removing all icons hides the status bar
+        overlay.render_status_bar([], 255)
+        self.assertFalse(overlay.status_bar.visible)
+
+        # Icon whose file is missing leaves its cell blank
+        overlay.icon_atlas.icons["missing"] = "overlay_icons/missing_48.png"
+        overlay.render_status_bar([("test1", "missing"), ("test2", "flash")], 255)
+        self.assertTrue(overlay.status_bar.visible)
+        self.assertTrue(overlay.status_layout.image.getpixel((overlay.status_layout.cell_x(0) + 24,
+                                                              24))[3] == 0)
+        overlay.status_bar.hide()
+        del overlay.icon_atlas.icons["missing"]
+
+    def test_startup_cache(self):
+        """Test icons shown are saved, and drawn from the cache on the next start."""
+        with tempfile.TemporaryDirectory() as tmp:
+            overlay.STARTUP_CACHE = os.path.join(tmp, "startup_cache.json")
+            overlay.status_layout = layout.StatusBar(3, "48", "8", "left")
+            overlay.render_status_bar([("test1", "flash")], 255)
+            overlay.save_startup_cache()
+
+            overlay.status_bar.hide()
+            overlay.status_layout = layout.StatusBar(3, "48", "8", "left")
+            overlay.startup_cache = startup.load_cache(overlay.STARTUP_CACHE)
+            overlay.show_cached_icons()
+            self.assertTrue(overlay.status_bar.visible)
+            self.assertTrue(overlay.status_layout.cells[0] == ("flash", "255"))
+
+            # Cache from a different icon size is not used
+            overlay.status_bar.hide()
+            overlay.status_layout = layout.StatusBar(3, "48", "8", "left")
+            overlay.startup_cache["icon_set"][1] = "96"
+            overlay.show_cached_icons()
+            self.assertFalse(overlay.status_bar.visible)
+        overlay.status_bar.hide()
+
+    def test_startup_plugins(self):
+        """Test no installed packages are scanned for plugins before cached icons are shown."""
+        plugins.devices.entry_points_found = False
+        plugins.adcs.entry_points_found = False
+        example = configparser.ConfigParser()
+        example.read("config.ini.example")
+        # Numeric options set to 1 are not taken for switches naming a plugin
+        example["Detection"].update({"BatteryADC": "True", "ADCChannel": "1",
+                                     "ADCSamples": "1", "Capacity": "1"})
+        settings.Settings.from_config(example)
+        overlay.show_cached_icons()
+        self.assertFalse(plugins.devices.entry_points_found)
+        self.assertFalse(plugins.adcs.entry_points_found)
+        overlay.status_bar.hide()
+
+    def test_reload_config(self):
+        """Test reload sets up again only what changed options affect."""
+        config_file = overlay.CONFIG_FILE
+        saved = configreload.read(config_file)
+        original = configreload.read(config_file)
+        original.read_dict({"Detection": {"Audio": "True", "Wifi": "False", "Bluetooth": "False",
+                                          "BatteryADC": "False", "BatteryLDO": "False",
+                                          "ShutdownGPIO": "False", "HideEnvWarnings": "False"},
+                            "Audio": {"Backend": "amixer", "Card": "default"}})
+        configreload.apply(overlay.config, original)
+        audio = plugins.devices.load("audio")
+        states = {"Audio": "volume_2", "environment": ["throttled"]}
+        scheduler = Mock()
+        scheduler.intervals = {"Audio": [1, 1, 5], "environment": [5, 5, 30]}
+        with tempfile.TemporaryDirectory() as tmp:
+            overlay.CONFIG_FILE = os.path.join(tmp, "config.ini")
+            changed = configparser.ConfigParser()
+            changed.read_dict(original)
+            changed.read_dict({"Detection": {"HideEnvWarnings": "True", "ProbeTimeout": "0.5"},
+                               "Audio": {"Card": "hw:1"}})
+            with open(overlay.CONFIG_FILE, "w", encoding="utf-8") as file:
+                changed.write(file)
+
+            self.assertTrue(overlay.reload_config([audio], states, scheduler, None) == [audio])
+            self.assertTrue(audio.AUDIO_CARD == "hw:1")
+            scheduler.remove.assert_any_call("Audio")
+            scheduler.register_device.assert_called_once_with(audio)
+            self.assertTrue(states == {"Audio": None, "environment": []})
+            scheduler.remove.assert_any_call("environment")
+            self.assertTrue(overlay.probe_pool.timeout == 0.5)
+
+            # Nothing changed, nothing is set up again
+            scheduler.reset_mock()
+            self.assertTrue(overlay.reload_config([audio], states, scheduler, None) == [audio])
+            self.assertFalse(scheduler.method_calls)
+        overlay.CONFIG_FILE = config_file
+        configreload.apply(overlay.config, saved)
+        overlay.options = settings.Settings.from_config(overlay.config)
+        overlay.probe_pool.timeout = 2.0
+
+    def test_reload_environment_due(self):
+        """Test a reload hiding environment warnings while their check is due."""
+        config_file = overlay.CONFIG_FILE
+        saved = configreload.read(config_file)
+        original = configreload.read(config_file)
+        original.read_dict({"Detection": {"Audio": "False", "Wifi": "False", "Bluetooth": "False",
+                                          "BatteryADC": "False", "HideEnvWarnings": "False"}})
+        configreload.apply(overlay.config, original)
+        overlay.options = settings.Settings.from_config(overlay.config)
+        states = {"environment": []}
+        scheduler = events.Scheduler()
+        scheduler.add("environment", overlay.ENV_POLL_INTERVAL)
+        due = scheduler.wait()
+        with tempfile.TemporaryDirectory() as tmp:
+            overlay.CONFIG_FILE = os.path.join(tmp, "config.ini")
+            original["Detection"]["HideEnvWarnings"] = "True"
+            with open(overlay.CONFIG_FILE, "w", encoding="utf-8") as file:
+                original.write(file)
+            self.assertFalse(overlay.reload_config([], states, scheduler, None))
+            self.assertTrue("environment" in due)
+            self.assertFalse(overlay.poll(due, [], states, scheduler))
+            scheduler.report("environment", False)
+            self.assertFalse(states["environment"])
+            self.assertFalse("environment" in scheduler.intervals)
+        scheduler.close()
+        overlay.CONFIG_FILE = config_file
+        configreload.apply(overlay.config, saved)
+        overlay.options = settings.Settings.from_config(overlay.config)
 
 if __name__ == '__main__':
     unittest.main()
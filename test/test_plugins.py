@@ -0,0 +1,83 @@
+"""Unit tests for plugins.py
+github.com/bverc/retropie-status-overlay
+
+Author: bverc
+"""
+
+import unittest
+import configparser
+import sys
+
+import plugins
+
+class TestPlugins(unittest.TestCase):
+    """A Class used to test plugins module."""
+
+    def test_registry(self):
+        """Test plugins are found without importing them, and loaded by name."""
+        sys.modules.pop("adc.mcp3008", None)
+        registry = plugins.Registry("adc")
+        # Installed packages are only scanned for names which are not built in
+        self.assertTrue(registry.exists("ADS1015"))
+        self.assertFalse(registry.entry_points_found)
+        self.assertFalse(registry.exists("missing"))
+        self.assertTrue(registry.entry_points_found)
+        self.assertTrue({"ads1015", "ads1115", "mcp3008", "pj", "ser"} <= set(registry.names()))
+        self.assertFalse("adc.mcp3008" in sys.modules)
+
+        module = registry.load("ADS1015")
+        self.assertTrue(module.__name__ == "adc.ads1015")
+        self.assertTrue(registry.load("ads1015") is module)
+        self.assertTrue(plugins.capabilities(module) == ["read_many"])
+
+        with self.assertRaises(plugins.PluginError):
+            registry.load("missing")
+        # Plugin whose library is not installed
+        registry.plugins["broken"] = "adc.not_installed"
+        with self.assertRaises(plugins.PluginError):
+            registry.load("broken")
+
+    def test_enabled_devices(self):
+        """Test only enabled devices are loaded, in config order."""
+        config = configparser.ConfigParser()
+        config['Detection'] = {'Audio': 'True',
+                               'Wifi': 'True',
+                               'Bluetooth': 'False',
+                               'BatteryADC': 'True',
+                               'ADCType': 'ads1015'}
+        (modules, errors) = plugins.enabled_devices(config)
+        self.assertTrue([module.__name__ for module in modules]
+                        == ["devices.audio", "devices.wifi", "devices.battery"])
+        self.assertFalse(errors)
+        self.assertTrue(plugins.create_device(modules[1], config) is modules[1])
+        self.assertTrue("create" in plugins.capabilities(modules[2]))
+
+        # Missing options of a plugin are reported when it is set up, such as VMaxCharging
+        with self.assertRaises(plugins.PluginError):
+            plugins.create_device(modules[2], config)
+
+        # Switches of the overlay itself, and options which are not switched on, never
+        # look up plugins from other packages
+        plugins.devices.entry_points_found = False
+        config['Detection'].update({'ADCShutdown': 'True', 'Unknown': 'False',
+                                    'ADCChannel': '1', 'ADCSamples': '1', 'Capacity': '1'})
+        self.assertTrue(plugins.enabled_names(config) == ["audio", "wifi", "battery"])
+        self.assertFalse(plugins.devices.entry_points_found)
+        config['Detection']['Other'] = 'True'
+        self.assertTrue(plugins.enabled_names(config) == ["audio", "wifi", "battery"])
+        self.assertTrue(plugins.devices.entry_points_found)
+
+    def test_affected(self):
+        """Test devices are only affected by changes to options their plugin reads."""
+        audio = plugins.devices.load("audio")
+        battery = plugins.devices.load("battery")
+        self.assertTrue(plugins.device_module(audio) is audio)
+        self.assertTrue(plugins.affected(audio, {("Audio", "Card")}))
+        self.assertFalse(plugins.affected(audio, {("Wifi", "Interface")}))
+        self.assertTrue(plugins.affected(battery, {("ADC Current", "Gain")}))
+        self.assertTrue(plugins.affected(battery, {("Detection", "vmaxcharging")}))
+        self.assertFalse(plugins.affected(battery, {("Detection", "ADCShutdown")}))
+        self.assertFalse(plugins.affected(plugins.devices.load("bluetooth"), {("Icons", "Size")}))
+
+if __name__ == '__main__':
+    unittest.main()
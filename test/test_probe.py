@@ -0,0 +1,74 @@
+"""Unit tests for probe.py
+github.com/bverc/retropie-status-overlay
+
+Author: bverc
+"""
+
+import unittest
+import subprocess
+import sys
+import threading
+import time
+
+import probe
+
+class TestProbe(unittest.TestCase):
+    """A Class used to test probe module."""
+
+    def test_run(self):
+        """Test checks run in parallel, and a slow check is stale until it finishes."""
+        pool = probe.ProbePool(workers=4, timeout=0.2)
+        release = threading.Event()
+        calls = []
+
+        def hung():
+            calls.append("hung")
+            release.wait(5)
+            return "late"
+
+        def slow():
+            time.sleep(0.1)
+            return "slow"
+
+        start = time.monotonic()
+        (results, stale) = pool.run({"hung": hung, "slow": slow, "fast": lambda: "fast"})
+        self.assertTrue(time.monotonic() - start < 0.5)
+        self.assertTrue(results == {"slow": "slow", "fast": "fast"})
+        self.assertTrue(stale == ["hung"])
+
+        # Not started again while still running
+        (results, stale) = pool.run({"hung": hung})
+        self.assertTrue(stale == ["hung"])
+        self.assertTrue(calls == ["hung"])
+
+        # Result is used once it finishes
+        release.set()
+        pool.running["hung"][0].result(1)
+        (results, stale) = pool.run({"hung": hung})
+        self.assertTrue(results == {"hung": "late"})
+        self.assertFalse(stale)
+        pool.close()
+
+    def test_error(self):
+        """Test an exception in a check is raised by run()."""
+        pool = probe.ProbePool()
+
+        def broken():
+            raise RuntimeError("broken")
+
+        with self.assertRaises(RuntimeError):
+            pool.run({"broken": broken})
+        pool.close()
+
+    def test_close(self):
+        """Test a hung check does not stop the process exiting after close()."""
+        code = ("import time, probe\n"
+                "pool = probe.ProbePool(timeout=0.1)\n"
+                "pool.run({'hung': lambda: time.sleep(5)})\n"
+                "pool.close()\n")
+        start = time.monotonic()
+        subprocess.run([sys.executable, "-c", code], check=True, timeout=5)
+        self.assertTrue(time.monotonic() - start < 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+"""Unit tests for procwatch.py
+github.com/bverc/retropie-status-overlay
+
+Author: bverc
+"""
+
+import unittest
+import os
+import shutil
+import tempfile
+
+import procwatch
+
+def add_process(proc_dir, pid, name):
+    """Create a fake /proc/<pid>/comm entry."""
+    os.makedirs(os.path.join(proc_dir, pid))
+    with open(os.path.join(proc_dir, pid, "comm"), "w", encoding="utf-8") as file:
+        file.write(name + "\n")
+
+class TestProcWatch(unittest.TestCase):
+    """A Class used to test procwatch module."""
+
+    def setUp(self):
+        """Create fake proc directory."""
+        self.proc_dir = tempfile.mkdtemp()
+        add_process(self.proc_dir, "1", "systemd")
+        add_process(self.proc_dir, "20", "emulationstatio")
+        os.makedirs(os.path.join(self.proc_dir, "self"))
+
+    def tearDown(self):
+        """Remove fake proc directory."""
+        shutil.rmtree(self.proc_dir)
+
+    def test_running(self):
+        """Test running() finds process, caches its pid, and notices it exit."""
+        watcher = procwatch.ProcessWatcher("RetroArch", self.proc_dir)
+        self.assertFalse(watcher.running())
+        self.assertTrue(len(watcher.known) == 2)
+
+        add_process(self.proc_dir, "30", "retroarch")
+        self.assertTrue(watcher.running())
+        self.assertTrue(watcher.pid == "30")
+
+        # Cached pid is checked without scanning
+        watcher.known = None
+        self.assertTrue(watcher.running())
+
+        shutil.rmtree(os.path.join(self.proc_dir, "30"))
+        watcher.known = set()
+        self.assertFalse(watcher.running())
+        self.assertTrue(watcher.pid is None)
+
+    def test_known_processes_skipped(self):
+        """Test running() only reads names of new processes, unless forgotten."""
+        watcher = procwatch.ProcessWatcher("retroarch", self.proc_dir)
+        self.assertFalse(watcher.running())
+
+        # Process 20 exec()s into retroarch, keeping its pid and inode
+        with open(os.path.join(self.proc_dir, "20", "comm"), "w", encoding="utf-8") as file:
+            file.write("retroarch\n")
+        self.assertFalse(watcher.running())
+        watcher.forget(20)
+        self.assertTrue(watcher.running())
+
+    def test_check_own_process(self):
+        """Test running() against the real /proc with this process."""
+        with open(f"/proc/{os.getpid()}/comm", "r", encoding="utf-8") as file:
+            name = file.read().rstrip()
+        self.assertTrue(procwatch.ProcessWatcher(name).running())
+        self.assertFalse(procwatch.ProcessWatcher("abcdefg").running())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+"""Unit tests for adc/ser.py
+github.com/bverc/retropie-status-overlay
+
+Author: bverc
+"""
+
+import unittest
+import time
+from unittest.mock import Mock
+
+import background
+from adc import ser
+
+class TestSer(unittest.TestCase):
+    """A Class used to test serial ADC module."""
+
+    def test_read_line(self):
+        """Test ser.read_line() parses a voltage line."""
+        ser.ser = Mock()
+        ser.ser.readline.return_value = b"3.61\r\n"
+        self.assertTrue(ser.read_line() == 3.61)
+        ser.ser.readline.return_value = b""
+        with self.assertRaises(ValueError):
+            ser.read_line()
+
+    def test_read(self):
+        """Test ser.read() and ser.read_many() return voltages received without blocking."""
+        ser.reader = background.BackgroundReader(Mock())
+        ser.last_read_at = float("-inf")
+        with self.assertRaises(background.StaleError):
+            ser.read(0)
+        for value in [3.5, 3.6, 3.7]:
+            ser.reader.values.append((value, time.monotonic()))
+        self.assertTrue(ser.read(0) == 3.7)
+        (mean, variance) = ser.read_many(0, 2)
+        self.assertTrue(abs(mean - 3.65) < 1e-9)
+        self.assertTrue(abs(variance - 0.0025 / 2) < 1e-9)
+
+        # Voltages already averaged are not used again, the latest is if none is new
+        self.assertTrue(ser.read_many(0, 2) == (3.7, None))
+        ser.reader.values.append((3.8, time.monotonic()))
+        self.assertTrue(ser.read_many(0, 2) == (3.8, None))
+
+        # Voltages older than STALE_AFTER are left out
+        ser.reader = background.BackgroundReader(Mock(), max_age=ser.STALE_AFTER)
+        ser.last_read_at = float("-inf")
+        now = time.monotonic()
+        ser.reader.values.extend([(3.0, now - 20), (3.8, now), (4.0, now)])
+        (mean, variance) = ser.read_many(0, 16)
+        self.assertTrue(abs(mean - 3.9) < 1e-9)
+
+if __name__ == '__main__':
+    unittest.main()
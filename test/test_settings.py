@@ -0,0 +1,81 @@
+"""Unit tests for settings.py
+github.com/bverc/retropie-status-overlay
+
+Author: bverc
+"""
+
+import unittest
+import configparser
+
+import settings
+
+def example_config():
+    """Return config read from config.ini.example."""
+    config = configparser.ConfigParser()
+    config.read("config.ini.example")
+    return config
+
+class TestSettings(unittest.TestCase):
+    """A Class used to test settings module."""
+
+    def test_from_config(self):
+        """Test settings the overlay reads are parsed from the example config."""
+        options = settings.Settings.from_config(example_config())
+        self.assertTrue(options.icons.size == 48)
+        self.assertTrue(options.icons.padding == 8)
+        self.assertTrue(options.icons.horizontal == "right")
+        self.assertTrue(options.detection.devices == ("wifi", "bluetooth", "audio"))
+        self.assertTrue(options.detection.vmin_discharging == 3.2)
+        self.assertTrue(options.detection.ingame_alpha == "100")
+        self.assertFalse(options.detection.hide_env_warnings)
+        self.assertTrue(options.metrics.capacity == 20160)
+        self.assertFalse(options.battery_ldo.enabled)
+        self.assertTrue(options.shutdown_gpio.gpio == 3)
+        with self.assertRaises(AttributeError):
+            options.icons.size = 24
+
+    def test_fallbacks(self):
+        """Test options added in later versions, and unused battery options, may be left out."""
+        config = example_config()
+        for option in ["Color", "Display", "Connector"]:
+            config.remove_option("Icons", option)
+        for option in ["VMinCharging", "ProbeTimeout"]:
+            config.remove_option("Detection", option)
+        config.remove_section("Metrics")
+        options = settings.Settings.from_config(config)
+        self.assertTrue(options.icons.color == "")
+        self.assertTrue(options.detection.vmin_charging is None)
+        self.assertTrue(options.detection.probe_timeout == 2.0)
+        self.assertFalse(options.metrics.enabled)
+
+    def test_invalid(self):
+        """Test invalid or missing options are reported with their section and option."""
+        for (section, option, value) in [("Icons", "Size", "large"),
+                                         ("Icons", "Vertical", "middle"),
+                                         ("Icons", "Color", "notacolor"),
+                                         ("Detection", "InGameAlpha", "300"),
+                                         ("Detection", "HideEnvWarnings", "maybe"),
+                                         ("Metrics", "Interval", "1.5")]:
+            config = example_config()
+            config[section][option] = value
+            with self.assertRaises(settings.SettingsError) as context:
+                settings.Settings.from_config(config)
+            self.assertTrue(section in str(context.exception))
+
+        # Shutdown voltages are required once BatteryADC is enabled
+        config = example_config()
+        config["Detection"]["BatteryADC"] = "True"
+        self.assertTrue(settings.Settings.from_config(config).detection.vmin_charging == 4.25)
+        config.remove_option("Detection", "VMinCharging")
+        with self.assertRaises(settings.SettingsError):
+            settings.Settings.from_config(config)
+
+        # As is the pin of an enabled interrupt
+        config = example_config()
+        config["Detection"]["ShutdownGPIO"] = "True"
+        config.remove_option("ShutdownGPIO", "GPIO")
+        with self.assertRaises(settings.SettingsError):
+            settings.Settings.from_config(config)
+
+if __name__ == '__main__':
+    unittest.main()
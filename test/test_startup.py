@@ -0,0 +1,38 @@
+"""Unit tests for startup.py
+github.com/bverc/retropie-status-overlay
+
+Author: bverc
+"""
+
+import unittest
+import os
+import tempfile
+
+import startup
+
+class TestStartup(unittest.TestCase):
+    """A Class used to test startup module."""
+
+    def test_cache(self):
+        """Test cache round trips, and a missing or corrupt cache is empty."""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "startup_cache.json")
+            self.assertTrue(startup.load_cache(path) == {})
+            cache = {"resolution": ["1280", "720"], "icons": [["wifi_3", "icons/wifi_3.png"]]}
+            startup.save_cache(path, cache)
+            self.assertTrue(startup.load_cache(path) == cache)
+            with open(path, "w", encoding="utf-8") as file:
+                file.write("{truncated")
+            self.assertTrue(startup.load_cache(path) == {})
+
+    def test_timer(self):
+        """Test timer reports phases in order, counting time before it was created."""
+        self.assertTrue(startup.process_age() >= 0)
+        timer = startup.StartupTimer()
+        timer.mark("first icon")
+        self.assertTrue([phase for (phase, _) in timer.marks] == ["modules", "first icon"])
+        self.assertTrue(timer.marks[1][1] >= timer.marks[0][1] >= 0)
+        self.assertTrue(timer.report().startswith("Startup: modules "))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+"""Unit tests for throttle.py
+github.com/bverc/retropie-status-overlay
+
+Author: bverc
+"""
+
+import unittest
+import os
+import tempfile
+
+import throttle
+
+class TestThrottle(unittest.TestCase):
+    """A Class used to test throttle module."""
+
+    def setUp(self):
+        """Create a fake sysfs get_throttled node."""
+        self.tmp = tempfile.TemporaryDirectory() # pylint: disable=consider-using-with
+        self.node = os.path.join(self.tmp.name, "get_throttled")
+
+    def tearDown(self):
+        """Remove fake sysfs node."""
+        self.tmp.cleanup()
+
+    def write_node(self, value):
+        """Write value to fake sysfs node, formatted as by the firmware driver."""
+        with open(self.node, "w", encoding="utf-8") as file:
+            file.write(f"{value:x}\n")
+
+    def test_decode(self):
+        """Test decode() separates active and sticky flags."""
+        flags = throttle.decode(0x50005)
+        self.assertTrue(flags["under-voltage"] == (True, True))
+        self.assertTrue(flags["freq-capped"] == (False, False))
+        self.assertTrue(flags["throttled"] == (True, True))
+        flags = throttle.decode(0x20000)
+        self.assertTrue(flags["freq-capped"] == (False, True))
+
+    def test_read_sources(self):
+        """Test read() uses sysfs when present, otherwise falls back to command."""
+        self.write_node(0x50005)
+        monitor = throttle.ThrottleMonitor(self.node, "no_vcio", ["echo", "throttled=0x2"])
+        self.assertTrue(monitor.read() == 0x50005)
+
+        monitor = throttle.ThrottleMonitor("no_sysfs", "no_vcio", ["echo", "throttled=0xe0000"])
+        self.assertTrue(monitor.read() == 0xe0000)
+        self.assertTrue(len(monitor.readers) == 1)
+
+        monitor = throttle.ThrottleMonitor("no_sysfs", "no_vcio", ["no_vcgencmd"])
+        self.assertTrue(monitor.read() is None)
+        self.assertFalse(monitor.state()["under-voltage"])
+
+    def test_state_occurred(self):
+        """Test state() reports a transient flag once, when its sticky bit first appears."""
+        self.write_node(0x0)
+        monitor = throttle.ThrottleMonitor(self.node)
+        self.assertFalse(any(monitor.state().values()))
+
+        # Under-voltage came and went between reads
+        self.write_node(0x10000)
+        state = monitor.state()
+        self.assertTrue(state["under-voltage"])
+        self.assertFalse(state["throttled"])
+        self.assertFalse(monitor.state()["under-voltage"])
+
+        # Active flags are always reported
+        self.write_node(0x10001)
+        self.assertTrue(monitor.state()["under-voltage"])
+        self.assertTrue(monitor.state()["under-voltage"])
+
+        # Sticky bits cleared by another reader then set again
+        self.write_node(0x0)
+        self.assertFalse(monitor.state()["under-voltage"])
+        self.write_node(0x10000)
+        self.assertTrue(monitor.state()["under-voltage"])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -6,6 +6,7 @@ Author: bverc
 
 import unittest
 import os
+import configparser
 
 from devices import wifi
 
@@ -49,6 +50,7 @@ class TestWifi(unittest.TestCase):
         """Test wifi.get_state() with CARRIER 1, check state is 'wifi_1/2/3/4'"""
         cwd = os.getcwd()
         wifi.WIFI_CARRIER = cwd + "/test/dir2/file1"
+        wifi.WIFI_WIRELESS = cwd + "/test/dir0/wireless"
 
         wifi.WIFI_CMD = ["echo", "Link Quality=13/70"]
         (wifi_state, wifi_quality) = wifi.get_state()
@@ -75,5 +77,35 @@ class TestWifi(unittest.TestCase):
         self.assertTrue(wifi_state == "wifi_4")
         self.assertTrue(wifi_quality == 100)
 
+    def test_read_wireless(self):
+        """Test wifi.read_wireless() parses link quality of each interface"""
+        cwd = os.getcwd()
+        wifi.WIFI_WIRELESS = cwd + "/test/net_wireless"
+        self.assertTrue(wifi.read_wireless() == {"wlan0": 58, "wlan1": 18})
+        wifi.WIFI_WIRELESS = cwd + "/test/dir0/wireless"
+        self.assertFalse(wifi.read_wireless())
+
+    def test_get_state_wireless(self):
+        """Test wifi.get_state() reads quality without iwconfig and picks best interface"""
+        cwd = os.getcwd()
+        wifi.WIFI_CARRIER = cwd + "/test/dir2/file1"
+        wifi.WIFI_WIRELESS = cwd + "/test/net_wireless"
+        wifi.WIFI_CMD = ["false"]
+        wifi.WIFI_INTERFACES[:] = ["wlan1"]
+        self.assertTrue(wifi.get_state() == ("wifi_0", 18))
+        wifi.WIFI_INTERFACES[:] = ["wlan1", "wlan0"]
+        self.assertTrue(wifi.get_state() == ("wifi_2", 58))
+        wifi.WIFI_INTERFACES[:] = ["wlan0"]
+
+    def test_configure(self):
+        """Test wifi.configure() with and without Wifi section"""
+        config = configparser.ConfigParser()
+        wifi.configure(config)
+        self.assertTrue(wifi.WIFI_INTERFACES == ["wlan0"])
+        config['Wifi'] = {'Interface': 'wlan0, wlan1'}
+        wifi.configure(config)
+        self.assertTrue(wifi.WIFI_INTERFACES == ["wlan0", "wlan1"])
+        wifi.WIFI_INTERFACES[:] = ["wlan0"]
+
 if __name__ == '__main__':
     unittest.main()
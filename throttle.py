@@ -0,0 +1,96 @@
+"""Throttle monitor for retropie-status-overlay
+github.com/bverc/retropie-status-overlay
+
+Author: bverc
+
+Reads the firmware's throttle flags in-process, from the sysfs node where the
+kernel provides one or else from the VideoCore mailbox, instead of running
+vcgencmd. vcgencmd is only used if neither is available.
+
+Each flag also has a sticky "has occurred" bit, so a transient under-voltage
+which came and went between two reads is still reported once. The sticky bits
+are never cleared, as that would clear them for every other reader too, such
+as vcgencmd. Once a flag has occurred its bit stays set until reboot, so only
+the first transient of each kind in a boot is reported; flags which are
+active now are always shown.
+"""
+
+import fcntl
+import os
+import re
+import struct
+import subprocess
+from functools import partial
+
+THROTTLED_SYSFS = "/sys/devices/platform/soc/soc:firmware/get_throttled"
+VCIO_PATH = "/dev/vcio"
+THROTTLED_CMD = ["vcgencmd", "get_throttled"]
+
+# IOCTL_MBOX_PROPERTY = _IOWR(100, 0, char *) from the firmware's vcmailbox
+IOCTL_MBOX_PROPERTY = 0xC0006400 | struct.calcsize("P") << 16
+MBOX_REQUEST = 0x00000000
+MBOX_SUCCESS = 0x80000000
+TAG_GET_THROTTLED = 0x00030046
+
+# Flags currently active, each also has a sticky bit OCCURRED_SHIFT places higher
+THROTTLE_FLAGS = {"under-voltage": 0x1, "freq-capped": 0x2, "throttled": 0x4}
+OCCURRED_SHIFT = 16
+
+def read_sysfs(path=THROTTLED_SYSFS):
+    """Return throttle bitmask from the firmware driver's sysfs node."""
+    with open(path, "r", encoding="utf-8") as file:
+        return int(file.read().strip(), 16)
+
+def read_mailbox(path=VCIO_PATH):
+    """Return throttle bitmask from a VideoCore mailbox property request."""
+    # Buffer size, request code, tag, value size, request size, value, end tag.
+    # The request value must be 0, as set bits would clear the sticky flags for all readers.
+    buffer = bytearray(struct.pack("=7I", 28, MBOX_REQUEST, TAG_GET_THROTTLED, 4, 4, 0, 0))
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        fcntl.ioctl(fd, IOCTL_MBOX_PROPERTY, buffer, True)
+    finally:
+        os.close(fd)
+    (code, _, _, _, value) = struct.unpack_from("=5I", buffer, 4)
+    if code != MBOX_SUCCESS:
+        raise OSError("Mailbox request for throttle flags failed")
+    return value
+
+def read_command(command=None):
+    """Return throttle bitmask parsed from vcgencmd output."""
+    output = subprocess.check_output(command or THROTTLED_CMD).decode()
+    match = re.search(r"throttled=(0x[0-9a-fA-F]+)", output)
+    if match is None:
+        raise ValueError("Unexpected output: " + output.strip())
+    return int(match.group(1), 16)
+
+def decode(value):
+    """Return dict of flag name to (active now, has occurred) for a throttle bitmask."""
+    return {name: (bool(value & bit), bool(value & bit << OCCURRED_SHIFT))
+            for name, bit in THROTTLE_FLAGS.items()}
+
+class ThrottleMonitor:
+    """Read throttle flags from the first source which works on this system."""
+
+    def __init__(self, sysfs_path=THROTTLED_SYSFS, vcio_path=VCIO_PATH, command=None):
+        """Initialise monitor, trying sysfs, then mailbox, then command."""
+        self.readers = [partial(read_sysfs, sysfs_path), partial(read_mailbox, vcio_path),
+                        partial(read_command, command)]
+        self.value = 0
+
+    def read(self):
+        """Return throttle bitmask, or None if no source is available."""
+        while self.readers:
+            try:
+                return self.readers[0]()
+            except (OSError, ValueError, subprocess.SubprocessError):
+                # Unavailable on this system, don't try it again
+                self.readers.pop(0)
+        return None
+
+    def state(self):
+        """Return dict of flag name to True if active, or occurred since the last read."""
+        value = self.read() or 0
+        occurred = decode(value & ~self.value)
+        self.value = value
+        return {name: active or occurred[name][1] for name, (active, _) in decode(value).items()}